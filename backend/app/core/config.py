@@ -6,4 +6,150 @@ class Settings:
     SECRET_KEY: str = config('SECRET_KEY')
     CORS_ORIGINS: list = config('CORS_ORIGINS', cast=lambda x: x.strip('[]').replace('"', '').split(', '))
 
+    # Upstream HTTP client (shared by every TMDBService call)
+    TMDB_MAX_CONNECTIONS: int = config('TMDB_MAX_CONNECTIONS', default=100, cast=int)
+    TMDB_MAX_KEEPALIVE_CONNECTIONS: int = config('TMDB_MAX_KEEPALIVE_CONNECTIONS', default=20, cast=int)
+    TMDB_KEEPALIVE_EXPIRY: float = config('TMDB_KEEPALIVE_EXPIRY', default=30.0, cast=float)
+    TMDB_HTTP2: bool = config('TMDB_HTTP2', default=True, cast=bool)
+    TMDB_CONNECT_TIMEOUT: float = config('TMDB_CONNECT_TIMEOUT', default=3.0, cast=float)
+    TMDB_READ_TIMEOUT: float = config('TMDB_READ_TIMEOUT', default=10.0, cast=float)
+    TMDB_POOL_TIMEOUT: float = config('TMDB_POOL_TIMEOUT', default=5.0, cast=float)
+
+    # Upstream scheduler: TMDB request rate, adaptive concurrency bounds and retry policy
+    UPSTREAM_RATE_LIMIT: float = config('UPSTREAM_RATE_LIMIT', default=40.0, cast=float)
+    UPSTREAM_BURST: float = config('UPSTREAM_BURST', default=20.0, cast=float)
+    UPSTREAM_INITIAL_CONCURRENCY: int = config('UPSTREAM_INITIAL_CONCURRENCY', default=8, cast=int)
+    UPSTREAM_MIN_CONCURRENCY: int = config('UPSTREAM_MIN_CONCURRENCY', default=2, cast=int)
+    UPSTREAM_MAX_CONCURRENCY: int = config('UPSTREAM_MAX_CONCURRENCY', default=32, cast=int)
+    UPSTREAM_LATENCY_TARGET: float = config('UPSTREAM_LATENCY_TARGET', default=1.5, cast=float)
+    UPSTREAM_MAX_RETRIES: int = config('UPSTREAM_MAX_RETRIES', default=2, cast=int)
+    UPSTREAM_BACKOFF_BASE: float = config('UPSTREAM_BACKOFF_BASE', default=0.25, cast=float)
+    UPSTREAM_BACKOFF_MAX: float = config('UPSTREAM_BACKOFF_MAX', default=8.0, cast=float)
+    UPSTREAM_MAX_RETRY_AFTER: float = config('UPSTREAM_MAX_RETRY_AFTER', default=30.0, cast=float)
+
+    # Batch lookups: ids per request and detail fetches in flight per batch
+    BATCH_MAX_IDS: int = config('BATCH_MAX_IDS', default=100, cast=int)
+    BATCH_CONCURRENCY: int = config('BATCH_CONCURRENCY', default=8, cast=int)
+
+    # NDJSON search/discover streams: pages fetched concurrently per stream, and pages per request
+    STREAM_PAGE_WINDOW: int = config('STREAM_PAGE_WINDOW', default=4, cast=int)
+    STREAM_MAX_PAGES: int = config('STREAM_MAX_PAGES', default=50, cast=int)
+
+    # Response cache: in-process LRU tier plus optional shared Redis tier
+    REDIS_URL: str = config('REDIS_URL', default='')
+    CACHE_MAX_ENTRIES: int = config('CACHE_MAX_ENTRIES', default=5000, cast=int)
+    CACHE_MAX_BYTES: int = config('CACHE_MAX_BYTES', default=64 * 1024 * 1024, cast=int)
+    CACHE_PROMOTE_TTL: float = config('CACHE_PROMOTE_TTL', default=60.0, cast=float)
+    CACHE_KEY_PREFIX: str = config('CACHE_KEY_PREFIX', default='tmdb:')
+
+    # Fully rendered JSON response bodies, served as-is on a hit
+    RENDERED_CACHE_MAX_ENTRIES: int = config('RENDERED_CACHE_MAX_ENTRIES', default=1000, cast=int)
+    RENDERED_CACHE_MAX_BYTES: int = config('RENDERED_CACHE_MAX_BYTES', default=16 * 1024 * 1024, cast=int)
+
+    # HTTP caching for API GET routes: ETag/304, compression above a size floor, and an LRU of
+    # compressed bodies keyed by ETag (brotli is offered when the optional brotli package is installed)
+    HTTP_COMPRESS_MIN_BYTES: int = config('HTTP_COMPRESS_MIN_BYTES', default=1024, cast=int)
+    HTTP_GZIP_LEVEL: int = config('HTTP_GZIP_LEVEL', default=6, cast=int)
+    HTTP_BROTLI_QUALITY: int = config('HTTP_BROTLI_QUALITY', default=6, cast=int)
+    HTTP_COMPRESSED_CACHE_MAX_ENTRIES: int = config('HTTP_COMPRESSED_CACHE_MAX_ENTRIES', default=2000, cast=int)
+    HTTP_COMPRESSED_CACHE_MAX_BYTES: int = config('HTTP_COMPRESSED_CACHE_MAX_BYTES', default=16 * 1024 * 1024, cast=int)
+    HTTP_COMPRESSED_CACHE_TTL: float = config('HTTP_COMPRESSED_CACHE_TTL', default=24 * 3600.0, cast=float)
+
+    # Image proxy: TMDB image CDN behind a size-bounded on-disk LRU, with trending posters prefetched
+    IMAGE_BASE_URL: str = config('IMAGE_BASE_URL', default='https://image.tmdb.org/t/p')
+    IMAGE_CACHE_DIR: str = config('IMAGE_CACHE_DIR', default='data/images')
+    IMAGE_CACHE_MAX_BYTES: int = config('IMAGE_CACHE_MAX_BYTES', default=512 * 1024 * 1024, cast=int)
+    IMAGE_MAX_FILE_BYTES: int = config('IMAGE_MAX_FILE_BYTES', default=10 * 1024 * 1024, cast=int)
+    IMAGE_MAX_CONNECTIONS: int = config('IMAGE_MAX_CONNECTIONS', default=20, cast=int)
+    IMAGE_PREFETCH_SIZE: str = config('IMAGE_PREFETCH_SIZE', default='w500')
+    IMAGE_PREFETCH_COUNT: int = config('IMAGE_PREFETCH_COUNT', default=20, cast=int)
+    IMAGE_PREFETCH_CONCURRENCY: int = config('IMAGE_PREFETCH_CONCURRENCY', default=4, cast=int)
+    # Size variants come from TMDB /configuration in the background; DEFAULT_SIZES until then
+    IMAGE_SIZES_REFRESH_INTERVAL: float = config('IMAGE_SIZES_REFRESH_INTERVAL', default=24 * 3600.0, cast=float)
+
+    # Curated list snapshots (trending, popular, upcoming, top rated, now playing)
+    SNAPSHOT_REFRESH_INTERVAL: float = config('SNAPSHOT_REFRESH_INTERVAL', default=3600.0, cast=float)
+    SNAPSHOT_RETRY_INTERVAL: float = config('SNAPSHOT_RETRY_INTERVAL', default=300.0, cast=float)
+    SNAPSHOT_REFRESH_JITTER: float = config('SNAPSHOT_REFRESH_JITTER', default=120.0, cast=float)
+    SNAPSHOT_MAX_AGE: float = config('SNAPSHOT_MAX_AGE', default=5400.0, cast=float)
+
+    # Local content-based recommendations ("tmdb" proxies TMDB, "local" serves locally with TMDB fallback)
+    RECOMMENDER_MODE: str = config('RECOMMENDER_MODE', default='tmdb')
+    RECOMMENDER_MIN_RESULTS: int = config('RECOMMENDER_MIN_RESULTS', default=10, cast=int)
+    RECOMMENDER_REBUILD_INTERVAL: float = config('RECOMMENDER_REBUILD_INTERVAL', default=5.0, cast=float)
+
+    # Multi-seed "because you watched" recommendations: seeds per request, per-seed fetch timeout,
+    # reciprocal rank fusion constant, and score multiplier per already-picked movie sharing a genre
+    MULTI_SEED_MAX_SEEDS: int = config('MULTI_SEED_MAX_SEEDS', default=20, cast=int)
+    MULTI_SEED_TIMEOUT: float = config('MULTI_SEED_TIMEOUT', default=5.0, cast=float)
+    MULTI_SEED_RRF_K: float = config('MULTI_SEED_RRF_K', default=60.0, cast=float)
+    MULTI_SEED_GENRE_PENALTY: float = config('MULTI_SEED_GENRE_PENALTY', default=0.8, cast=float)
+
+    # Collaborative filtering on implicit feedback: movies each client_id opens over the WebSocket
+    COLLAB_FACTORS: int = config('COLLAB_FACTORS', default=32, cast=int)
+    COLLAB_ITERATIONS: int = config('COLLAB_ITERATIONS', default=10, cast=int)
+    COLLAB_REGULARIZATION: float = config('COLLAB_REGULARIZATION', default=0.1, cast=float)
+    COLLAB_ALPHA: float = config('COLLAB_ALPHA', default=40.0, cast=float)
+    COLLAB_TRAIN_INTERVAL: float = config('COLLAB_TRAIN_INTERVAL', default=300.0, cast=float)
+    COLLAB_MIN_INTERACTIONS: int = config('COLLAB_MIN_INTERACTIONS', default=20, cast=int)
+    # client_id comes from the URL, so history is an LRU: least recently active clients and
+    # each client's oldest movies are forgotten past these bounds
+    COLLAB_MAX_CLIENTS: int = config('COLLAB_MAX_CLIENTS', default=10000, cast=int)
+    COLLAB_MAX_EVENTS_PER_CLIENT: int = config('COLLAB_MAX_EVENTS_PER_CLIENT', default=200, cast=int)
+
+    # Precomputed recommendation graph: TMDB recommendations/similar edges of the top titles,
+    # crawled by the lease holder and memory-mapped by every worker
+    GRAPH_PATH: str = config('GRAPH_PATH', default='data/graph')
+    GRAPH_TOP_N: int = config('GRAPH_TOP_N', default=5000, cast=int)
+    GRAPH_CRAWL_CONCURRENCY: int = config('GRAPH_CRAWL_CONCURRENCY', default=4, cast=int)
+    GRAPH_CRAWL_INTERVAL: float = config('GRAPH_CRAWL_INTERVAL', default=86400.0, cast=float)
+    GRAPH_RELOAD_INTERVAL: float = config('GRAPH_RELOAD_INTERVAL', default=30.0, cast=float)
+    GRAPH_HOPS: int = config('GRAPH_HOPS', default=2, cast=int)
+    GRAPH_HOP_DECAY: float = config('GRAPH_HOP_DECAY', default=0.5, cast=float)
+    GRAPH_MAX_RESULTS: int = config('GRAPH_MAX_RESULTS', default=100, cast=int)
+
+    # Persistent local movie catalog (SQLite)
+    CATALOG_PATH: str = config('CATALOG_PATH', default='data/catalog.db')
+    CATALOG_FLUSH_INTERVAL: float = config('CATALOG_FLUSH_INTERVAL', default=2.0, cast=float)
+    CATALOG_SYNC_PAGES: int = config('CATALOG_SYNC_PAGES', default=50, cast=int)
+    CATALOG_SYNC_CONCURRENCY: int = config('CATALOG_SYNC_CONCURRENCY', default=4, cast=int)
+    CATALOG_MIN_TITLES: int = config('CATALOG_MIN_TITLES', default=1000, cast=int)
+
+    # Local discover engine over the catalog ("local" with TMDB fallback, or "tmdb")
+    DISCOVER_MODE: str = config('DISCOVER_MODE', default='local')
+    DISCOVER_REBUILD_INTERVAL: float = config('DISCOVER_REBUILD_INTERVAL', default=60.0, cast=float)
+    DISCOVER_SELECTION_CACHE: int = config('DISCOVER_SELECTION_CACHE', default=64, cast=int)
+    # A filter is answered locally only while a TMDB total confirming full coverage is this fresh
+    DISCOVER_COVERAGE_TTL: float = config('DISCOVER_COVERAGE_TTL', default=21600.0, cast=float)
+    DISCOVER_COVERAGE_MAX_FILTERS: int = config('DISCOVER_COVERAGE_MAX_FILTERS', default=4096, cast=int)
+
+    # Local as-you-type search index ("local" with TMDB top-up, or "tmdb")
+    SEARCH_MODE: str = config('SEARCH_MODE', default='local')
+    SEARCH_INDEX_PATH: str = config('SEARCH_INDEX_PATH', default='data/search_index.npz')
+    SEARCH_INDEX_SAVE_INTERVAL: float = config('SEARCH_INDEX_SAVE_INTERVAL', default=600.0, cast=float)
+    SEARCH_MIN_LOCAL_RESULTS: int = config('SEARCH_MIN_LOCAL_RESULTS', default=5, cast=int)
+    SEARCH_MIN_OVERLAP: float = config('SEARCH_MIN_OVERLAP', default=0.5, cast=float)
+    SEARCH_MAX_POSTINGS: int = config('SEARCH_MAX_POSTINGS', default=50000, cast=int)
+    SEARCH_MAX_CANDIDATES: int = config('SEARCH_MAX_CANDIDATES', default=60, cast=int)
+    SEARCH_POPULARITY_WEIGHT: float = config('SEARCH_POPULARITY_WEIGHT', default=0.15, cast=float)
+
+    # WebSocket fan-out: per-client outbound queue bound and per-frame send timeout
+    WS_SEND_QUEUE_SIZE: int = config('WS_SEND_QUEUE_SIZE', default=32, cast=int)
+    WS_SEND_TIMEOUT: float = config('WS_SEND_TIMEOUT', default=10.0, cast=float)
+    # Trending versions kept for delta updates; clients further behind get a full resync
+    WS_TRENDING_HISTORY: int = config('WS_TRENDING_HISTORY', default=8, cast=int)
+    # Frame compression relies on uvicorn's default: permessage-deflate is negotiated with
+    # clients that offer it (start uvicorn with --ws-per-message-deflate false to turn it off)
+
+    # Cross-worker pub/sub ("" or memory:// for in-process, redis://... to fan out across workers and nodes)
+    BACKPLANE_URL: str = config('BACKPLANE_URL', default='')
+    BACKPLANE_PREFIX: str = config('BACKPLANE_PREFIX', default='movie-recommender:')
+    # Lease that elects the single worker polling TMDB for snapshots
+    LEASE_TTL: float = config('LEASE_TTL', default=30.0, cast=float)
+    LEASE_RENEW_INTERVAL: float = config('LEASE_RENEW_INTERVAL', default=10.0, cast=float)
+
+    # WebSocket requests: handlers running at once per client, and how many may be in flight
+    WS_MAX_CONCURRENT_REQUESTS: int = config('WS_MAX_CONCURRENT_REQUESTS', default=4, cast=int)
+    WS_MAX_PENDING_REQUESTS: int = config('WS_MAX_PENDING_REQUESTS', default=16, cast=int)
+
 settings = Settings()
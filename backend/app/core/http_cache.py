@@ -0,0 +1,136 @@
+import gzip
+import hashlib
+from typing import Dict, Optional
+from starlette.datastructures import Headers, MutableHeaders
+from app.core.config import settings
+from app.core.responses import etag_matches
+from app.services.cache import LRUCache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Preferred first when the client rates them equally
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+# Compressed bodies keyed by ETag, shared by every middleware instance
+compressed_bodies = LRUCache(settings.HTTP_COMPRESSED_CACHE_MAX_ENTRIES, settings.HTTP_COMPRESSED_CACHE_MAX_BYTES)
+counters = {"not_modified": 0, "compressions": 0}
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Best supported content-coding for an Accept-Encoding header, None for identity"""
+    if not accept_encoding:
+        return None
+    weights = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        weights[coding.strip().lower()] = q
+    wildcard = weights.get("*", 0.0)
+    best, best_q = None, 0.0
+    for coding in ENCODINGS:
+        q = weights.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=settings.HTTP_BROTLI_QUALITY)
+    # mtime=0 keeps the output identical for identical bodies
+    return gzip.compress(body, compresslevel=settings.HTTP_GZIP_LEVEL, mtime=0)
+
+
+class HTTPCacheMiddleware:
+    """Pure ASGI middleware: ETags, 304s, Cache-Control and compression for GET routes with a policy.
+
+    policies maps route templates to Cache-Control values; other routes pass through.
+    The buffered body is hashed into a strong ETag (suffixed per content-coding) and a
+    matching If-None-Match gets a bodyless 304. Compressed bodies are kept per ETag, so
+    a snapshot served over and over is compressed once. Streaming responses (no
+    Content-Length) and non-200 responses pass through untouched.
+    """
+
+    def __init__(self, app, policies: Dict[str, str]):
+        self.app = app
+        self.policies = policies
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            return await self.app(scope, receive, send)
+        state = {"start": None, "passthrough": False, "chunks": []}
+
+        async def send_wrapper(message):
+            if state["passthrough"]:
+                return await send(message)
+            if message["type"] == "http.response.start":
+                route = scope.get("route")
+                policy = self.policies.get(getattr(route, "path", None))
+                headers = Headers(raw=message["headers"])
+                if (
+                    policy is None
+                    or message["status"] != 200
+                    or "content-length" not in headers
+                    or "content-encoding" in headers
+                ):
+                    state["passthrough"] = True
+                    return await send(message)
+                state["start"] = (message, policy)
+                return
+            if message["type"] == "http.response.body":
+                state["chunks"].append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    start, policy = state["start"]
+                    await self._respond(scope, start, policy, b"".join(state["chunks"]), send)
+                return
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def _respond(self, scope, start, policy: str, body: bytes, send):
+        request_headers = Headers(scope=scope)
+        headers = MutableHeaders(raw=list(start["headers"]))
+        encoding = None
+        if len(body) >= settings.HTTP_COMPRESS_MIN_BYTES and headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES):
+            encoding = negotiate_encoding(request_headers.get("accept-encoding"))
+        digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+        # Each content-coding is its own representation, so it gets its own strong ETag
+        etag = f'"{digest}-{encoding}"' if encoding else f'"{digest}"'
+        headers["etag"] = etag
+        headers["cache-control"] = policy
+        headers.add_vary_header("Accept-Encoding")
+
+        if etag_matches(request_headers.get("if-none-match"), etag):
+            counters["not_modified"] += 1
+            del headers["content-length"]
+            if "content-type" in headers:
+                del headers["content-type"]
+            await send({"type": "http.response.start", "status": 304, "headers": headers.raw})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        if encoding:
+            compressed = compressed_bodies.get(etag)
+            if compressed is None:
+                compressed = compress(body, encoding)
+                counters["compressions"] += 1
+                # Keyed by content hash, so an entry can never go stale; the LRU bounds it
+                compressed_bodies.set(etag, compressed, settings.HTTP_COMPRESSED_CACHE_TTL)
+            body = compressed
+            headers["content-encoding"] = encoding
+            headers["content-length"] = str(len(body))
+        await send({**start, "headers": headers.raw})
+        await send({"type": "http.response.body", "body": body})
+
+
+def stats() -> Dict:
+    return {"encodings": list(ENCODINGS), **counters, "compressed": compressed_bodies.stats()}
@@ -0,0 +1,53 @@
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from fastapi.responses import JSONResponse
+from app.core.config import settings
+from app.schemas.movie import MovieList, MoviePage
+from app.services.cache import LRUCache
+
+
+class PreEncodedJSONResponse(JSONResponse):
+    """JSONResponse that sends bytes bodies untouched, so pre-serialized payloads skip re-encoding"""
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, (bytes, bytearray, memoryview)):
+            return bytes(content)
+        return super().render(content)
+
+
+def encode_movies(movies: List[Dict]) -> bytes:
+    """Validate raw TMDB movies in one pass and serialize them straight to JSON bytes"""
+    return MovieList.dump_json(MovieList.validate_python(movies))
+
+
+def encode_movie_page(data: Dict) -> bytes:
+    return MoviePage.dump_json(MoviePage.validate_python({
+        "results": data.get('results', []),
+        "page": data.get('page', 1),
+        "total_pages": data.get('total_pages', 1),
+        "total_results": data.get('total_results', 0)
+    }))
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match check (weak comparison, as RFC 9110 requires for this header)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    bare = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == bare for candidate in if_none_match.split(","))
+
+
+# Rendered response bodies keyed by route and query, served without touching pydantic again
+rendered_responses = LRUCache(settings.RENDERED_CACHE_MAX_ENTRIES, settings.RENDERED_CACHE_MAX_BYTES)
+
+
+async def cached_movie_page(key: str, ttl: float, fetch: Callable[[], Awaitable[Dict]]) -> PreEncodedJSONResponse:
+    body = rendered_responses.get(key)
+    if body is None:
+        data = await fetch()
+        body = encode_movie_page(data)
+        # Empty pages are also what TMDBService returns on upstream errors; never pin them
+        if data.get('results'):
+            rendered_responses.set(key, body, ttl)
+    return PreEncodedJSONResponse(body)
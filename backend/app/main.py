@@ -1,46 +1,117 @@
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from contextlib import asynccontextmanager
-import json
+import math
 import asyncio
 
 from app.core.config import settings
-from app.routers import movies
+from app.core.responses import rendered_responses
+from app.core.metrics import registry, MetricsMiddleware
+from app.core import http_cache
+from app.routers import movies, images
 from app.websocket.manager import manager
+from app.websocket.dispatcher import ClientSession
 from app.services.tmdb_service import tmdb_service
+from app.services.cache import response_cache
+from app.services.snapshots import snapshot_service
+from app.services.recommender import content_recommender
+from app.services.collaborative import collaborative_recommender
+from app.services.graph import graph_service
+from app.services.images import image_cache
+from app.services.catalog import movie_catalog, sync_catalog
+from app.services.discover_engine import discover_engine
+from app.services.search_index import search_service
+from app.services.backplane import create_backplane, LeaderLease
+from app.services.upstream import UpstreamRateLimited
 
-# Background task to update trending movies every hour
-async def update_trending_movies():
-    while True:
-        try:
-            print("Updating trending movies...")
-            trending_movies = await tmdb_service.get_trending_movies()
-            
-            await manager.broadcast(json.dumps({
-                "type": "trending_update",
-                "data": trending_movies
-            }))
-            
-            # Wait 1 hour before next update
-            await asyncio.sleep(3600)
-            
-        except Exception as e:
-            print(f"Error in background update: {e}")
-            # Wait 5 minutes before retrying on error
-            await asyncio.sleep(300)
+# Shared between workers: snapshots travel over it and each worker broadcasts what it installs
+# to its own sockets; the lease picks the TMDB poller
+backplane = create_backplane(settings.BACKPLANE_URL)
+refresh_lease = LeaderLease("snapshot-refresh")
+snapshot_service.attach(backplane)
+
+# Held so the running prefetch is not garbage collected
+prefetch_tasks = set()
+
+# Push the refreshed trending list to every connected client of this worker, only when it changed
+async def broadcast_trending(snapshots):
+    # Published refreshes leave out lists that came back empty
+    snapshot = snapshots.get("trending_day")
+    if snapshot is None or not snapshot.data:
+        return
+    trending = snapshot.data
+    if manager.set_trending(trending):
+        await manager.broadcast_trending()
+        # Everyone is about to request these posters; have them on disk first
+        posters = [movie.get("poster_path") for movie in trending[:settings.IMAGE_PREFETCH_COUNT]]
+        task = asyncio.create_task(image_cache.prefetch(posters))
+        prefetch_tasks.add(task)
+        task.add_done_callback(prefetch_tasks.discard)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Start background tasks when app starts
     print("Starting Movie Recommender API...")
     
-    # Start background trending update task
-    asyncio.create_task(update_trending_movies())
+    # Open the shared, pooled TMDB client before anything goes upstream
+    await tmdb_service.start()
+    await response_cache.connect(settings.REDIS_URL)
+    await image_cache.start()
+    image_sizes_task = asyncio.create_task(image_cache.run())
+    
+    # Reopen the local catalog; crawl TMDB only when it is still (nearly) empty
+    movie_catalog.open()
+    catalog_task = asyncio.create_task(movie_catalog.run())
+    sync_task = None
+    if movie_catalog.count() < settings.CATALOG_MIN_TITLES:
+        sync_task = asyncio.create_task(sync_catalog())
+    discover_task = asyncio.create_task(discover_engine.run())
+    # Per-client feedback lives next to the catalog; the model retrains in a worker process
+    collaborative_recommender.load()
+    collab_task = asyncio.create_task(collaborative_recommender.run())
+    await search_service.start()
+    search_task = asyncio.create_task(search_service.run())
+    # The local recommender only indexes and rebuilds when it serves requests
+    recommender_task = None
+    if settings.RECOMMENDER_MODE == "local":
+        content_recommender.start()
+        recommender_task = asyncio.create_task(content_recommender.run())
+    
+    # Keep every curated list snapshot warm and broadcast trending after each refresh;
+    # only the lease holder polls TMDB, every worker installs and broadcasts what it publishes
+    await backplane.start()
+    refresh_lease.bind(backplane.redis)
+    lease_task = asyncio.create_task(refresh_lease.run())
+    refresh_task = asyncio.create_task(snapshot_service.run(on_refresh=broadcast_trending, lease=refresh_lease))
+    # Every worker maps the same on-disk graph; the same lease holder recrawls it when stale
+    await graph_service.start()
+    graph_task = asyncio.create_task(graph_service.run(lease=refresh_lease))
     
     yield
     
     # Cleanup when app shuts down
     print("Shutting down Movie Recommender API...")
+    refresh_task.cancel()
+    graph_task.cancel()
+    lease_task.cancel()
+    await refresh_lease.release()
+    await backplane.close()
+    catalog_task.cancel()
+    discover_task.cancel()
+    search_task.cancel()
+    await search_service.save()
+    if recommender_task is not None:
+        recommender_task.cancel()
+    if sync_task is not None:
+        sync_task.cancel()
+    collab_task.cancel()
+    collaborative_recommender.close()
+    movie_catalog.close()
+    image_sizes_task.cancel()
+    await image_cache.close()
+    await tmdb_service.close()
+    await response_cache.close()
 
 # Create FastAPI app
 app = FastAPI(
@@ -59,40 +130,61 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ETags, 304s, Cache-Control and precompressed bodies for the movie routes' GETs
+app.add_middleware(http_cache.HTTPCacheMiddleware, policies=movies.CACHE_CONTROL)
+
+# Time every HTTP request by route template (outermost, so 304s are counted as sent)
+app.add_middleware(MetricsMiddleware)
+
+# Scrape-time gauges read straight from state the services already keep
+registry.gauge_callback("websocket_connections", "Open WebSocket connections", lambda: len(manager.active_connections))
+registry.gauge_callback(
+    "websocket_queued_frames", "Frames waiting in per-client send queues",
+    lambda: sum(len(client.queue) for client in manager.active_connections.values())
+)
+registry.gauge_callback(
+    "snapshot_age_seconds", "Age of each background-refreshed list snapshot",
+    lambda: {(name,): age for name, age in snapshot_service.stats().items()}, ("snapshot",)
+)
+registry.gauge_callback("tmdb_in_flight", "TMDB requests in progress", lambda: tmdb_service._in_flight)
+registry.gauge_callback("tmdb_concurrency_limit", "Adaptive TMDB concurrency limit", lambda: tmdb_service.scheduler.limit)
+registry.gauge_callback(
+    "tmdb_queued_requests", "TMDB requests waiting in the scheduler by priority",
+    lambda: {(level,): count for level, count in tmdb_service.scheduler.stats()["queued"].items()}, ("priority",)
+)
+registry.gauge_callback("tmdb_throttled_responses", "TMDB 429 responses seen by the scheduler, retried ones included", lambda: tmdb_service.scheduler.throttled)
+
+# TMDB kept throttling us: tell the client to come back rather than answering with nothing
+@app.exception_handler(UpstreamRateLimited)
+async def upstream_rate_limited(request, exc: UpstreamRateLimited):
+    retry_after = math.ceil(exc.retry_after) if exc.retry_after is not None else 1
+    return JSONResponse(
+        {"detail": "TMDB rate limit exceeded, retry later"},
+        status_code=503,
+        headers={"Retry-After": str(max(retry_after, 1))}
+    )
+
 # Include routers
 app.include_router(movies.router)
+app.include_router(images.router)
 
 # WebSocket endpoint for real-time updates
 @app.websocket("/ws/{client_id}")
-async def websocket_endpoint(websocket: WebSocket, client_id: str):
-    await manager.connect(websocket)
+async def websocket_endpoint(websocket: WebSocket, client_id: str, trending_version: str = None, delta: bool = False):
+    await manager.connect(websocket, client_id, trending_version, delta)
+    session = ClientSession(websocket, client_id)
     try:
         while True:
-            # Wait for messages from client
+            # Each message runs as its own task so a slow reply never blocks the channel
             data = await websocket.receive_text()
-            message = json.loads(data)
-            
-            if message["type"] == "get_recommendations":
-                movie_id = message["movie_id"]
-                recommendations = await tmdb_service.get_movie_recommendations(movie_id)
-                await websocket.send_text(json.dumps({
-                    "type": "recommendations",
-                    "movie_id": movie_id,
-                    "data": recommendations
-                }))
-            
-            elif message["type"] == "search":
-                query = message["query"]
-                results = await tmdb_service.search_movies(query)
-                await websocket.send_text(json.dumps({
-                    "type": "search_results",
-                    "query": query,
-                    "data": results
-                }))
-                
+            session.dispatch(data)
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
         print(f"Client {client_id} disconnected")
+    except Exception as e:
+        print(f"Error on connection of client {client_id}: {e}")
+    finally:
+        await session.close()
+        await manager.remove(websocket)
 
 # Basic endpoints
 @app.get("/")
@@ -103,9 +195,36 @@ async def root():
         "docs": "/docs"
     }
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    ages = snapshot_service.stats()
+    # Degraded when list snapshots are missing or older than we are willing to serve
+    stale = not ages or max(ages.values()) > settings.SNAPSHOT_MAX_AGE
+    return {
+        "status": "degraded" if stale else "healthy",
+        "upstream": tmdb_service.pool_stats(),
+        "scheduler": tmdb_service.scheduler.stats(),
+        "cache": response_cache.stats(),
+        "rendered_responses": rendered_responses.stats(),
+        "http_cache": http_cache.stats(),
+        "coalescing": tmdb_service.singleflight.stats(),
+        "snapshot_age_seconds": snapshot_service.stats(),
+        "recommender": content_recommender.stats(),
+        "collaborative": collaborative_recommender.stats(),
+        "graph": graph_service.stats(),
+        "images": image_cache.stats(),
+        "catalog": movie_catalog.stats(),
+        "discover": discover_engine.stats(),
+        "search": search_service.index.stats(),
+        "websocket": manager.stats(),
+        "backplane": backplane.stats(),
+        "refresh_lease": refresh_lease.stats()
+    }
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,47 @@
+import os
+import httpx
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, Response
+from app.core.responses import etag_matches
+from app.services.images import ImageEntry, image_cache
+
+router = APIRouter(prefix="/api/images", tags=["images"])
+
+# TMDB image paths never change content, so clients may keep them for a year
+IMMUTABLE = "public, max-age=31536000, immutable"
+# Third-party bytes served from our origin: never sniffed, never run (SVG logos included)
+SAFETY_HEADERS = {"X-Content-Type-Options": "nosniff", "Content-Security-Policy": "sandbox"}
+
+
+class CachedImageResponse(FileResponse):
+    """FileResponse that keeps its cache entry pinned until the body is sent or the client is gone"""
+
+    def __init__(self, entry: ImageEntry, stat_result: os.stat_result, headers: dict):
+        super().__init__(entry.path, headers=headers, stat_result=stat_result)
+        self.entry = entry
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            image_cache.release(self.entry)
+
+
+@router.get("/{size}/{name}")
+async def get_image(size: str, name: str, request: Request):
+    """TMDB poster, backdrop, profile or logo served from the local disk cache (supports Range)"""
+    if not image_cache.valid(size, name):
+        raise HTTPException(status_code=404, detail="Unknown image size or file name")
+    try:
+        entry, stat = await image_cache.acquire(size, name)
+    except httpx.HTTPStatusError as e:
+        status = 404 if e.response.status_code == 404 else 502
+        raise HTTPException(status_code=status, detail=f"Error fetching image: {e.response.status_code}")
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Error fetching image: {str(e)}")
+    headers = {"ETag": entry.etag, "Cache-Control": IMMUTABLE, **SAFETY_HEADERS}
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        image_cache.release(entry)
+        return Response(status_code=304, headers=headers)
+    # Streams from disk, or hands the path to the server when it supports zero-copy pathsend
+    return CachedImageResponse(entry, stat, headers)
@@ -1,19 +1,75 @@
-from fastapi import APIRouter, Query, HTTPException, Path
-from typing import List
-from app.schemas.movie import Movie, MovieSearchResponse, RecommendationRequest
-from app.services.tmdb_service import tmdb_service
+import json
+import asyncio
+from collections import deque
+from fastapi import APIRouter, Depends, Query, HTTPException, Path
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+from app.core.responses import PreEncodedJSONResponse, encode_movies, cached_movie_page
+from app.core.config import settings
+from app.schemas.movie import (
+    Movie, MovieList, MovieSearchResponse, RecommendationRequest, BatchRequest, MultiSeedRequest, MultiSeedResponse
+)
+from app.services.tmdb_service import tmdb_service, BUNDLE_FIELDS, CACHE_TTLS
+from app.services.snapshots import snapshot_service
+from app.services.recommender import get_recommendations, get_multi_seed_recommendations
+from app.services.collaborative import collaborative_recommender
+from app.services.graph import graph_service, similar_page
+from app.services.discover_engine import discover_engine
+from app.services.search_index import suggest
+from app.services.upstream import UpstreamRateLimited
 
 
 router = APIRouter(prefix="/api/movies", tags=["movies"])
 
 
+def public(seconds: int) -> str:
+    # Fresh for max-age, then served stale while the browser revalidates (a cheap 304 when unchanged)
+    return f"public, max-age={seconds}, stale-while-revalidate={seconds}"
+
+
+# Cache-Control per GET route, by how quickly the data changes. Routes listed here also get
+# ETags, 304s and compression from HTTPCacheMiddleware; unlisted routes are left alone.
+CACHE_CONTROL = {
+    # Trending changes are pushed over the WebSocket; the REST copy only seeds page loads
+    "/api/movies/trending": public(60),
+    "/api/movies/popular": public(300),
+    "/api/movies/upcoming": public(300),
+    "/api/movies/top-rated": public(300),
+    "/api/movies/now-playing": public(300),
+    "/api/movies/search": public(60),
+    "/api/movies/search/suggest": public(60),
+    "/api/movies/discover": public(300),
+    "/api/movies/{movie_id}": public(3600),
+    "/api/movies/{movie_id}/bundle": public(3600),
+    "/api/movies/{movie_id}/videos": public(3600),
+    "/api/movies/{movie_id}/credits": public(3600),
+    "/api/movies/{movie_id}/images": public(3600),
+    "/api/movies/{movie_id}/reviews": public(600),
+    "/api/movies/{movie_id}/similar": public(3600),
+    "/api/movies/genres/list": public(86400),
+    "/api/movies/configuration": public(86400),
+    "/api/movies/person/{person_id}": public(3600),
+    "/api/movies/person/{person_id}/movie_credits": public(3600),
+    "/api/movies/trending/person/{time_window}": public(300),
+    "/api/movies/collection/{collection_id}": public(3600),
+    # Changes with every movie this client opens: always revalidate, never in shared caches
+    "/api/movies/personal/{client_id}": "private, no-cache",
+}
+
+
+async def snapshot_response(name: str) -> PreEncodedJSONResponse:
+    """Serve a pre-serialized list snapshot; stale snapshots are refreshed in the background"""
+    snapshot = await snapshot_service.get(name)
+    return PreEncodedJSONResponse(snapshot.body, headers={"X-Snapshot-Age": str(int(snapshot.age))})
+
+
 @router.get("/trending", response_model=List[Movie])
 async def get_trending_movies(time_window: str = Query(default="day", pattern="^(day|week)$")):
-    """Get trending movies - updates in real-time from TMDB"""
+    """Get trending movies - served from a snapshot refreshed in the background"""
     try:
-        movies_data = await tmdb_service.get_trending_movies(time_window)
-        movies = [Movie(**movie) for movie in movies_data]
-        return movies
+        return await snapshot_response(f"trending_{time_window}")
+    except UpstreamRateLimited:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching trending movies: {str(e)}")
 
@@ -22,9 +78,9 @@ async def get_trending_movies(time_window: str = Query(default="day", pattern="^
 async def get_popular_movies():
     """Get popular movies from TMDB"""
     try:
-        movies_data = await tmdb_service.get_popular_movies()
-        movies = [Movie(**movie) for movie in movies_data]
-        return movies
+        return await snapshot_response("popular")
+    except UpstreamRateLimited:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching popular movies: {str(e)}")
 
@@ -33,9 +89,9 @@ async def get_popular_movies():
 async def get_upcoming_movies():
     """Get upcoming movies from TMDB"""
     try:
-        movies_data = await tmdb_service.get_upcoming_movies()
-        movies = [Movie(**movie) for movie in movies_data]
-        return movies
+        return await snapshot_response("upcoming")
+    except UpstreamRateLimited:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching upcoming movies: {str(e)}")
 
@@ -44,9 +100,9 @@ async def get_upcoming_movies():
 async def get_top_rated_movies():
     """Get top rated movies from TMDB"""
     try:
-        movies_data = await tmdb_service.get_top_rated_movies()
-        movies = [Movie(**movie) for movie in movies_data]
-        return movies
+        return await snapshot_response("top_rated")
+    except UpstreamRateLimited:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching top rated movies: {str(e)}")
 
@@ -55,14 +111,14 @@ async def get_top_rated_movies():
 async def get_now_playing_movies():
     """Get now playing movies from TMDB"""
     try:
-        movies_data = await tmdb_service.get_now_playing_movies()
-        movies = [Movie(**movie) for movie in movies_data]
-        return movies
+        return await snapshot_response("now_playing")
+    except UpstreamRateLimited:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching now playing movies: {str(e)}")
 
 
-@router.get("/search")
+@router.get("/search", response_model=MovieSearchResponse)
 async def search_movies(
     q: str = Query(..., min_length=1, description="Search query"),
     page: int = Query(default=1, ge=1, le=1000, description="Page number"),
@@ -70,48 +126,177 @@ async def search_movies(
 ):
     """Search movies in real-time with pagination"""
     try:
-        movies_data = await tmdb_service.search_movies(q, page, include_adult)
-        movies = [Movie(**movie) for movie in movies_data.get('results', [])]
-        
-        return {
-            "results": movies,
-            "page": movies_data.get('page', 1),
-            "total_pages": movies_data.get('total_pages', 1),
-            "total_results": movies_data.get('total_results', 0)
-        }
+        return await cached_movie_page(
+            f"search:{q}:{page}:{include_adult}",
+            CACHE_TTLS["search"],
+            lambda: tmdb_service.search_movies(q, page, include_adult)
+        )
+    except UpstreamRateLimited:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error searching movies: {str(e)}")
 
 
-@router.get("/discover")
-async def discover_movies(
-    with_genres: str = Query(default=None, description="Comma-separated genre IDs"),
-    sort_by: str = Query(default="popularity.desc", description="Sort results by field"),
+@router.get("/search/suggest", response_model=List[Movie])
+async def suggest_movies(
+    q: str = Query(..., min_length=1, description="Partial title"),
+    limit: int = Query(default=10, ge=1, le=20, description="Maximum number of suggestions")
+):
+    """As-you-type title suggestions from the local search index, topped up from TMDB"""
+    try:
+        movies_data = await suggest(q, limit)
+        return PreEncodedJSONResponse(encode_movies(movies_data))
+    except UpstreamRateLimited:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error suggesting movies: {str(e)}")
+
+
+def discover_filters(
+    with_genres: str = Query(
+        default=None, pattern=r"^\s*\d+\s*([,|]\s*\d+\s*)*$", description="Comma-separated genre IDs (use | for any-of)"
+    ),
     year: int = Query(default=None, description="Release year"),
+    year_gte: int = Query(default=None, description="Released in or after this year"),
+    year_lte: int = Query(default=None, description="Released in or before this year"),
     vote_average_gte: float = Query(default=None, ge=0, le=10, description="Minimum rating"),
+    vote_average_lte: float = Query(default=None, ge=0, le=10, description="Maximum rating"),
+    vote_count_gte: int = Query(default=None, ge=0, description="Minimum number of votes")
+) -> Dict:
+    return {
+        "with_genres": with_genres,
+        "year": year,
+        "year_gte": year_gte,
+        "year_lte": year_lte,
+        "vote_average_gte": vote_average_gte,
+        "vote_average_lte": vote_average_lte,
+        "vote_count_gte": vote_count_gte
+    }
+
+
+async def discover_page(page: int, sort_by: str, filters: Dict) -> Dict:
+    """One discover page: local index when it fully covers the filter, TMDB otherwise"""
+    movies_data = None
+    if discover_engine.can_serve(sort_by):
+        movies_data = discover_engine.discover(page=page, sort_by=sort_by, **filters)
+    if movies_data is None:
+        movies_data = await tmdb_service.discover_movies(sort_by=sort_by, page=page, **filters)
+        # TMDB's total tells the engine whether the catalog can answer this filter next time
+        discover_engine.confirm(filters, movies_data)
+    return movies_data
+
+
+@router.get("/discover", response_model=MovieSearchResponse)
+async def discover_movies(
+    filters: Dict = Depends(discover_filters),
+    sort_by: str = Query(default="popularity.desc", description="Sort results by field"),
     page: int = Query(default=1, ge=1, le=1000, description="Page number")
 ):
-    """Discover movies with filters"""
+    """Discover movies with filters - answered from the local catalog when it can, TMDB otherwise"""
     try:
-        movies_data = await tmdb_service.discover_movies(
-            with_genres=with_genres,
-            sort_by=sort_by,
-            year=year,
-            vote_average_gte=vote_average_gte,
-            page=page
+        # Local answers are only valid for the index they were computed from
+        version = discover_engine.index.version if discover_engine.can_serve(sort_by) else "tmdb"
+        query = ":".join(f"{key}={value}" for key, value in filters.items() if value is not None)
+        return await cached_movie_page(
+            f"discover:{version}:{sort_by}:{page}:{query}",
+            CACHE_TTLS["discover"],
+            lambda: discover_page(page, sort_by, filters)
         )
-        movies = [Movie(**movie) for movie in movies_data.get('results', [])]
-        
-        return {
-            "results": movies,
-            "page": movies_data.get('page', 1),
-            "total_pages": movies_data.get('total_pages', 1),
-            "total_results": movies_data.get('total_results', 0)
-        }
+    except UpstreamRateLimited:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error discovering movies: {str(e)}")
 
 
+def stream_error(code: str, message: str) -> bytes:
+    return json.dumps({"error": {"code": code, "message": message}}).encode() + b"\n"
+
+
+async def iter_result_pages(fetch: Callable[[int], Awaitable[Dict]], first: int, pages: int, limit: Optional[int]) -> AsyncIterator[bytes]:
+    """NDJSON, one movie per line, for pages first..first + pages - 1 in page order.
+
+    Pages are fetched concurrently through a sliding window of STREAM_PAGE_WINDOW, and a
+    page is written as soon as it and every page before it are done, so at most a window
+    of pages is ever held. Movies already sent are skipped; the stream ends at limit
+    results, at the last page, or at the first empty page (TMDBService's error result).
+    Headers are long gone when a fetch raises, so the failure becomes a final
+    {"error": {"code", "message"}} line instead of a silently truncated stream.
+    """
+    last = first + pages - 1
+    window: Deque[Tuple[int, asyncio.Task]] = deque()
+    next_page = first
+    seen = set()
+    sent = 0
+    try:
+        while window or next_page <= last:
+            while next_page <= last and len(window) < settings.STREAM_PAGE_WINDOW:
+                window.append((next_page, asyncio.create_task(fetch(next_page))))
+                next_page += 1
+            page, task = window.popleft()
+            data = await task
+            total_pages = data.get("total_pages") or 0
+            if total_pages < last:
+                # Fewer pages exist than were asked for; drop the ones past the end
+                last = total_pages
+                while window and window[-1][0] > last:
+                    window.pop()[1].cancel()
+            fresh = []
+            for movie in data.get("results") or []:
+                if movie.get("id") not in seen:
+                    seen.add(movie.get("id"))
+                    fresh.append(movie)
+            if limit is not None:
+                fresh = fresh[:limit - sent]
+            if not data.get("results"):
+                return
+            if fresh:
+                sent += len(fresh)
+                yield b"".join(movie.model_dump_json().encode() + b"\n" for movie in MovieList.validate_python(fresh))
+            if limit is not None and sent >= limit:
+                return
+    except UpstreamRateLimited:
+        yield stream_error("rate_limited", "TMDB rate limit exceeded, retry later")
+    except Exception as e:
+        print(f"Error streaming result pages: {e}")
+        yield stream_error("upstream_error", "Fetching results failed")
+    finally:
+        for _, task in window:
+            task.cancel()
+
+
+def stream_range(pages: int):
+    if pages > settings.STREAM_MAX_PAGES:
+        raise HTTPException(status_code=400, detail=f"At most {settings.STREAM_MAX_PAGES} pages per stream")
+
+
+@router.get("/search/stream")
+async def stream_search_movies(
+    q: str = Query(..., min_length=1, description="Search query"),
+    page: int = Query(default=1, ge=1, le=1000, description="First page"),
+    pages: int = Query(default=10, ge=1, description="Number of pages to fetch"),
+    limit: int = Query(default=None, ge=1, description="Stop after this many movies"),
+    include_adult: bool = Query(default=False, description="Include adult content")
+):
+    """Search results across many pages as NDJSON (one movie per line), streamed in page order"""
+    stream_range(pages)
+    lines = iter_result_pages(lambda n: tmdb_service.search_movies(q, n, include_adult), page, pages, limit)
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+
+@router.get("/discover/stream")
+async def stream_discover_movies(
+    filters: Dict = Depends(discover_filters),
+    sort_by: str = Query(default="popularity.desc", description="Sort results by field"),
+    page: int = Query(default=1, ge=1, le=1000, description="First page"),
+    pages: int = Query(default=10, ge=1, description="Number of pages to fetch"),
+    limit: int = Query(default=None, ge=1, description="Stop after this many movies")
+):
+    """Discover results across many pages as NDJSON (one movie per line), streamed in page order"""
+    stream_range(pages)
+    lines = iter_result_pages(lambda n: discover_page(n, sort_by, filters), page, pages, limit)
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+
 @router.get("/{movie_id}")
 async def get_movie_details(movie_id: int):
     """Get detailed movie information including genres, production companies, etc."""
@@ -122,16 +307,56 @@ async def get_movie_details(movie_id: int):
         return movie_data
     except HTTPException:
         raise
+    except UpstreamRateLimited:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching movie details: {str(e)}")
 
 
+@router.get("/{movie_id}/bundle")
+async def get_movie_bundle(
+    movie_id: int,
+    fields: str = Query(
+        default=",".join(BUNDLE_FIELDS),
+        description="Comma-separated parts to include: " + ", ".join(BUNDLE_FIELDS)
+    )
+):
+    """Get details, credits, videos, images, reviews, similar and recommendations in one call"""
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in BUNDLE_FIELDS]
+    if unknown or not requested:
+        raise HTTPException(status_code=400, detail=f"Unknown bundle fields: {', '.join(unknown)}")
+    try:
+        bundle = await tmdb_service.get_movie_bundle(movie_id, requested)
+        if not bundle:
+            raise HTTPException(status_code=404, detail="Movie not found")
+        if "similar" in bundle:
+            similar = bundle["similar"]
+            bundle["similar"] = {
+                "results": MovieList.validate_python(similar.get('results', [])),
+                "page": similar.get('page', 1),
+                "total_pages": similar.get('total_pages', 1),
+                "total_results": similar.get('total_results', 0)
+            }
+        if "recommendations" in bundle:
+            bundle["recommendations"] = MovieList.validate_python(bundle["recommendations"])
+        return bundle
+    except HTTPException:
+        raise
+    except UpstreamRateLimited:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching movie bundle: {str(e)}")
+
+
 @router.get("/{movie_id}/videos")
 async def get_movie_videos(movie_id: int):
     """Get movie videos (trailers, teasers, clips, etc.)"""
     try:
         videos = await tmdb_service.get_movie_videos(movie_id)
         return videos
+    except UpstreamRateLimited:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching movie videos: {str(e)}")
 
@@ -142,6 +367,8 @@ async def get_movie_credits(movie_id: int):
     try:
         credits = await tmdb_service.get_movie_credits(movie_id)
         return credits
+    except UpstreamRateLimited:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching movie credits: {str(e)}")
 
@@ -152,6 +379,8 @@ async def get_movie_images(movie_id: int):
     try:
         images = await tmdb_service.get_movie_images(movie_id)
         return images
+    except UpstreamRateLimited:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching movie images: {str(e)}")
 
@@ -165,47 +394,104 @@ async def get_movie_reviews(
     try:
         reviews = await tmdb_service.get_movie_reviews(movie_id, page)
         return reviews
+    except UpstreamRateLimited:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching movie reviews: {str(e)}")
 
 
-@router.get("/{movie_id}/similar")
+@router.get("/{movie_id}/similar", response_model=MovieSearchResponse)
 async def get_similar_movies(
     movie_id: int,
     page: int = Query(default=1, ge=1, le=1000, description="Page number")
 ):
     """Get movies similar to the given movie"""
     try:
-        movies_data = await tmdb_service.get_similar_movies(movie_id, page)
-        movies = [Movie(**movie) for movie in movies_data.get('results', [])]
-        
-        return {
-            "results": movies,
-            "page": movies_data.get('page', 1),
-            "total_pages": movies_data.get('total_pages', 1),
-            "total_results": movies_data.get('total_results', 0)
-        }
+        return await cached_movie_page(
+            f"similar:{graph_service.version or 'tmdb'}:{movie_id}:{page}",
+            CACHE_TTLS["similar"],
+            lambda: similar_page(movie_id, page)
+        )
+    except UpstreamRateLimited:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching similar movies: {str(e)}")
 
 
-@router.post("/recommendations")
+@router.post("/recommendations", response_model=List[Movie])
 async def get_movie_recommendations(request: RecommendationRequest):
     """Get movie recommendations based on a given movie"""
     try:
-        recommendations_data = await tmdb_service.get_movie_recommendations(request.movie_id)
-        recommendations = [Movie(**movie) for movie in recommendations_data]
-        return recommendations
+        recommendations_data = await get_recommendations(request.movie_id)
+        return PreEncodedJSONResponse(encode_movies(recommendations_data))
+    except UpstreamRateLimited:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching recommendations: {str(e)}")
+
+
+@router.post("/recommendations/multi", response_model=MultiSeedResponse)
+async def get_multi_seed_movie_recommendations(request: MultiSeedRequest):
+    """Recommendations fused from several weighted seed movies, e.g. a watch history"""
+    if len(request.seeds) > settings.MULTI_SEED_MAX_SEEDS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.MULTI_SEED_MAX_SEEDS} seeds per request")
+    try:
+        return await get_multi_seed_recommendations(
+            [(seed.movie_id, seed.weight) for seed in request.seeds], request.limit, request.fusion
+        )
+    except UpstreamRateLimited:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching recommendations: {str(e)}")
 
 
+@router.get("/personal/{client_id}", response_model=List[Movie])
+async def get_personal_recommendations(client_id: str, limit: int = Query(default=20, ge=1, le=100)):
+    """Personalized recommendations from this client's history; X-Personalized is false for the trending fallback"""
+    try:
+        movies, personalized = await collaborative_recommender.recommend(client_id, limit)
+        return PreEncodedJSONResponse(encode_movies(movies), headers={"X-Personalized": str(personalized).lower()})
+    except UpstreamRateLimited:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching personal recommendations: {str(e)}")
+
+
+@router.post("/batch")
+async def get_movies_batch(request: BatchRequest):
+    """Get details for many movies at once; ids that fail are reported in errors instead of failing the batch"""
+    try:
+        items = {item["id"]: item async for item in tmdb_service.iter_movie_batch(request.ids, request.fields)}
+        ordered = [items[movie_id] for movie_id in dict.fromkeys(request.ids)]
+        return {
+            "results": [item["data"] for item in ordered if "data" in item],
+            "errors": [{"id": item["id"], **item["error"]} for item in ordered if "error" in item]
+        }
+    except UpstreamRateLimited:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching movie batch: {str(e)}")
+
+
+@router.post("/batch/stream")
+async def stream_movies_batch(request: BatchRequest):
+    """Same as /batch, streamed as NDJSON: one {"id", "data"} or {"id", "error"} line per movie as it resolves"""
+
+    async def lines():
+        async for item in tmdb_service.iter_movie_batch(request.ids, request.fields):
+            yield json.dumps(item) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
 @router.get("/genres/list")
 async def get_movie_genres():
     """Get list of all movie genres"""
     try:
         genres = await tmdb_service.get_movie_genres()
         return genres
+    except UpstreamRateLimited:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching movie genres: {str(e)}")
 
@@ -220,6 +506,8 @@ async def get_person_details(person_id: int):
         return person_data
     except HTTPException:
         raise
+    except UpstreamRateLimited:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching person details: {str(e)}")
 
@@ -230,6 +518,8 @@ async def get_person_movie_credits(person_id: int):
     try:
         credits = await tmdb_service.get_person_movie_credits(person_id)
         return credits
+    except UpstreamRateLimited:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching person movie credits: {str(e)}")
 
@@ -241,6 +531,8 @@ async def get_tmdb_configuration():
     try:
         config = await tmdb_service.get_configuration()
         return config
+    except UpstreamRateLimited:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching configuration: {str(e)}")
 
@@ -253,6 +545,8 @@ async def get_trending_people(
     try:
         people_data = await tmdb_service.get_trending_people(time_window)
         return people_data
+    except UpstreamRateLimited:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching trending people: {str(e)}")
 
@@ -267,6 +561,8 @@ async def get_movie_collection(collection_id: int):
         return collection_data
     except HTTPException:
         raise
+    except UpstreamRateLimited:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching movie collection: {str(e)}")
 
@@ -1,5 +1,6 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field, TypeAdapter
+from typing import List, Literal, Optional
+from app.core.config import settings
 
 class Genre(BaseModel):
     id: Optional[int] = None
@@ -25,3 +26,28 @@ class MovieSearchResponse(BaseModel):
 
 class RecommendationRequest(BaseModel):
     movie_id: int
+
+class Seed(BaseModel):
+    movie_id: int
+    weight: float = Field(default=1.0, gt=0)
+
+class MultiSeedRequest(BaseModel):
+    seeds: List[Seed] = Field(..., min_length=1)
+    limit: int = Field(default=20, ge=1, le=100)
+    # "rrf": reciprocal rank fusion; "score": weighted sum of each seed's normalized rank scores
+    fusion: Literal["rrf", "score"] = "rrf"
+
+class MultiSeedResponse(BaseModel):
+    results: List[Movie]
+    # Seeds whose neighbours could not be fetched; the rest still contribute
+    failed_seeds: List[int]
+
+class BatchRequest(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=settings.BATCH_MAX_IDS)
+    # Detail keys to return (id is always included); credits, videos, reviews, similar and
+    # recommendations are fetched inline. None returns the full details object.
+    fields: Optional[List[str]] = None
+
+# Bulk validators: one pydantic-core pass per list; unknown TMDB fields are dropped
+MovieList = TypeAdapter(List[Movie])
+MoviePage = TypeAdapter(MovieSearchResponse)
@@ -0,0 +1,204 @@
+import uuid
+import asyncio
+from typing import Awaitable, Callable, Dict, List
+from app.core.config import settings
+from app.services.cache import InMemoryRedis
+
+Handler = Callable[[str], Awaitable[None]]
+
+# Extend or release a lease only while we are still its holder
+RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class InProcessBackplane:
+    """Pub/sub within one process: single-node deployments and tests"""
+
+    def __init__(self):
+        self._handlers: Dict[str, List[Handler]] = {}
+        # Lease storage; one process is trivially the only contender
+        self.redis = InMemoryRedis()
+        self.published = 0
+        self.delivered = 0
+        self.errors = 0
+
+    def subscribe(self, channel: str, handler: Handler):
+        """Register before start(); every worker, publisher included, receives each message"""
+        self._handlers.setdefault(channel, []).append(handler)
+
+    async def start(self):
+        pass
+
+    async def publish(self, channel: str, message: str):
+        self.published += 1
+        await self._deliver(channel, message)
+
+    async def _deliver(self, channel: str, message: str):
+        for handler in self._handlers.get(channel, []):
+            try:
+                await handler(message)
+                self.delivered += 1
+            except Exception as e:
+                self.errors += 1
+                print(f"Error handling backplane message on {channel}: {e}")
+
+    async def close(self):
+        pass
+
+    def stats(self) -> Dict:
+        return {
+            "backend": "in-process",
+            "channels": sorted(self._handlers),
+            "published": self.published,
+            "delivered": self.delivered,
+            "errors": self.errors,
+        }
+
+
+class RedisBackplane(InProcessBackplane):
+    """Pub/sub across workers and nodes over Redis PUBLISH/SUBSCRIBE"""
+
+    def __init__(self, url: str):
+        super().__init__()
+        self.url = url
+        self._pubsub = None
+        self._listener = None
+
+    async def start(self):
+        import redis.asyncio as redis
+        client = redis.from_url(self.url)
+        try:
+            await client.ping()
+        except Exception as e:
+            print(f"Redis backplane unavailable, delivering in-process only: {e}")
+            await client.aclose()
+            return
+        self.redis = client
+        self._pubsub = client.pubsub()
+        await self._pubsub.subscribe(*(settings.BACKPLANE_PREFIX + channel for channel in self._handlers))
+        self._listener = asyncio.create_task(self._listen())
+        print(f"Backplane connected to Redis, channels: {', '.join(self._handlers)}")
+
+    async def publish(self, channel: str, message: str):
+        if self._pubsub is None:
+            return await super().publish(channel, message)
+        self.published += 1
+        try:
+            await self.redis.publish(settings.BACKPLANE_PREFIX + channel, message)
+        except Exception as e:
+            # Keep this worker's own clients current even when the fan-out fails
+            self.errors += 1
+            print(f"Backplane publish failed, delivering locally: {e}")
+            await self._deliver(channel, message)
+
+    async def _listen(self):
+        while True:
+            try:
+                async for message in self._pubsub.listen():
+                    if message["type"] == "message":
+                        channel = message["channel"].decode()[len(settings.BACKPLANE_PREFIX):]
+                        await self._deliver(channel, message["data"].decode())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                print(f"Backplane subscription error: {e}")
+                await asyncio.sleep(1)
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+        await self.redis.aclose()
+
+    def stats(self) -> Dict:
+        return {**super().stats(), "backend": "redis" if self._pubsub is not None else "in-process"}
+
+
+def create_backplane(url: str = "") -> InProcessBackplane:
+    """Redis for redis:// URLs, in-process otherwise"""
+    return RedisBackplane(url) if url.startswith(("redis://", "rediss://")) else InProcessBackplane()
+
+
+class LeaderLease:
+    """A named lease held by at most one worker: SET NX PX to take it, renewed by the holder.
+
+    A holder that stops renewing (crash, partition) loses it after LEASE_TTL and another
+    worker picks it up on its next attempt.
+    """
+
+    def __init__(self, name: str):
+        self.key = f"{settings.BACKPLANE_PREFIX}lease:{name}"
+        self.token = uuid.uuid4().hex
+        self.redis = None
+        self.held = False
+        self.acquisitions = 0
+        self.losses = 0
+
+    def bind(self, redis):
+        self.redis = redis
+
+    async def acquire(self) -> bool:
+        ttl_ms = int(settings.LEASE_TTL * 1000)
+        try:
+            if self.held:
+                held = await self._renew(ttl_ms)
+            else:
+                held = bool(await self.redis.set(self.key, self.token, nx=True, px=ttl_ms))
+        except Exception as e:
+            print(f"Error renewing lease {self.key}: {e}")
+            held = False
+        if held and not self.held:
+            self.acquisitions += 1
+            print(f"Acquired lease {self.key}")
+        elif self.held and not held:
+            self.losses += 1
+            print(f"Lost lease {self.key}")
+        self.held = held
+        return held
+
+    async def _renew(self, ttl_ms: int) -> bool:
+        if hasattr(self.redis, "eval"):
+            return bool(await self.redis.eval(RENEW_SCRIPT, 1, self.key, self.token, ttl_ms))
+        # InMemoryRedis never yields between these calls, so the check-and-set is atomic
+        if await self.redis.get(self.key) != self.token.encode():
+            return False
+        await self.redis.set(self.key, self.token, px=ttl_ms)
+        return True
+
+    async def release(self):
+        if not self.held or self.redis is None:
+            return
+        self.held = False
+        try:
+            if hasattr(self.redis, "eval"):
+                await self.redis.eval(RELEASE_SCRIPT, 1, self.key, self.token)
+            elif await self.redis.get(self.key) == self.token.encode():
+                await self.redis.delete(self.key)
+        except Exception as e:
+            print(f"Error releasing lease {self.key}: {e}")
+
+    async def run(self):
+        """Keep trying to take the lease, and keep renewing it once held"""
+        while True:
+            await self.acquire()
+            await asyncio.sleep(settings.LEASE_RENEW_INTERVAL)
+
+    def stats(self) -> Dict:
+        return {
+            "key": self.key,
+            "held": self.held,
+            "acquisitions": self.acquisitions,
+            "losses": self.losses,
+        }
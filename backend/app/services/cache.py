@@ -0,0 +1,271 @@
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from app.core.config import settings
+
+# Characters Redis MATCH patterns treat specially; cache keys contain "?" and may contain the rest
+GLOB_SPECIAL = re.compile(r"([*?\[\]\\])")
+
+
+def key_has_prefix(key: str, prefix: str, separators: str) -> bool:
+    """key starts with prefix as a whole segment: "/movie/550" covers "/movie/550?..." and
+    "/movie/550/credits?..." but not "/movie/5501?...". A prefix that already ends in a
+    separator (or is empty) matches anything under it."""
+    if not key.startswith(prefix):
+        return False
+    if not prefix or prefix[-1] in separators or len(key) == len(prefix):
+        return True
+    return key[len(prefix)] in separators
+
+
+def redis_glob(pattern: str) -> "re.Pattern":
+    """Compile the Redis MATCH syntax the cache sends (* and ? wildcards, backslash escapes) to a regex"""
+    out = []
+    escaped = False
+    for c in pattern:
+        if escaped:
+            out.append(re.escape(c))
+            escaped = False
+        elif c == "\\":
+            escaped = True
+        elif c == "*":
+            out.append(".*")
+        elif c == "?":
+            out.append(".")
+        else:
+            out.append(re.escape(c))
+    return re.compile("".join(out) + r"\Z", re.S)
+
+
+class LRUCache:
+    """Bounded in-process tier: evicts least recently used entries by count and by bytes"""
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: bytes, ttl: float):
+        if len(value) > self.max_bytes:
+            return
+        if key in self._data:
+            self._remove(key)
+        self._data[key] = (value, time.monotonic() + ttl)
+        self._bytes += len(value)
+        while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._data))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def delete(self, key: str) -> bool:
+        if key in self._data:
+            self._remove(key)
+            return True
+        return False
+
+    def delete_prefix(self, prefix: str, separators: str = "") -> int:
+        """Drop keys starting with prefix; with separators, only where the prefix ends a segment"""
+        if separators:
+            keys = [key for key in self._data if key_has_prefix(key, prefix, separators)]
+        else:
+            keys = [key for key in self._data if key.startswith(prefix)]
+        for key in keys:
+            self._remove(key)
+        return len(keys)
+
+    def clear(self):
+        self._data.clear()
+        self._bytes = 0
+
+    def _remove(self, key: str):
+        value, _ = self._data.pop(key)
+        self._bytes -= len(value)
+
+    def stats(self) -> Dict:
+        return {
+            "entries": len(self._data),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class InMemoryRedis:
+    """Local stand-in for the subset of redis.asyncio.Redis the cache uses (tests, single-node dev)"""
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[bytes, Optional[float]]] = {}
+
+    def _alive(self, key: str) -> bool:
+        entry = self._data.get(key)
+        if entry is None:
+            return False
+        if entry[1] is not None and entry[1] <= time.monotonic():
+            del self._data[key]
+            return False
+        return True
+
+    async def get(self, name: str) -> Optional[bytes]:
+        return self._data[name][0] if self._alive(name) else None
+
+    async def set(self, name: str, value, ex: Optional[float] = None, nx: bool = False, px: Optional[int] = None):
+        if nx and self._alive(name):
+            return None
+        if px is not None:
+            ex = px / 1000
+        if isinstance(value, str):
+            value = value.encode()
+        self._data[name] = (value, time.monotonic() + ex if ex else None)
+        return True
+
+    async def delete(self, *names: str) -> int:
+        removed = 0
+        for name in names:
+            if self._alive(name):
+                del self._data[name]
+                removed += 1
+        return removed
+
+    async def scan_iter(self, match: str = "*", count: Optional[int] = None):
+        pattern = redis_glob(match)
+        for key in list(self._data):
+            if self._alive(key) and pattern.match(key):
+                yield key
+
+    async def ping(self) -> bool:
+        return True
+
+    async def aclose(self):
+        self._data.clear()
+
+
+class ResponseCache:
+    """Two-tier cache for raw upstream response bodies: in-process LRU in front of optional Redis"""
+
+    # Keys are "<TMDB path>?<query>"; a prefix only matches whole path segments
+    KEY_SEPARATORS = "/?"
+
+    def __init__(self, local: LRUCache, prefix: str = "tmdb:"):
+        self.local = local
+        self.prefix = prefix
+        self.redis = None
+        self.redis_hits = 0
+        self.redis_misses = 0
+        self.redis_errors = 0
+
+    async def connect(self, redis_url: str = ""):
+        """Attach the shared tier; "memory://" uses the in-process stand-in"""
+        if not redis_url:
+            return
+        if redis_url.startswith("memory://"):
+            self.redis = InMemoryRedis()
+            return
+        import redis.asyncio as redis
+        client = redis.from_url(redis_url)
+        try:
+            await client.ping()
+            self.redis = client
+            print("Response cache connected to Redis")
+        except Exception as e:
+            print(f"Redis unavailable, using in-process cache only: {e}")
+            await client.aclose()
+
+    async def close(self):
+        if self.redis is not None:
+            await self.redis.aclose()
+            self.redis = None
+
+    async def get(self, key: str) -> Optional[bytes]:
+        value = self.local.get(key)
+        if value is not None or self.redis is None:
+            return value
+        try:
+            value = await self.redis.get(self.prefix + key)
+        except Exception as e:
+            self.redis_errors += 1
+            print(f"Redis cache get failed: {e}")
+            return None
+        if value is None:
+            self.redis_misses += 1
+            return None
+        self.redis_hits += 1
+        # Promote to the local tier; the remaining Redis TTL is unknown, so keep it short
+        self.local.set(key, value, settings.CACHE_PROMOTE_TTL)
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        self.local.set(key, value, ttl)
+        if self.redis is None:
+            return
+        try:
+            await self.redis.set(self.prefix + key, value, ex=int(max(ttl, 1)))
+        except Exception as e:
+            self.redis_errors += 1
+            print(f"Redis cache set failed: {e}")
+
+    async def invalidate(self, key: str):
+        self.local.delete(key)
+        if self.redis is not None:
+            try:
+                await self.redis.delete(self.prefix + key)
+            except Exception as e:
+                self.redis_errors += 1
+                print(f"Redis cache delete failed: {e}")
+
+    async def invalidate_prefix(self, prefix: str) -> int:
+        removed = self.local.delete_prefix(prefix, self.KEY_SEPARATORS)
+        if self.redis is not None:
+            full = self.prefix + prefix
+            try:
+                keys = [
+                    key async for key in self.redis.scan_iter(match=GLOB_SPECIAL.sub(r"\\\1", full) + "*")
+                    if key_has_prefix(key.decode() if isinstance(key, bytes) else key, full, self.KEY_SEPARATORS)
+                ]
+                if keys:
+                    removed += await self.redis.delete(*keys)
+            except Exception as e:
+                self.redis_errors += 1
+                print(f"Redis cache prefix delete failed: {e}")
+        return removed
+
+    def stats(self) -> Dict:
+        return {
+            "local": self.local.stats(),
+            "redis": {
+                "enabled": self.redis is not None,
+                "hits": self.redis_hits,
+                "misses": self.redis_misses,
+                "errors": self.redis_errors,
+            },
+        }
+
+
+response_cache = ResponseCache(
+    LRUCache(settings.CACHE_MAX_ENTRIES, settings.CACHE_MAX_BYTES),
+    prefix=settings.CACHE_KEY_PREFIX,
+)
@@ -0,0 +1,372 @@
+import os
+import json
+import time
+import zlib
+import asyncio
+import sqlite3
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+from app.core.config import settings
+from app.services.tmdb_service import tmdb_service, APPENDABLE_FIELDS
+from app.services.upstream import PREFETCH, priority
+
+MOVIE_COLUMNS = (
+    "id", "title", "original_title", "overview", "poster_path", "backdrop_path",
+    "vote_average", "vote_count", "release_date", "genre_ids", "popularity",
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS movies (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    original_title TEXT,
+    overview TEXT,
+    poster_path TEXT,
+    backdrop_path TEXT,
+    vote_average REAL,
+    vote_count INTEGER,
+    release_date TEXT,
+    genre_ids TEXT,
+    popularity REAL,
+    details BLOB,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS movies_popularity ON movies (popularity DESC);
+CREATE TABLE IF NOT EXISTS interactions (
+    client_id TEXT NOT NULL,
+    movie_id INTEGER NOT NULL,
+    weight REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (client_id, movie_id)
+);
+"""
+
+UPSERT = f"""
+INSERT INTO movies ({", ".join(MOVIE_COLUMNS)}, details, updated_at)
+VALUES ({", ".join("?" for _ in MOVIE_COLUMNS)}, ?, ?)
+ON CONFLICT(id) DO UPDATE SET
+    {", ".join(f"{column} = excluded.{column}" for column in MOVIE_COLUMNS[1:])},
+    details = COALESCE(excluded.details, movies.details),
+    updated_at = excluded.updated_at
+"""
+
+# Typed per-column values for the discover index, in id order. Unparseable release dates
+# become DAY_MISSING rather than failing the whole read.
+DAY_MISSING = -2147483648
+INDEX_COLUMNS = f"""
+SELECT
+    id,
+    COALESCE(vote_average, 0.0),
+    COALESCE(vote_count, 0),
+    COALESCE(popularity, 0.0),
+    COALESCE(CASE WHEN release_date GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]'
+             THEN CAST(julianday(release_date) - 2440587.5 AS INTEGER) END, {DAY_MISSING}),
+    COALESCE(genre_ids, '')
+FROM movies
+ORDER BY id
+"""
+# Case-insensitive title orderings, ties broken by id
+TITLE_ORDERS = {
+    "title": "SELECT id FROM movies ORDER BY lower(title), id",
+    "original_title": "SELECT id FROM movies ORDER BY lower(COALESCE(original_title, title)), id",
+}
+
+ADD_INTERACTION = """
+INSERT INTO interactions (client_id, movie_id, weight, updated_at) VALUES (?, ?, ?, ?)
+ON CONFLICT(client_id, movie_id) DO UPDATE SET
+    weight = interactions.weight + excluded.weight,
+    updated_at = excluded.updated_at
+"""
+# What collaborative filtering keeps in memory: the most recent events of the most recently
+# active clients (client_id comes from the URL, so anything beyond that is never read again)
+KEPT_INTERACTIONS = """
+WITH clients AS (
+    SELECT client_id FROM interactions GROUP BY client_id ORDER BY MAX(updated_at) DESC LIMIT :clients
+), ranked AS (
+    SELECT rowid AS id, client_id, movie_id, weight, updated_at,
+           ROW_NUMBER() OVER (PARTITION BY client_id ORDER BY updated_at DESC, movie_id) AS position
+    FROM interactions WHERE client_id IN clients
+), kept AS (
+    SELECT * FROM ranked WHERE position <= :events
+)
+"""
+RECENT_INTERACTIONS = KEPT_INTERACTIONS + "SELECT client_id, movie_id, weight FROM kept ORDER BY updated_at, movie_id"
+# DELETE first: sqlite3 only reports rowcount for statements that start with it
+PRUNE_INTERACTIONS = f"DELETE FROM interactions WHERE rowid NOT IN ({KEPT_INTERACTIONS} SELECT id FROM kept)"
+
+
+class MovieCatalog:
+    """Persistent local copy of every movie TMDBService has seen, stored in SQLite.
+
+    Movie fields live in typed columns for cheap point and bulk reads; full detail
+    responses are kept zlib-compressed and only decoded on request. Writes go through
+    one connection under a lock; reads use a connection per thread, which WAL lets run
+    alongside a write, so the event loop never waits for a flush.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._readers: List[sqlite3.Connection] = []
+        self._pending: Dict[int, tuple] = {}
+        # Rows taken for the write in progress; still readable until it commits
+        self._flushing: Dict[int, tuple] = {}
+        self.version = 0
+
+    def open(self):
+        if self._conn is not None:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        print(f"Movie catalog opened with {self.count()} titles")
+
+    def close(self):
+        if self._conn is not None:
+            self.flush()
+            with self._lock:
+                self._conn.close()
+                self._conn = None
+                for reader in self._readers:
+                    reader.close()
+                self._readers = []
+                self._local = threading.local()
+
+    def _reader(self) -> sqlite3.Connection:
+        """This thread's read-only connection, opened on first use"""
+        reader = getattr(self._local, "conn", None)
+        if reader is None:
+            reader = sqlite3.connect(self.path, check_same_thread=False)
+            reader.execute("PRAGMA query_only=ON")
+            self._local.conn = reader
+            with self._lock:
+                self._readers.append(reader)
+        return reader
+
+    def observe(self, movies: List[Dict]):
+        """TMDBService listener: queue movies for the next batched upsert"""
+        if self._conn is None:
+            return
+        now = time.time()
+        for movie in movies:
+            row = self._row(movie, now)
+            if row is None:
+                continue
+            previous = self._pending.get(row[0])
+            if previous is not None and row[-2] is None:
+                # Keep details queued from an earlier response for the same movie
+                row = row[:-2] + (previous[-2], now)
+            self._pending[row[0]] = row
+
+    @staticmethod
+    def _row(movie: Dict, now: float) -> Optional[tuple]:
+        if movie.get("id") is None or not movie.get("title"):
+            return None
+        genre_ids = movie.get("genre_ids")
+        if genre_ids is None:
+            genre_ids = [genre["id"] for genre in movie.get("genres") or [] if genre.get("id") is not None]
+        details = None
+        if "genres" in movie or "runtime" in movie:
+            full = {key: value for key, value in movie.items() if key not in APPENDABLE_FIELDS}
+            details = zlib.compress(json.dumps(full, separators=(",", ":")).encode())
+        return (
+            movie["id"],
+            movie["title"],
+            movie.get("original_title"),
+            movie.get("overview"),
+            movie.get("poster_path"),
+            movie.get("backdrop_path"),
+            movie.get("vote_average"),
+            movie.get("vote_count"),
+            movie.get("release_date"),
+            ",".join(str(genre_id) for genre_id in genre_ids),
+            movie.get("popularity"),
+            details,
+            now,
+        )
+
+    def upsert_many(self, movies: List[Dict]) -> int:
+        now = time.time()
+        rows = [row for row in (self._row(movie, now) for movie in movies) if row is not None]
+        return self._write(rows)
+
+    def flush(self) -> int:
+        try:
+            return self._write(self._take_pending())
+        finally:
+            self._flushing = {}
+
+    async def flush_async(self) -> int:
+        # Swap the queue on the event loop thread, write it from a worker thread
+        try:
+            return await asyncio.to_thread(self._write, self._take_pending())
+        finally:
+            self._flushing = {}
+
+    def _take_pending(self) -> List[tuple]:
+        self._flushing = self._pending
+        self._pending = {}
+        return list(self._flushing.values())
+
+    def _write(self, rows: List[tuple]) -> int:
+        if not rows or self._conn is None:
+            return 0
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(UPSERT, rows)
+        self.version += 1
+        return len(rows)
+
+    @staticmethod
+    def _movie(row: tuple) -> Dict:
+        movie = dict(zip(MOVIE_COLUMNS, row))
+        movie["genre_ids"] = [int(genre_id) for genre_id in movie["genre_ids"].split(",") if genre_id]
+        return movie
+
+    def get(self, movie_id: int) -> Optional[Dict]:
+        row = self._reader().execute(
+            f"SELECT {', '.join(MOVIE_COLUMNS)} FROM movies WHERE id = ?", (movie_id,)
+        ).fetchone()
+        return self._movie(row) if row else None
+
+    def get_many(self, movie_ids: List[int]) -> Dict[int, Dict]:
+        """Movies by id, including those still queued for the next flush"""
+        found: Dict[int, Dict] = {}
+        ids = []
+        for movie_id in dict.fromkeys(movie_ids):
+            pending = self._pending.get(movie_id) or self._flushing.get(movie_id)
+            if pending is not None:
+                found[movie_id] = self._movie(pending[:len(MOVIE_COLUMNS)])
+            else:
+                ids.append(movie_id)
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            rows = self._reader().execute(
+                f"SELECT {', '.join(MOVIE_COLUMNS)} FROM movies WHERE id IN ({', '.join('?' for _ in chunk)})",
+                chunk,
+            ).fetchall()
+            for row in rows:
+                found[row[0]] = self._movie(row)
+        return found
+
+    def get_details(self, movie_id: int) -> Optional[Dict]:
+        row = self._reader().execute("SELECT details FROM movies WHERE id = ?", (movie_id,)).fetchone()
+        if not row or row[0] is None:
+            return None
+        return json.loads(zlib.decompress(row[0]))
+
+    def iter_movies(self, batch_size: int = 5000) -> Iterator[List[Dict]]:
+        """Stream the whole catalog in id order without materializing it"""
+        last_id = -1
+        while True:
+            rows = self._reader().execute(
+                f"SELECT {', '.join(MOVIE_COLUMNS)} FROM movies WHERE id > ? ORDER BY id LIMIT ?",
+                (last_id, batch_size),
+            ).fetchall()
+            if not rows:
+                return
+            yield [self._movie(row) for row in rows]
+            last_id = rows[-1][0]
+
+    def index_columns(self) -> Tuple[List[tuple], Dict[str, List[int]]]:
+        """INDEX_COLUMNS transposed (one tuple per column), plus movie ids in each TITLE_ORDERS order.
+
+        Typing, date parsing and sorting all happen inside SQLite, which releases the GIL.
+        """
+        reader = self._reader()
+        # One read transaction, so every query sees the same snapshot
+        reader.execute("BEGIN")
+        try:
+            rows = reader.execute(INDEX_COLUMNS).fetchall()
+            orders = {name: [row[0] for row in reader.execute(query)] for name, query in TITLE_ORDERS.items()}
+        finally:
+            reader.execute("COMMIT")
+        columns = list(zip(*rows)) if rows else [()] * 6
+        return columns, orders
+
+    def top_ids(self, limit: int) -> List[int]:
+        """Most popular movie ids"""
+        rows = self._reader().execute("SELECT id FROM movies ORDER BY popularity DESC LIMIT ?", (limit,)).fetchall()
+        return [row[0] for row in rows]
+
+    def add_interactions(self, rows: List[tuple]) -> int:
+        """Accumulate (client_id, movie_id, weight) implicit feedback"""
+        if not rows or self._conn is None:
+            return 0
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(ADD_INTERACTION, [row + (now,) for row in rows])
+        return len(rows)
+
+    def interactions(self, max_clients: int, max_events: int) -> List[tuple]:
+        """The latest max_events interactions of the max_clients most recently active clients, oldest first"""
+        return self._reader().execute(RECENT_INTERACTIONS, {"clients": max_clients, "events": max_events}).fetchall()
+
+    def prune_interactions(self, max_clients: int, max_events: int) -> int:
+        """Delete every interaction interactions() would no longer return"""
+        if self._conn is None:
+            return 0
+        with self._lock:
+            with self._conn:
+                return self._conn.execute(PRUNE_INTERACTIONS, {"clients": max_clients, "events": max_events}).rowcount
+
+    def count(self) -> int:
+        return self._reader().execute("SELECT COUNT(*) FROM movies").fetchone()[0]
+
+    async def run(self):
+        """Background writer: flush queued upserts off the event loop"""
+        while True:
+            await asyncio.sleep(settings.CATALOG_FLUSH_INTERVAL)
+            try:
+                await self.flush_async()
+            except Exception as e:
+                print(f"Error flushing movie catalog: {e}")
+
+    def stats(self) -> Dict:
+        return {
+            "titles": self.count() if self._conn is not None else 0,
+            "pending": len(self._pending),
+            "version": self.version,
+        }
+
+
+movie_catalog = MovieCatalog(settings.CATALOG_PATH)
+tmdb_service.add_listener(movie_catalog.observe)
+
+
+async def sync_catalog(pages: int = None):
+    """Bulk crawl discover and the curated lists; listeners upsert everything that comes back"""
+    pages = settings.CATALOG_SYNC_PAGES if pages is None else pages
+    semaphore = asyncio.Semaphore(settings.CATALOG_SYNC_CONCURRENCY)
+
+    async def crawl(fetch):
+        async with semaphore:
+            try:
+                await fetch()
+            except Exception as e:
+                print(f"Error syncing movie catalog: {e}")
+
+    print(f"Syncing movie catalog: {pages} discover pages...")
+    fetches = [
+        tmdb_service.get_popular_movies,
+        tmdb_service.get_top_rated_movies,
+        tmdb_service.get_upcoming_movies,
+        tmdb_service.get_now_playing_movies,
+    ]
+    fetches += [
+        lambda page=page: tmdb_service.discover_movies(sort_by="popularity.desc", page=page)
+        for page in range(1, pages + 1)
+    ]
+    # Queued behind user requests and snapshot refreshes
+    with priority(PREFETCH):
+        await asyncio.gather(*(crawl(fetch) for fetch in fetches))
+    written = await movie_catalog.flush_async()
+    print(f"Movie catalog sync finished, {movie_catalog.count()} titles ({written} written in final flush)")
@@ -0,0 +1,255 @@
+import time
+import asyncio
+import numpy as np
+import scipy.sparse as sp
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.services.catalog import movie_catalog
+from app.services.snapshots import snapshot_service
+from app.services.tmdb_service import tmdb_service
+
+
+def solve_row(fixed: np.ndarray, gram: np.ndarray, columns: np.ndarray, counts: np.ndarray, alpha: float) -> np.ndarray:
+    """One least-squares step: (YtY + Yi^T (Ci - I) Yi + reg*I)^-1 Yi^T Ci, over this row's observed columns only.
+
+    gram is YtY + reg*I, shared by every row; preference is 1 for each observed pair.
+    """
+    observed = fixed[columns]
+    confidence = 1 + alpha * counts
+    a = gram + (observed.T * (confidence - 1)) @ observed
+    return np.linalg.solve(a, observed.T @ confidence)
+
+
+def train_als(matrix: sp.csr_matrix, factors: int, regularization: float, alpha: float, iterations: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Implicit-feedback ALS (Hu, Koren & Volinsky). CPU bound; runs in a worker process"""
+    rng = np.random.default_rng(0)
+    n_users, n_items = matrix.shape
+    users = rng.normal(0, 0.01, (n_users, factors))
+    items = rng.normal(0, 0.01, (n_items, factors))
+    matrix_t = matrix.T.tocsr()
+    identity = regularization * np.eye(factors)
+    for _ in range(iterations):
+        for rows, fixed, target in ((matrix, items, users), (matrix_t, users, items)):
+            gram = fixed.T @ fixed + identity
+            for row in range(rows.shape[0]):
+                start, end = rows.indptr[row], rows.indptr[row + 1]
+                if start < end:
+                    target[row] = solve_row(fixed, gram, rows.indices[start:end], rows.data[start:end], alpha)
+    return users.astype(np.float32), items.astype(np.float32)
+
+
+def interaction_matrix(histories: List[Dict[int, float]]) -> Tuple[np.ndarray, sp.csr_matrix]:
+    """Client x movie interaction counts, plus the movie id of each column"""
+    columns: Dict[int, int] = {}
+    rows, cols, weights = [], [], []
+    for row, seen in enumerate(histories):
+        for movie_id, weight in seen.items():
+            rows.append(row)
+            cols.append(columns.setdefault(movie_id, len(columns)))
+            weights.append(weight)
+    matrix = sp.csr_matrix(
+        (np.array(weights, dtype=np.float64), (rows, cols)),
+        shape=(len(histories), len(columns)),
+    )
+    return np.fromiter(columns, dtype=np.int64, count=len(columns)), matrix
+
+
+class CollaborativeModel:
+    """Trained item factors plus what serving needs; replaced whole after each training run"""
+
+    def __init__(self, item_ids: np.ndarray, item_factors: np.ndarray, matrix: sp.csr_matrix, clients: int):
+        self.item_ids = item_ids
+        self.columns = {int(movie_id): column for column, movie_id in enumerate(item_ids)}
+        self.item_factors = item_factors
+        factors = item_factors.shape[1]
+        self.gram = item_factors.T.astype(np.float64) @ item_factors + settings.COLLAB_REGULARIZATION * np.eye(factors)
+        # Most-opened first, for clients with nothing the model knows yet
+        self.popularity = np.asarray(matrix.sum(axis=0), dtype=np.float32).ravel()
+        self.clients = clients
+        self.interactions = matrix.nnz
+        self.trained_at = time.time()
+
+
+class CollaborativeRecommender:
+    """Personalized recommendations from implicit feedback keyed by WebSocket client_id.
+
+    Each movie a client asks recommendations for counts as one interaction. Interactions
+    live in memory, bounded per client and in clients, and are persisted to the catalog database; an ALS factorization is
+    retrained periodically in a worker process. Serving folds the client's current history
+    into the item factors, so interactions made since the last training already count,
+    then scores every item with one matrix-vector product and masks what was seen.
+    """
+
+    def __init__(self):
+        # Least recently active client first; within a client, least recently opened movie first
+        self.history: "OrderedDict[str, OrderedDict[int, float]]" = OrderedDict()
+        self.model: Optional[CollaborativeModel] = None
+        self._pending: Dict[Tuple[str, int], float] = {}
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._version = 0
+        self._trained_version = 0
+        self._last_trained = 0.0
+        self._last_pruned = 0.0
+        self.interactions = 0
+        self.trainings = 0
+        self.train_seconds = 0.0
+        self.errors = 0
+        self.pruned = 0
+        self.requests = 0
+        self.fallbacks = 0
+        self.forgotten = 0
+
+    def load(self):
+        for client_id, movie_id, weight in movie_catalog.interactions(settings.COLLAB_MAX_CLIENTS, settings.COLLAB_MAX_EVENTS_PER_CLIENT):
+            self._remember(client_id, movie_id, weight)
+        self._version += 1
+        print(f"Collaborative filtering loaded {self.interactions} interactions from {len(self.history)} clients")
+
+    def record(self, client_id: str, movie_id: int, weight: float = 1.0):
+        self._remember(client_id, movie_id, weight)
+        key = (client_id, movie_id)
+        self._pending[key] = self._pending.get(key, 0.0) + weight
+        self._version += 1
+
+    def _remember(self, client_id: str, movie_id: int, weight: float):
+        seen = self.history.get(client_id)
+        if seen is None:
+            seen = self.history[client_id] = OrderedDict()
+            if len(self.history) > settings.COLLAB_MAX_CLIENTS:
+                _, dropped = self.history.popitem(last=False)
+                self.interactions -= len(dropped)
+                self.forgotten += len(dropped)
+        else:
+            self.history.move_to_end(client_id)
+        if movie_id in seen:
+            seen.move_to_end(movie_id)
+        else:
+            self.interactions += 1
+            if len(seen) >= settings.COLLAB_MAX_EVENTS_PER_CLIENT:
+                seen.popitem(last=False)
+                self.interactions -= 1
+                self.forgotten += 1
+        seen[movie_id] = seen.get(movie_id, 0.0) + weight
+
+    async def train(self):
+        version = self._version
+        # Attempts count, so a failing one also waits COLLAB_TRAIN_INTERVAL before the next
+        self._last_trained = time.monotonic()
+        # Copy the (bounded) histories on the loop, build the sparse matrix in a thread
+        histories = [dict(seen) for seen in self.history.values()]
+        item_ids, matrix = await asyncio.to_thread(interaction_matrix, histories)
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=1)
+        started = time.perf_counter()
+        _, item_factors = await asyncio.get_running_loop().run_in_executor(
+            self._executor, train_als, matrix,
+            settings.COLLAB_FACTORS, settings.COLLAB_REGULARIZATION, settings.COLLAB_ALPHA, settings.COLLAB_ITERATIONS,
+        )
+        self.model = CollaborativeModel(item_ids, item_factors, matrix, matrix.shape[0])
+        self._trained_version = version
+        self._last_trained = time.monotonic()
+        self.trainings += 1
+        self.train_seconds = time.perf_counter() - started
+        print(f"Collaborative model trained: {matrix.shape[0]} clients x {matrix.shape[1]} movies in {self.train_seconds:.2f}s")
+
+    def _should_train(self) -> bool:
+        return (
+            self._version != self._trained_version
+            and self.interactions >= settings.COLLAB_MIN_INTERACTIONS
+            and time.monotonic() - self._last_trained >= settings.COLLAB_TRAIN_INTERVAL
+        )
+
+    async def flush(self) -> int:
+        rows = [key + (weight,) for key, weight in self._pending.items()]
+        self._pending = {}
+        return await asyncio.to_thread(movie_catalog.add_interactions, rows)
+
+    async def prune(self) -> int:
+        """Drop stored interactions of clients and events memory has forgotten"""
+        self._last_pruned = time.monotonic()
+        pruned = await asyncio.to_thread(
+            movie_catalog.prune_interactions, settings.COLLAB_MAX_CLIENTS, settings.COLLAB_MAX_EVENTS_PER_CLIENT
+        )
+        self.pruned += pruned
+        return pruned
+
+    async def run(self):
+        """Persist new interactions, prune old ones and retrain when enough time and feedback have accumulated"""
+        while True:
+            try:
+                await self.flush()
+                if time.monotonic() - self._last_pruned >= settings.COLLAB_TRAIN_INTERVAL:
+                    await self.prune()
+                if self._should_train():
+                    await self.train()
+            except Exception as e:
+                self.errors += 1
+                print(f"Error updating collaborative model: {e}")
+            await asyncio.sleep(settings.CATALOG_FLUSH_INTERVAL)
+
+    def close(self):
+        movie_catalog.add_interactions([key + (weight,) for key, weight in self._pending.items()])
+        self._pending = {}
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def recommend_ids(self, client_id: str, limit: int = 20) -> Tuple[List[int], bool]:
+        """Top movie ids for a client and whether they are personalized (False: most opened overall)"""
+        model = self.model
+        if model is None:
+            return [], False
+        seen = self.history.get(client_id, {})
+        known = [(model.columns[movie_id], weight) for movie_id, weight in seen.items() if movie_id in model.columns]
+        if known:
+            columns = np.array([column for column, _ in known])
+            counts = np.array([weight for _, weight in known])
+            user = solve_row(model.item_factors, model.gram, columns, counts, settings.COLLAB_ALPHA).astype(np.float32)
+            scores = model.item_factors @ user
+        else:
+            columns = np.array([], dtype=np.int64)
+            scores = model.popularity.copy()
+        scores[columns] = -np.inf
+        k = min(limit, len(scores) - len(columns))
+        if k <= 0:
+            return [], bool(known)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [int(model.item_ids[i]) for i in top], bool(known)
+
+    async def recommend(self, client_id: str, limit: int = 20) -> Tuple[List[Dict], bool]:
+        """Movies for a client; trending minus what they have seen until a model exists"""
+        self.requests += 1
+        movie_ids, personalized = self.recommend_ids(client_id, limit)
+        if not movie_ids:
+            self.fallbacks += 1
+            seen = self.history.get(client_id, {})
+            trending = (await snapshot_service.get("trending_day")).data
+            return [movie for movie in trending if movie.get("id") not in seen][:limit], False
+        found = movie_catalog.get_many(movie_ids)
+        missing = [movie_id for movie_id in movie_ids if movie_id not in found]
+        for movie in await asyncio.gather(*(tmdb_service.get_movie_details(movie_id) for movie_id in missing)):
+            if movie:
+                found[movie["id"]] = movie
+        return [found[movie_id] for movie_id in movie_ids if movie_id in found], personalized
+
+    def stats(self) -> Dict:
+        model = self.model
+        return {
+            "clients": len(self.history),
+            "interactions": self.interactions,
+            "forgotten": self.forgotten,
+            "pruned": self.pruned,
+            "pending": len(self._pending),
+            "model_clients": model.clients if model else 0,
+            "model_movies": len(model.item_ids) if model else 0,
+            "trainings": self.trainings,
+            "last_train_seconds": round(self.train_seconds, 3),
+            "errors": self.errors,
+            "requests": self.requests,
+            "fallbacks": self.fallbacks,
+        }
+
+
+collaborative_recommender = CollaborativeRecommender()
@@ -0,0 +1,214 @@
+import time
+import asyncio
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.services.catalog import DAY_MISSING, movie_catalog
+
+PAGE_SIZE = 20
+
+# TMDB sort_by prefixes we can answer locally, mapped to index columns
+SORT_COLUMNS = {
+    "popularity": "popularity",
+    "vote_average": "vote_average",
+    "vote_count": "vote_count",
+    "primary_release_date": "release_day",
+    "release_date": "release_day",
+    "title": "title_rank",
+    "original_title": "original_title_rank",
+}
+
+
+class DiscoverIndex:
+    """Immutable column-oriented snapshot of the catalog with one precomputed ordering per sort key"""
+
+    def __init__(self, columns: List[tuple], title_orders: Dict[str, List[int]], version: int):
+        """columns and title_orders as returned by MovieCatalog.index_columns()"""
+        ids, vote_average, vote_count, popularity, release_day, genre_lists = columns
+        n = len(ids)
+        self.version = version
+        self.size = n
+        self.ids = np.array(ids, dtype=np.int32)
+        self.vote_average = np.array(vote_average, dtype=np.float32)
+        self.vote_count = np.array(vote_count, dtype=np.int32)
+        self.popularity = np.array(popularity, dtype=np.float32)
+        self.release_day = np.array(release_day, dtype=np.int32)
+        missing = self.release_day == DAY_MISSING
+        years = self.release_day.astype("datetime64[D]").astype("datetime64[Y]").astype(np.int64) + 1970
+        self.year = np.where(missing, 0, years).astype(np.int16)
+        self.title_rank = self._ranks(title_orders["title"])
+        self.original_title_rank = self._ranks(title_orders["original_title"])
+
+        # Genre bitmasks: flatten every "28,12" list once, then set bits without a per-row loop
+        counts = np.fromiter((len(g.split(",")) if g else 0 for g in genre_lists), dtype=np.int64, count=n)
+        flat = ",".join(g for g in genre_lists if g)
+        genre_ids = np.array(flat.split(","), dtype=np.int64) if flat else np.zeros(0, dtype=np.int64)
+        kept = np.unique(genre_ids)[:64]
+        self.genre_bits = {int(genre_id): np.uint64(1) << np.uint64(bit) for bit, genre_id in enumerate(kept)}
+        masks = np.zeros(n, dtype=np.uint64)
+        if len(kept):
+            bits = np.searchsorted(kept, genre_ids)
+            valid = genre_ids <= kept[-1]
+            rows = np.repeat(np.arange(n), counts)
+            np.bitwise_or.at(masks, rows[valid], np.left_shift(np.uint64(1), bits[valid].astype(np.uint64)))
+        self.genre_mask = masks
+
+        # Ascending orderings; descending is the reversed view, so sorting never happens per query
+        self.orders = {name: np.argsort(getattr(self, name), kind="stable") for name in set(SORT_COLUMNS.values())}
+
+    def _ranks(self, ordered_ids: List[int]) -> np.ndarray:
+        """Position of each row in an ordering given as movie ids"""
+        ranks = np.zeros(self.size, dtype=np.int32)
+        ranks[np.searchsorted(self.ids, np.array(ordered_ids, dtype=np.int32))] = np.arange(self.size, dtype=np.int32)
+        return ranks
+
+    def genre_filter(self, with_genres: str) -> Optional[np.ndarray]:
+        """TMDB semantics: "a,b" requires every genre, "a|b" requires any of them"""
+        any_of = "|" in with_genres
+        wanted = [int(g) for g in with_genres.replace("|", ",").split(",") if g.strip().isdigit()]
+        bits = [self.genre_bits.get(genre_id) for genre_id in wanted]
+        if any_of:
+            bits = [bit for bit in bits if bit is not None]
+            if not bits:
+                return np.zeros(self.size, dtype=bool)
+            combined = np.bitwise_or.reduce(np.array(bits, dtype=np.uint64))
+            return (self.genre_mask & combined) != 0
+        if any(bit is None for bit in bits):
+            return np.zeros(self.size, dtype=bool)
+        combined = np.bitwise_or.reduce(np.array(bits, dtype=np.uint64))
+        return (self.genre_mask & combined) == combined
+
+    def select(self, filters: Dict, sort_by: str) -> np.ndarray:
+        mask = np.ones(self.size, dtype=bool)
+        if filters.get("with_genres"):
+            mask &= self.genre_filter(filters["with_genres"])
+        if filters.get("year"):
+            mask &= self.year == filters["year"]
+        if filters.get("year_gte"):
+            mask &= self.year >= filters["year_gte"]
+        if filters.get("year_lte"):
+            mask &= (self.year <= filters["year_lte"]) & (self.year > 0)
+        if filters.get("vote_average_gte") is not None:
+            mask &= self.vote_average >= filters["vote_average_gte"]
+        if filters.get("vote_average_lte") is not None:
+            mask &= self.vote_average <= filters["vote_average_lte"]
+        if filters.get("vote_count_gte"):
+            mask &= self.vote_count >= filters["vote_count_gte"]
+
+        field, _, direction = sort_by.partition(".")
+        order = self.orders[SORT_COLUMNS[field]]
+        if direction != "asc":
+            order = order[::-1]
+        return self.ids[order[mask[order]]]
+
+
+class DiscoverEngine:
+    """Answers /discover from the local catalog; callers fall back to TMDB when it cannot.
+
+    The catalog only holds the titles that have been synced or seen, so a filter is
+    answered locally only once TMDB has reported its total for that filter (through a
+    fallback response passed to confirm) and the local selection has at least as many.
+    """
+
+    def __init__(self):
+        self.index: Optional[DiscoverIndex] = None
+        self._selections: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        # filter -> (TMDB total_results, monotonic time it was seen)
+        self._totals: "OrderedDict[tuple, Tuple[int, float]]" = OrderedDict()
+        self.queries = 0
+        self.selection_hits = 0
+        self.fallbacks = 0
+
+    @staticmethod
+    def _filter_key(filters: Dict) -> tuple:
+        return tuple(sorted((k, v) for k, v in filters.items() if v is not None))
+
+    def confirm(self, filters: Dict, data: Dict):
+        """Record TMDB's total_results for a filter; it holds for every sort order"""
+        total = data.get("total_results")
+        if not total:
+            return
+        key = self._filter_key(filters)
+        self._totals[key] = (total, time.monotonic())
+        self._totals.move_to_end(key)
+        if len(self._totals) > settings.DISCOVER_COVERAGE_MAX_FILTERS:
+            self._totals.popitem(last=False)
+
+    def covered(self, filters: Dict, found: int) -> bool:
+        """Whether the catalog holds every title TMDB has for this filter"""
+        confirmed = self._totals.get(self._filter_key(filters))
+        if confirmed is None or time.monotonic() - confirmed[1] > settings.DISCOVER_COVERAGE_TTL:
+            return False
+        return found >= confirmed[0]
+
+    def can_serve(self, sort_by: str) -> bool:
+        field = (sort_by or "popularity.desc").partition(".")[0]
+        return (
+            settings.DISCOVER_MODE == "local"
+            and self.index is not None
+            and self.index.size >= settings.CATALOG_MIN_TITLES
+            and field in SORT_COLUMNS
+        )
+
+    def discover(self, page: int = 1, sort_by: str = "popularity.desc", **filters) -> Optional[Dict]:
+        index = self.index
+        sort_by = sort_by or "popularity.desc"
+        key = (index.version, sort_by) + self._filter_key(filters)
+        selected = self._selections.get(key)
+        if selected is None:
+            selected = index.select(filters, sort_by)
+            self._selections[key] = selected
+            if len(self._selections) > settings.DISCOVER_SELECTION_CACHE:
+                self._selections.popitem(last=False)
+        else:
+            # Later pages of the same filter only cost the page slice
+            self._selections.move_to_end(key)
+            self.selection_hits += 1
+        self.queries += 1
+
+        total = len(selected)
+        start = (page - 1) * PAGE_SIZE
+        if total == 0 or start >= total or not self.covered(filters, total):
+            self.fallbacks += 1
+            return None
+        page_ids = selected[start:start + PAGE_SIZE].tolist()
+        found = movie_catalog.get_many(page_ids)
+        return {
+            "results": [found[movie_id] for movie_id in page_ids if movie_id in found],
+            "page": page,
+            "total_pages": -(-total // PAGE_SIZE),
+            "total_results": total,
+        }
+
+    def rebuild(self) -> DiscoverIndex:
+        version = movie_catalog.version
+        columns, title_orders = movie_catalog.index_columns()
+        return DiscoverIndex(columns, title_orders, version)
+
+    async def run(self):
+        """Rebuild the column snapshot off the event loop whenever the catalog has changed"""
+        built_version = None
+        while True:
+            try:
+                if movie_catalog.version != built_version:
+                    started = time.perf_counter()
+                    index = await asyncio.to_thread(self.rebuild)
+                    self.index, built_version = index, index.version
+                    self._selections.clear()
+                    print(f"Discover index rebuilt: {index.size} titles in {time.perf_counter() - started:.2f}s")
+            except Exception as e:
+                print(f"Error rebuilding discover index: {e}")
+            await asyncio.sleep(settings.DISCOVER_REBUILD_INTERVAL)
+
+    def stats(self) -> Dict:
+        return {
+            "titles": self.index.size if self.index is not None else 0,
+            "queries": self.queries,
+            "selection_hits": self.selection_hits,
+            "fallbacks": self.fallbacks,
+            "confirmed_filters": len(self._totals),
+        }
+
+
+discover_engine = DiscoverEngine()
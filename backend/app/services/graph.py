@@ -0,0 +1,272 @@
+import os
+import json
+import time
+import shutil
+import asyncio
+import argparse
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.services.catalog import movie_catalog
+from app.services.tmdb_service import tmdb_service
+from app.services.upstream import PREFETCH, priority
+
+# Edge types crawled from TMDB, each stored as its own CSR structure over the same rows
+KINDS = ("recommendations", "similar")
+PAGE_SIZE = 20
+# Ids are stored as int32; anything outside cannot be in the graph
+ID_RANGE = np.iinfo(np.int32)
+
+
+class RecommendationGraph:
+    """Crawled movie -> neighbour edges in CSR form.
+
+    Rows are the crawled movies in ascending id order, so finding a row is a binary
+    search. offsets[row]:offsets[row + 1] slices that row's neighbours (movie ids, not
+    rows: most neighbours were never crawled themselves) and their rank weights.
+    Loaded arrays are read-only memory maps, so every worker shares the same pages.
+    """
+
+    def __init__(self, ids: np.ndarray, edges: Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]], version: str, created_at: float):
+        self.ids = ids
+        self.edges = edges
+        self.version = version
+        self.created_at = created_at
+
+    @classmethod
+    def build(cls, adjacency: Dict[str, Dict[int, List[int]]]) -> "RecommendationGraph":
+        """adjacency: kind -> movie id -> neighbour ids, best first"""
+        ids = np.array(sorted({movie_id for lists in adjacency.values() for movie_id in lists}), dtype=np.int32)
+        edges = {}
+        for kind in KINDS:
+            lists = [list(dict.fromkeys(adjacency.get(kind, {}).get(int(movie_id), []))) for movie_id in ids]
+            lengths = np.fromiter((len(neighbours) for neighbours in lists), dtype=np.int32, count=len(lists))
+            offsets = np.concatenate(([0], np.cumsum(lengths))).astype(np.int32)
+            neighbours = np.fromiter((n for neighbours in lists for n in neighbours), dtype=np.int32, count=int(offsets[-1]))
+            # Rank weight: 1 for the best neighbour, decaying with position
+            ranks = np.arange(offsets[-1], dtype=np.float32) - np.repeat(offsets[:-1], lengths)
+            edges[kind] = (offsets, neighbours, (1 / np.sqrt(ranks + 1)).astype(np.float32))
+        return cls(ids, edges, time.strftime("%Y%m%d-%H%M%S"), time.time())
+
+    def save(self, path: str) -> str:
+        """Write a new version directory, then switch the CURRENT pointer to it atomically"""
+        directory = os.path.join(path, self.version)
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "ids.npy"), self.ids)
+        for kind, arrays in self.edges.items():
+            for name, array in zip(("offsets", "neighbours", "weights"), arrays):
+                np.save(os.path.join(directory, f"{kind}_{name}.npy"), array)
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump({"created_at": self.created_at, "nodes": len(self.ids), "edges": self.edge_count()}, f)
+        pointer = os.path.join(path, "CURRENT")
+        with open(f"{pointer}.tmp", "w") as f:
+            f.write(self.version)
+        os.replace(f"{pointer}.tmp", pointer)
+        # Unlinked files stay valid for workers still mapping them until they remap
+        for name in os.listdir(path):
+            full = os.path.join(path, name)
+            if os.path.isdir(full) and name < self.version:
+                shutil.rmtree(full, ignore_errors=True)
+        return self.version
+
+    @classmethod
+    def load(cls, path: str, version: str) -> "RecommendationGraph":
+        directory = os.path.join(path, version)
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+
+        def mapped(name: str) -> np.ndarray:
+            # Plain ndarray view of the map: slicing a np.memmap subclass costs more than the lookup itself
+            return np.asarray(np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r"))
+
+        edges = {kind: tuple(mapped(f"{kind}_{name}") for name in ("offsets", "neighbours", "weights")) for kind in KINDS}
+        return cls(mapped("ids"), edges, version, meta["created_at"])
+
+    def _rows(self, movie_ids: np.ndarray) -> np.ndarray:
+        """Row of each id, -1 where the id was not crawled"""
+        rows = np.searchsorted(self.ids, movie_ids)
+        rows = np.minimum(rows, len(self.ids) - 1)
+        return np.where(self.ids[rows] == movie_ids, rows, -1)
+
+    def neighbours(self, kind: str, movie_id: int, limit: int, hops: int = 2, decay: float = 0.5) -> List[int]:
+        """Ranked neighbours; hop-2 edges score weight(a->b) * weight(b->c) * decay, summed over paths"""
+        if not len(self.ids) or not ID_RANGE.min <= movie_id <= ID_RANGE.max:
+            return []
+        offsets, neighbours, weights = self.edges[kind]
+        row = self._rows(np.array([movie_id], dtype=np.int32))[0]
+        if row < 0 or offsets[row] == offsets[row + 1]:
+            return []
+        start, end = offsets[row], offsets[row + 1]
+        candidates, scores = [neighbours[start:end]], [weights[start:end]]
+        if hops >= 2:
+            rows = self._rows(neighbours[start:end])
+            via = rows >= 0
+            starts, ends = offsets[rows[via]], offsets[rows[via] + 1]
+            lengths = (ends - starts).astype(np.int64)
+            if lengths.sum():
+                # Flat positions of every second-hop edge, without a Python loop
+                firsts = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+                positions = np.arange(lengths.sum()) + firsts
+                candidates.append(neighbours[positions])
+                scores.append(weights[positions] * np.repeat(weights[start:end][via], lengths) * decay)
+        candidates = np.concatenate(candidates)
+        unique, inverse = np.unique(candidates, return_inverse=True)
+        totals = np.bincount(inverse, weights=np.concatenate(scores).astype(np.float64))
+        totals[unique == movie_id] = -np.inf
+        k = min(limit, len(unique))
+        top = np.argpartition(-totals, k - 1)[:k]
+        top = top[np.argsort(-totals[top], kind="stable")]
+        return [int(unique[i]) for i in top if np.isfinite(totals[i])]
+
+    def edge_count(self) -> int:
+        return sum(int(offsets[-1]) for offsets, _, _ in self.edges.values())
+
+
+class GraphService:
+    """Owns the mapped graph: remaps new versions as they appear, and crawls TMDB when due"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.graph: Optional[RecommendationGraph] = None
+        self._next_attempt = 0.0
+        self.lookups = 0
+        self.hits = 0
+        self.crawls = 0
+
+    @property
+    def version(self) -> Optional[str]:
+        return self.graph.version if self.graph is not None else None
+
+    def load(self):
+        """Map the CURRENT version if it is not the one already mapped"""
+        try:
+            with open(os.path.join(self.path, "CURRENT")) as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            return
+        if version and version != self.version:
+            self.graph = RecommendationGraph.load(self.path, version)
+            print(f"Recommendation graph {version} mapped: {len(self.graph.ids)} movies, {self.graph.edge_count()} edges")
+
+    async def start(self):
+        try:
+            await asyncio.to_thread(self.load)
+        except Exception as e:
+            print(f"Error mapping recommendation graph: {e}")
+
+    def recommend(self, kind: str, movie_id: int, limit: int = 20) -> List[int]:
+        graph = self.graph
+        if graph is None:
+            return []
+        self.lookups += 1
+        movie_ids = graph.neighbours(kind, movie_id, limit, settings.GRAPH_HOPS, settings.GRAPH_HOP_DECAY)
+        if movie_ids:
+            self.hits += 1
+        return movie_ids
+
+    async def crawl(self, top_n: int = None) -> RecommendationGraph:
+        """Walk recommendations and similar edges for the most popular catalog titles"""
+        top_n = settings.GRAPH_TOP_N if top_n is None else top_n
+        movie_ids = await asyncio.to_thread(movie_catalog.top_ids, top_n)
+        semaphore = asyncio.Semaphore(settings.GRAPH_CRAWL_CONCURRENCY)
+        adjacency: Dict[str, Dict[int, List[int]]] = {kind: {} for kind in KINDS}
+
+        async def visit(movie_id: int):
+            async with semaphore:
+                recommendations, similar = await asyncio.gather(
+                    tmdb_service.get_movie_recommendations(movie_id),
+                    tmdb_service.get_similar_movies(movie_id),
+                )
+            adjacency["recommendations"][movie_id] = [movie["id"] for movie in recommendations]
+            adjacency["similar"][movie_id] = [movie["id"] for movie in similar.get("results", [])]
+
+        print(f"Crawling recommendation graph for {len(movie_ids)} movies...")
+        started = time.perf_counter()
+        # Queued behind user requests and snapshot refreshes
+        with priority(PREFETCH):
+            await asyncio.gather(*(visit(movie_id) for movie_id in movie_ids))
+        graph = await asyncio.to_thread(RecommendationGraph.build, adjacency)
+        if not graph.edge_count():
+            raise RuntimeError("crawl returned no edges")
+        await asyncio.to_thread(graph.save, self.path)
+        # Neighbours came back through the listeners; make them readable before serving them
+        await movie_catalog.flush_async()
+        self.crawls += 1
+        print(f"Recommendation graph crawled: {graph.edge_count()} edges in {time.perf_counter() - started:.1f}s")
+        await asyncio.to_thread(self.load)
+        return graph
+
+    def _crawl_due(self) -> bool:
+        if time.monotonic() < self._next_attempt:
+            return False
+        if self.graph is not None and time.time() - self.graph.created_at < settings.GRAPH_CRAWL_INTERVAL:
+            return False
+        # Wait for the initial catalog sync rather than crawling a handful of titles
+        return movie_catalog.count() >= min(settings.GRAPH_TOP_N, settings.CATALOG_MIN_TITLES)
+
+    async def run(self, lease=None):
+        """Remap versions written by any worker; only the lease holder crawls"""
+        while True:
+            try:
+                await asyncio.to_thread(self.load)
+                if settings.GRAPH_CRAWL_INTERVAL > 0 and (lease is None or lease.held) and self._crawl_due():
+                    await self.crawl()
+            except Exception as e:
+                self._next_attempt = time.monotonic() + settings.SNAPSHOT_RETRY_INTERVAL
+                print(f"Error updating recommendation graph: {e}")
+            await asyncio.sleep(settings.GRAPH_RELOAD_INTERVAL)
+
+    def stats(self) -> Dict:
+        graph = self.graph
+        return {
+            "version": self.version,
+            "movies": len(graph.ids) if graph is not None else 0,
+            "edges": graph.edge_count() if graph is not None else 0,
+            "age_seconds": round(time.time() - graph.created_at) if graph is not None else None,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "crawls": self.crawls,
+        }
+
+
+graph_service = GraphService(settings.GRAPH_PATH)
+
+
+def graph_movies(kind: str, movie_id: int, limit: int = 20) -> List[Dict]:
+    """Ranked neighbour movies from the local graph and catalog; [] when the movie was not crawled"""
+    movie_ids = graph_service.recommend(kind, movie_id, limit)
+    if not movie_ids:
+        return []
+    found = movie_catalog.get_many(movie_ids)
+    return [found[neighbour] for neighbour in movie_ids if neighbour in found]
+
+
+async def similar_page(movie_id: int, page: int = 1) -> Dict:
+    """One page of similar movies: local graph when it knows enough neighbours, TMDB otherwise"""
+    ranked = graph_service.recommend("similar", movie_id, settings.GRAPH_MAX_RESULTS)
+    if len(ranked) < settings.RECOMMENDER_MIN_RESULTS:
+        return await tmdb_service.get_similar_movies(movie_id, page)
+    window = ranked[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]
+    found = movie_catalog.get_many(window) if window else {}
+    return {
+        "results": [found[neighbour] for neighbour in window if neighbour in found],
+        "page": page,
+        "total_pages": -(-len(ranked) // PAGE_SIZE),
+        "total_results": len(ranked),
+    }
+
+
+async def crawl_once(top_n: int):
+    await tmdb_service.start()
+    movie_catalog.open()
+    try:
+        await graph_service.crawl(top_n)
+    finally:
+        movie_catalog.close()
+        await tmdb_service.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Crawl the TMDB recommendation graph for the top catalog titles")
+    parser.add_argument("--top", type=int, default=settings.GRAPH_TOP_N, help="most popular catalog titles to crawl")
+    asyncio.run(crawl_once(parser.parse_args().top))
@@ -0,0 +1,272 @@
+import os
+import re
+import time
+import asyncio
+import hashlib
+import tempfile
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+import httpx
+from app.core.config import settings
+from app.services.singleflight import SingleFlight
+from app.services.tmdb_service import tmdb_service
+from app.services.upstream import BACKGROUND, priority
+
+# TMDB image paths are a single opaque file name; anything else never reaches the disk
+FILE_NAME = re.compile(r"^[A-Za-z0-9_-]{1,128}\.(jpg|jpeg|png|webp|svg)$")
+SIZE_KEYS = ("backdrop_sizes", "logo_sizes", "poster_sizes", "profile_sizes", "still_sizes")
+# Used until (or if never) the configuration endpoint answers
+DEFAULT_SIZES = {"w92", "w154", "w185", "w300", "w342", "w500", "w780", "w1280", "h632", "original"}
+
+
+class ImageEntry:
+    __slots__ = ("path", "size", "etag", "readers", "evicted")
+
+    def __init__(self, path: str, size: int, etag: Optional[str] = None):
+        self.path = path
+        self.size = size
+        self.etag = etag
+        # Responses currently streaming the file; eviction leaves it on disk until they finish
+        self.readers = 0
+        self.evicted = False
+
+
+class ImageCache:
+    """Size-bounded on-disk LRU of TMDB images, filled on demand from the image CDN.
+
+    Files live at <IMAGE_CACHE_DIR>/<size>/<file>. The index (recency, bytes, ETag) is in
+    memory and rebuilt from the directory at startup, oldest mtime first. Concurrent
+    misses for one image share a single download, written to a temp file and renamed
+    into place so readers never see a partial image. Files being served are pinned
+    (acquire/release) and only unlinked once their last response is done. Workers sharing
+    the directory adopt each other's files; one evicted underneath us is fetched again.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, ImageEntry]" = OrderedDict()
+        self._bytes = 0
+        self._client: Optional[httpx.AsyncClient] = None
+        self.singleflight = SingleFlight()
+        self.sizes: Set[str] = set(DEFAULT_SIZES)
+        self.sizes_loaded = False
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.errors = 0
+        self.prefetched = 0
+
+    async def start(self):
+        self._client = httpx.AsyncClient(
+            timeout=httpx.Timeout(settings.TMDB_READ_TIMEOUT, connect=settings.TMDB_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=settings.IMAGE_MAX_CONNECTIONS),
+            follow_redirects=True,
+        )
+        await asyncio.to_thread(self._scan)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+
+    def _scan(self):
+        found = []
+        os.makedirs(self.directory, exist_ok=True)
+        for size in os.listdir(self.directory):
+            folder = os.path.join(self.directory, size)
+            if not os.path.isdir(folder):
+                continue
+            for name in os.listdir(folder):
+                path = os.path.join(folder, name)
+                if FILE_NAME.match(name):
+                    stat = os.stat(path)
+                    found.append((stat.st_mtime, f"{size}/{name}", path, stat.st_size))
+                elif name.endswith(".tmp"):
+                    os.remove(path)
+        for _, key, path, size in sorted(found):
+            self._add(key, ImageEntry(path, size))
+        self._evict()
+        print(f"Image cache: {len(self._entries)} files, {self._bytes / 1024 / 1024:.1f} MB")
+
+    async def load_sizes(self) -> bool:
+        """Valid size variants are whatever TMDB's configuration lists; False keeps the current ones"""
+        try:
+            with priority(BACKGROUND):
+                images = (await tmdb_service.get_configuration()).get("images") or {}
+        except Exception as e:
+            print(f"Error loading image sizes, keeping {'loaded' if self.sizes_loaded else 'default'} sizes: {e}")
+            return False
+        sizes = {size for key in SIZE_KEYS for size in images.get(key) or []}
+        if not sizes:
+            return False
+        self.sizes = sizes
+        self.sizes_loaded = True
+        return True
+
+    async def run(self):
+        """Background size refresher: serving never waits on TMDB's configuration endpoint"""
+        while True:
+            loaded = await self.load_sizes()
+            await asyncio.sleep(settings.IMAGE_SIZES_REFRESH_INTERVAL if loaded else settings.SNAPSHOT_RETRY_INTERVAL)
+
+    def valid(self, size: str, name: str) -> bool:
+        return size in self.sizes and FILE_NAME.match(name) is not None
+
+    async def get(self, size: str, name: str) -> ImageEntry:
+        key = f"{size}/{name}"
+        entry = self._entries.get(key)
+        if entry is not None and os.path.exists(entry.path):
+            self.hits += 1
+            self._entries.move_to_end(key)
+        else:
+            if entry is not None:
+                self._remove(key)
+            entry = await self.singleflight.do(key, lambda: self._load(size, name))
+        if entry.etag is None:
+            entry.etag = await asyncio.to_thread(self._digest, entry.path)
+        return entry
+
+    async def acquire(self, size: str, name: str) -> Tuple[ImageEntry, os.stat_result]:
+        """get() plus the file's stat, pinned until release(); a file gone from disk is a miss"""
+        key = f"{size}/{name}"
+        for _ in range(2):
+            entry = await self.get(size, name)
+            try:
+                stat = await asyncio.to_thread(os.stat, entry.path)
+            except FileNotFoundError:
+                # Evicted by another worker between the lookup and now
+                if self._entries.get(key) is entry:
+                    self._remove(key)
+                continue
+            entry.readers += 1
+            return entry, stat
+        raise FileNotFoundError(key)
+
+    def release(self, entry: ImageEntry):
+        entry.readers -= 1
+        if entry.readers == 0 and entry.evicted:
+            # Unless the file was adopted again as a fresh entry while it was being served
+            key = os.path.relpath(entry.path, self.directory).replace(os.sep, "/")
+            if key not in self._entries:
+                self._unlink(entry.path)
+
+    async def _load(self, size: str, name: str) -> ImageEntry:
+        key = f"{size}/{name}"
+        path = os.path.join(self.directory, size, name)
+        if os.path.exists(path):
+            # Written by another worker sharing the directory
+            entry = ImageEntry(path, os.path.getsize(path))
+        else:
+            self.misses += 1
+            entry = await self._download(size, name, path)
+        if key not in self._entries:
+            self._add(key, entry)
+            self._evict()
+        return self._entries.get(key, entry)
+
+    async def _download(self, size: str, name: str, path: str) -> ImageEntry:
+        folder = os.path.dirname(path)
+        digest = hashlib.sha1()
+        length = 0
+        f, tmp_path = await asyncio.to_thread(self._open_temp, folder)
+        try:
+            async with self._client.stream("GET", f"{settings.IMAGE_BASE_URL}/{size}/{name}") as response:
+                response.raise_for_status()
+                async for chunk in response.aiter_bytes(64 * 1024):
+                    length += len(chunk)
+                    if length > settings.IMAGE_MAX_FILE_BYTES:
+                        raise ValueError(f"image larger than {settings.IMAGE_MAX_FILE_BYTES} bytes")
+                    digest.update(chunk)
+                    # Disk writes stay off the event loop
+                    await asyncio.to_thread(f.write, chunk)
+            await asyncio.to_thread(self._commit, f, tmp_path, path)
+        except BaseException as e:
+            if isinstance(e, Exception):
+                self.errors += 1
+            f.close()
+            self._unlink(tmp_path)
+            raise
+        return ImageEntry(path, length, f'"{digest.hexdigest()}"')
+
+    @staticmethod
+    def _open_temp(folder: str):
+        os.makedirs(folder, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=folder, suffix=".tmp")
+        return os.fdopen(fd, "wb"), tmp_path
+
+    @staticmethod
+    def _commit(f, tmp_path: str, path: str):
+        f.close()
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _unlink(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _digest(path: str) -> str:
+        digest = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(64 * 1024), b""):
+                digest.update(chunk)
+        return f'"{digest.hexdigest()}"'
+
+    def _add(self, key: str, entry: ImageEntry):
+        self._entries[key] = entry
+        self._bytes += entry.size
+
+    def _remove(self, key: str) -> Optional[ImageEntry]:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+        return entry
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            key, entry = next(iter(self._entries.items()))
+            self._remove(key)
+            self.evictions += 1
+            if entry.readers:
+                # Unlinked by the last release() instead
+                entry.evicted = True
+            else:
+                self._unlink(entry.path)
+
+    async def prefetch(self, paths: List[str], size: str = None):
+        """Warm the cache for image paths (as TMDB returns them, with a leading slash)"""
+        size = size or settings.IMAGE_PREFETCH_SIZE
+        semaphore = asyncio.Semaphore(settings.IMAGE_PREFETCH_CONCURRENCY)
+
+        async def fetch(name: str):
+            if f"{size}/{name}" in self._entries or not self.valid(size, name):
+                return
+            async with semaphore:
+                try:
+                    await self.get(size, name)
+                    self.prefetched += 1
+                except Exception as e:
+                    print(f"Error prefetching image {size}/{name}: {e}")
+
+        started = time.perf_counter()
+        await asyncio.gather(*(fetch(path.lstrip("/")) for path in paths if path))
+        print(f"Image prefetch of {len(paths)} {size} images finished in {time.perf_counter() - started:.2f}s")
+
+    def stats(self) -> Dict:
+        return {
+            "files": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "errors": self.errors,
+            "prefetched": self.prefetched,
+            "sizes_loaded": self.sizes_loaded,
+            "coalescing": self.singleflight.stats(),
+        }
+
+
+image_cache = ImageCache(settings.IMAGE_CACHE_DIR, settings.IMAGE_CACHE_MAX_BYTES)
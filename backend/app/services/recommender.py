@@ -0,0 +1,374 @@
+import time
+import asyncio
+import numpy as np
+import scipy.sparse as sp
+from itertools import chain
+from typing import Dict, Iterator, List, Optional, Tuple
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+from app.core.config import settings
+from app.schemas.movie import Movie
+from app.services.tmdb_service import tmdb_service
+from app.services.catalog import movie_catalog
+from app.services.graph import graph_movies
+
+
+class ContentRecommender:
+    """Item-to-item recommendations from overview TF-IDF plus genre one-hot vectors.
+
+    Overviews are tokenized with a stateless hashing vectorizer, so movies can be added
+    or updated one at a time; IDF weights come from running document frequencies and the
+    L2-normalized item matrix is rebuilt in a worker thread on an interval; movies added
+    since the last build are vectorized one at a time against it when queried. The catalog
+    seeds it at startup and fresh TMDB responses keep it current.
+    """
+
+    def __init__(self, n_features: int = 2 ** 18, genre_weight: float = 0.35):
+        self.n_features = n_features
+        self.genre_weight = genre_weight
+        # Allocated on first use, so an engine that is never started costs nothing
+        self.vectorizer: Optional[HashingVectorizer] = None
+        self._df: Optional[np.ndarray] = None
+        self.ids: List[int] = []
+        self.rows: Dict[int, int] = {}
+        self.movies: List[Dict] = []
+        self._terms: List[Tuple[np.ndarray, np.ndarray]] = []
+        self._genres: List[List[int]] = []
+        self._genre_columns: Dict[int, int] = {}
+        self._matrix: Optional[sp.csr_matrix] = None
+        self._matrix_t: Optional[sp.csr_matrix] = None
+        self._matrix_rows = 0
+        self._idf: Optional[np.ndarray] = None
+        self._genre_width = 0
+        self._dirty = False
+        self._built_at = 0.0
+        self.builds = 0
+        self.incremental = 0
+        self.seeded = 0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, movie_id: int) -> bool:
+        return movie_id in self.rows
+
+    def _allocate(self):
+        if self.vectorizer is not None:
+            return
+        self.vectorizer = HashingVectorizer(
+            n_features=self.n_features,
+            stop_words="english",
+            alternate_sign=False,
+            norm=None,
+        )
+        self._df = np.zeros(self.n_features, dtype=np.int32)
+
+    def start(self):
+        """Index every movie in fresh TMDB responses from now on; run() seeds the rest from the catalog"""
+        self._allocate()
+        tmdb_service.add_listener(self.observe)
+
+    def observe(self, movies: List[Dict]):
+        """Add or update movies as they are seen in TMDB responses"""
+        for record, terms in self._prepare(movies):
+            self._apply(record, terms)
+
+    def add(self, movie: Dict):
+        for record, terms in self._prepare([movie]):
+            self._apply(record, terms)
+
+    def _prepare(self, movies: List[Dict]) -> List[Tuple[Dict, Tuple[np.ndarray, np.ndarray]]]:
+        """Validated records and their overview term counts; touches no shared state, so it runs in threads too"""
+        self._allocate()
+        records = []
+        for movie in movies:
+            try:
+                record = Movie(**movie).model_dump()
+            except Exception as e:
+                print(f"Error indexing movie for recommendations: {e}")
+                continue
+            if not record["genre_ids"] and movie.get("genres"):
+                record["genre_ids"] = [genre["id"] for genre in movie["genres"] if genre.get("id") is not None]
+            records.append(record)
+        if not records:
+            return []
+        counts = self.vectorizer.transform([record["overview"] or "" for record in records])
+        return [
+            (record, (counts.indices[start:end].astype(np.int32), counts.data[start:end].astype(np.float32)))
+            for record, start, end in zip(records, counts.indptr[:-1], counts.indptr[1:])
+        ]
+
+    def _apply(self, record: Dict, terms: Tuple[np.ndarray, np.ndarray], replace: bool = True):
+        row = self.rows.get(record["id"])
+        if row is None:
+            row = len(self.ids)
+            self.rows[record["id"]] = row
+            self.ids.append(record["id"])
+            self.movies.append(record)
+            self._terms.append(terms)
+            self._genres.append(record["genre_ids"])
+        else:
+            if not replace:
+                return
+            same = self._same(row, record)
+            self.movies[row] = record
+            if same:
+                return
+            self._df[self._terms[row][0]] -= 1
+            self._terms[row] = terms
+            self._genres[row] = record["genre_ids"]
+        self._df[terms[0]] += 1
+        for genre_id in record["genre_ids"]:
+            self._genre_columns.setdefault(genre_id, len(self._genre_columns))
+        self._dirty = True
+
+    def _prepare_next(self, batches: Iterator[List[Dict]]) -> Optional[List]:
+        batch = next(batches, None)
+        return None if batch is None else self._prepare(batch)
+
+    async def seed(self):
+        """Index the catalog, so movies only ever served from the response cache are known too.
+
+        Batches are read and vectorized in a worker thread and applied on the loop; movies the
+        listener has already indexed are fresher than the catalog copy and are kept.
+        """
+        batches = movie_catalog.iter_movies()
+        while True:
+            prepared = await asyncio.to_thread(self._prepare_next, batches)
+            if prepared is None:
+                break
+            for record, terms in prepared:
+                self._apply(record, terms, replace=False)
+            self.seeded += len(prepared)
+        print(f"Content recommender seeded with {self.seeded} catalog titles")
+
+    def _same(self, row: int, record: Dict) -> bool:
+        current = self.movies[row]
+        return current["overview"] == record["overview"] and current["genre_ids"] == record["genre_ids"]
+
+    def _snapshot(self) -> Tuple:
+        """Everything a build reads, copied on the loop so the worker thread never sees a half-applied add"""
+        n = len(self.ids)
+        self._allocate()
+        return n, self._terms[:n], self._genres[:n], self._df.copy(), dict(self._genre_columns)
+
+    def _build(self, n: int, terms: List, genres: List, df: np.ndarray, genre_columns: Dict[int, int]) -> Dict:
+        lengths = np.fromiter((len(indices) for indices, _ in terms), dtype=np.int64, count=n)
+        indptr = np.concatenate(([0], np.cumsum(lengths)))
+        indices = np.concatenate([t[0] for t in terms]) if n else np.array([], dtype=np.int32)
+        data = np.concatenate([t[1] for t in terms]) if n else np.array([], dtype=np.float32)
+        counts = sp.csr_matrix((data, indices, indptr), shape=(n, df.shape[0]))
+
+        idf = (np.log((1 + n) / (1 + df)) + 1).astype(np.float32)
+        text = normalize(counts.multiply(idf).tocsr())
+
+        genre_cols = [genre_columns[g] for row_genres in genres for g in row_genres]
+        genre_rows = np.repeat(np.arange(n), [len(row_genres) for row_genres in genres])
+        genre_width = max(len(genre_columns), 1)
+        genre_block = sp.csr_matrix(
+            (np.ones(len(genre_cols), dtype=np.float32), (genre_rows, genre_cols)),
+            shape=(n, genre_width),
+        )
+        genre_block = normalize(genre_block)
+
+        # Blend the two unit-length blocks, then renormalize so dot products are cosines
+        matrix = sp.hstack([
+            text * np.sqrt(1 - self.genre_weight),
+            genre_block * np.sqrt(self.genre_weight),
+        ]).tocsr()
+        matrix = normalize(matrix).astype(np.float32)
+        # Term-major copy: scoring one item only touches the postings of its own nonzero columns
+        return {"matrix": matrix, "matrix_t": matrix.T.tocsr(), "rows": n, "idf": idf, "genre_width": genre_width}
+
+    def _install(self, built: Dict, dirty: bool):
+        self._matrix = built["matrix"]
+        self._matrix_t = built["matrix_t"]
+        self._matrix_rows = built["rows"]
+        self._idf = built["idf"]
+        self._genre_width = built["genre_width"]
+        # Anything added while the worker was building stays dirty for the next round
+        self._dirty = dirty
+        self._built_at = time.monotonic()
+        self.builds += 1
+
+    async def refresh(self):
+        """Full rebuild in a worker thread, swapped in on the loop once it is done"""
+        self._dirty = False
+        try:
+            built = await asyncio.to_thread(self._build, *self._snapshot())
+        except BaseException:
+            self._dirty = True
+            raise
+        self._install(built, dirty=self._dirty)
+
+    async def run(self):
+        """Seed from the catalog, then rebuild the matrix every RECOMMENDER_REBUILD_INTERVAL while movies keep arriving"""
+        try:
+            await self.seed()
+        except Exception as e:
+            print(f"Error seeding content recommender: {e}")
+        while True:
+            await asyncio.sleep(settings.RECOMMENDER_REBUILD_INTERVAL)
+            if not self._dirty:
+                continue
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"Error rebuilding recommendation matrix: {e}")
+
+    def _vector(self, row: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Columns and weights of one row, from the built matrix or vectorized against its IDF and genre columns"""
+        if row < self._matrix_rows:
+            start, end = self._matrix.indptr[row], self._matrix.indptr[row + 1]
+            return self._matrix.indices[start:end], self._matrix.data[start:end]
+        self.incremental += 1
+        indices, counts = self._terms[row]
+        text = counts * self._idf[indices]
+        text_norm = np.linalg.norm(text)
+        if text_norm > 0:
+            text = text / text_norm
+        # Genres first seen after the build have no column in the matrix yet
+        n_features = self.n_features
+        genre_cols = np.array(
+            [column for column in (self._genre_columns[g] for g in self._genres[row]) if column < self._genre_width],
+            dtype=np.int32,
+        )
+        genre_values = np.full(len(genre_cols), 1 / np.sqrt(max(len(genre_cols), 1)), dtype=np.float32)
+        columns = np.concatenate((indices, n_features + genre_cols))
+        weights = np.concatenate((text * np.sqrt(1 - self.genre_weight), genre_values * np.sqrt(self.genre_weight)))
+        weights_norm = np.linalg.norm(weights)
+        if weights_norm > 0:
+            weights = weights / weights_norm
+        return columns, weights.astype(np.float32)
+
+    def recommend(self, movie_id: int, limit: int = 20) -> List[Dict]:
+        row = self.rows.get(movie_id)
+        if row is None or self._matrix is None:
+            return []
+        columns, weights = self._vector(row)
+        scores = np.asarray(self._matrix_t[columns].T @ weights).ravel()
+        if row < self._matrix_rows:
+            scores[row] = -np.inf
+        k = min(limit, int(np.count_nonzero(scores > 0)))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [self.movies[i] for i in top if scores[i] > 0]
+
+    def stats(self) -> Dict:
+        return {
+            "movies": len(self.ids),
+            "seeded": self.seeded,
+            "genres": len(self._genre_columns),
+            "matrix_rows": self._matrix_rows,
+            "dirty": self._dirty,
+            "builds": self.builds,
+            "incremental": self.incremental,
+        }
+
+
+# Started from the app lifespan, and only when RECOMMENDER_MODE is "local"
+content_recommender = ContentRecommender()
+
+
+async def get_recommendations(movie_id: int, limit: int = 20) -> List[Dict]:
+    """Recommendations for one movie: crawled graph, then the local engine when enabled and confident, TMDB otherwise"""
+    crawled = graph_movies("recommendations", movie_id, limit)
+    if len(crawled) >= min(limit, settings.RECOMMENDER_MIN_RESULTS):
+        return crawled
+    if settings.RECOMMENDER_MODE == "local":
+        if movie_id not in content_recommender:
+            # Details are cached and the response feeds the engine through the listener
+            await tmdb_service.get_movie_details(movie_id)
+        local = content_recommender.recommend(movie_id, limit)
+        if len(local) >= min(limit, settings.RECOMMENDER_MIN_RESULTS):
+            return local
+    return await tmdb_service.get_movie_recommendations(movie_id)
+
+
+async def _seed_neighbours(movie_id: int) -> List[Dict]:
+    """One seed's ranked neighbours; [] when they could not be fetched in time"""
+    try:
+        return await asyncio.wait_for(get_recommendations(movie_id), settings.MULTI_SEED_TIMEOUT)
+    except Exception as e:
+        print(f"Error fetching recommendations for seed {movie_id}: {e!r}")
+        return []
+
+
+def fuse_rankings(rankings: List[List[int]], weights: List[float], fusion: str = "rrf") -> Tuple[np.ndarray, np.ndarray]:
+    """Candidate ids and fused scores, best first.
+
+    rrf adds weight / (k + rank) for every seed ranking a candidate; score adds
+    weight * (1 - rank / length), so position counts relative to each seed's list.
+    """
+    lengths = np.fromiter((len(ranking) for ranking in rankings), dtype=np.int64, count=len(rankings))
+    ids = np.fromiter(chain.from_iterable(rankings), dtype=np.int64, count=int(lengths.sum()))
+    ranks = np.arange(len(ids)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    seed_weights = np.repeat(np.asarray(weights, dtype=np.float64), lengths)
+    if fusion == "rrf":
+        contributions = seed_weights / (settings.MULTI_SEED_RRF_K + ranks + 1)
+    else:
+        contributions = seed_weights * (1 - ranks / np.repeat(lengths, lengths))
+    unique, inverse = np.unique(ids, return_inverse=True)
+    scores = np.bincount(inverse, weights=contributions, minlength=len(unique))
+    order = np.argsort(-scores, kind="stable")
+    return unique[order], scores[order]
+
+
+def diversify(movies: List[Dict], scores: np.ndarray, limit: int) -> List[Dict]:
+    """Greedy re-rank: every pick discounts the remaining movies that share its genres"""
+    genres = {genre_id: column for column, genre_id in enumerate(sorted({g for m in movies for g in m.get("genre_ids") or []}))}
+    matrix = np.zeros((len(movies), max(len(genres), 1)))
+    for row, movie in enumerate(movies):
+        for genre_id in movie.get("genre_ids") or []:
+            matrix[row, genres[genre_id]] = 1
+    sizes = np.maximum(matrix.sum(axis=1), 1)
+    picked = np.zeros(matrix.shape[1])
+    available = np.ones(len(movies), dtype=bool)
+    chosen = []
+    for _ in range(min(limit, len(movies))):
+        # Penalty exponent: average number of picks so far per genre of the candidate
+        adjusted = scores * settings.MULTI_SEED_GENRE_PENALTY ** (matrix @ picked / sizes)
+        adjusted[~available] = -np.inf
+        best = int(np.argmax(adjusted))
+        chosen.append(movies[best])
+        available[best] = False
+        picked += matrix[best]
+    return chosen
+
+
+async def get_multi_seed_recommendations(seeds: List[Tuple[int, float]], limit: int = 20, fusion: str = "rrf") -> Dict:
+    """Recommendations for a watch history: each seed's neighbours are fetched concurrently,
+    fused, stripped of the seeds and diversified by genre. Seeds that fail are reported, not fatal.
+    """
+    weights: Dict[int, float] = {}
+    for movie_id, weight in seeds:
+        weights[movie_id] = weights.get(movie_id, 0.0) + weight
+    neighbours = await asyncio.gather(*(_seed_neighbours(movie_id) for movie_id in weights))
+
+    movies: Dict[int, Dict] = {}
+    rankings, used_weights, failed = [], [], []
+    for movie_id, candidates in zip(weights, neighbours):
+        # TMDBService turns upstream errors into empty lists, so empty counts as failed
+        if not candidates:
+            failed.append(movie_id)
+            continue
+        ranking = []
+        for movie in candidates:
+            if movie.get("id") is None or movie["id"] in weights:
+                continue
+            movies.setdefault(movie["id"], movie)
+            ranking.append(movie["id"])
+        rankings.append(list(dict.fromkeys(ranking)))
+        used_weights.append(weights[movie_id])
+    if not movies:
+        return {"results": [], "failed_seeds": failed}
+
+    ids, scores = fuse_rankings(rankings, used_weights, fusion)
+    # Diversify within a pool a few times larger than the answer
+    pool = min(len(ids), limit * 3)
+    return {
+        "results": diversify([movies[int(movie_id)] for movie_id in ids[:pool]], scores[:pool], limit),
+        "failed_seeds": failed
+    }
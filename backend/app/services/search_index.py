@@ -0,0 +1,302 @@
+import os
+import re
+import math
+import asyncio
+import unicodedata
+import numpy as np
+from array import array
+from typing import Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.services.catalog import movie_catalog
+from app.services.tmdb_service import tmdb_service
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, strip accents and punctuation: "Amélie (2001)" -> "amelie 2001" """
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return _NON_ALNUM.sub(" ", text.lower()).strip()
+
+
+def trigrams(text: str, prefix: bool = False) -> List[str]:
+    """Word-padded trigrams; prefix=True leaves the last word open so partial words still match"""
+    grams = []
+    words = text.split()
+    for i, word in enumerate(words):
+        padded = f"  {word}" if prefix and i == len(words) - 1 else f"  {word} "
+        grams.extend(padded[j:j + 3] for j in range(len(padded) - 2))
+    return grams
+
+
+def prefix_distance(query: str, word: str, limit: int) -> int:
+    """Edit distance between query and the closest prefix of word, or limit + 1 once it is exceeded"""
+    if word.startswith(query):
+        return 0
+    if len(word) < len(query) - limit:
+        return limit + 1
+    # Prefixes longer than the query plus the allowed edits can never be closer
+    word = word[:len(query) + limit]
+    previous = list(range(len(word) + 1))
+    for i, qc in enumerate(query, 1):
+        current = [i] + [0] * len(word)
+        for j, wc in enumerate(word, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (qc != wc))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return min(previous)
+
+
+class SearchIndex:
+    """Trigram inverted index over titles and original titles for as-you-type search.
+
+    Candidates are counted across posting lists with one vectorized bincount, then checked
+    with a bounded prefix edit distance per query word and ranked by match quality plus a
+    popularity prior. Only ids, names and the prior are held; results are movie ids and
+    the records themselves stay in the catalog.
+    """
+
+    def __init__(self):
+        self.ids = array("i")
+        self.popularity = array("f")
+        self.rows: Dict[int, int] = {}
+        self.names: List[str] = []
+        self.name_rows = array("i")
+        self._postings: Dict[str, array] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def observe(self, movies: List[Dict]):
+        for movie in movies:
+            try:
+                self.add(movie)
+            except Exception as e:
+                print(f"Error indexing movie for search: {e}")
+
+    def add(self, movie: Dict):
+        movie_id = movie.get("id")
+        title = movie.get("title")
+        if movie_id is None or not title:
+            return
+        popularity = movie.get("popularity") or 0.0
+        row = self.rows.get(movie_id)
+        if row is not None:
+            # Titles rarely change; refresh the popularity prior only
+            self.popularity[row] = popularity
+            return
+        row = len(self.ids)
+        self.rows[movie_id] = row
+        self.ids.append(movie_id)
+        self.popularity.append(popularity)
+        names = {
+            normalize_text(title),
+            normalize_text(movie.get("original_title") or ""),
+            # "Spider-Man" should also match "spiderman"
+            normalize_text(title.replace("-", "")),
+        }
+        for name in names:
+            if name:
+                self._add_name(name, row)
+
+    def _add_name(self, name: str, row: int):
+        name_index = len(self.names)
+        self.names.append(name)
+        self.name_rows.append(row)
+        for gram in set(trigrams(name)):
+            postings = self._postings.get(gram)
+            if postings is None:
+                postings = self._postings[gram] = array("i")
+            postings.append(name_index)
+
+    def search(self, query: str, limit: int = 10) -> List[int]:
+        """Ids of the best matching movies, best first"""
+        normalized = normalize_text(query)
+        if not normalized or not self.names:
+            return []
+        grams = set(trigrams(normalized, prefix=True))
+        lists = sorted(
+            (np.frombuffer(self._postings[g], dtype=np.int32) for g in grams if g in self._postings),
+            key=len,
+        )
+        if not lists:
+            return []
+        # Very common trigrams ("  s", "the") cost the most and discriminate the least:
+        # drop them while the rarer half of the query still exceeds the postings budget
+        used = len(grams)
+        while len(lists) > max(1, len(grams) // 2) and sum(map(len, lists)) > settings.SEARCH_MAX_POSTINGS:
+            lists.pop()
+            used -= 1
+        overlap = np.bincount(np.concatenate(lists), minlength=len(self.names))
+        # Only names sharing enough trigrams are worth the edit-distance check
+        threshold = max(1, math.ceil(used * settings.SEARCH_MIN_OVERLAP))
+        candidates = np.flatnonzero(overlap >= threshold)
+        if len(candidates) > settings.SEARCH_MAX_CANDIDATES:
+            # Shortlist by trigram overlap, popularity breaking ties between equally close names
+            rows = np.frombuffer(self.name_rows, dtype=np.int32)[candidates]
+            prior = np.log1p(np.frombuffer(self.popularity, dtype=np.float32)[rows])
+            shortlist = overlap[candidates] + 0.01 * prior
+            top = np.argpartition(-shortlist, settings.SEARCH_MAX_CANDIDATES - 1)
+            candidates = candidates[top[:settings.SEARCH_MAX_CANDIDATES]]
+
+        words = normalized.split()
+        best: Dict[int, float] = {}
+        for name_index in candidates.tolist():
+            quality = self._match_quality(words, self.names[name_index])
+            if quality is None:
+                continue
+            quality += overlap[name_index] / used
+            row = self.name_rows[name_index]
+            score = quality + settings.SEARCH_POPULARITY_WEIGHT * math.log1p(self.popularity[row])
+            if score > best.get(row, -math.inf):
+                best[row] = score
+        ranked = sorted(best.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return [self.ids[row] for row, _ in ranked]
+
+    @staticmethod
+    def _match_quality(words: List[str], name: str) -> Optional[float]:
+        name_words = name.split()
+        quality = 0.0
+        for i, word in enumerate(words):
+            limit = 0 if len(word) <= 2 else 1 if len(word) <= 5 else 2
+            last = i == len(words) - 1
+            best = limit + 1
+            for name_word in name_words:
+                if last or word == name_word:
+                    distance = prefix_distance(word, name_word, limit)
+                else:
+                    # Earlier words should be complete; a prefix-only match costs a little
+                    distance = prefix_distance(word, name_word, limit) + 0.5
+                best = min(best, distance)
+                if best == 0:
+                    break
+            if best > limit + 0.5:
+                return None
+            quality -= best
+        if name == " ".join(words):
+            quality += 2.0
+        elif name.startswith(" ".join(words)):
+            quality += 1.0
+        return quality
+
+    def save(self, path: str, size: Optional[int] = None, name_count: Optional[int] = None):
+        """Compact form: flat arrays plus one CSR-style postings table.
+
+        May run in a worker thread while the event loop keeps inserting: only the first
+        size movies / name_count names (captured by the caller) are written, and every
+        structure is copied with C-level slices that never export a resizable buffer.
+        """
+        size = len(self.ids) if size is None else size
+        name_count = len(self.names) if name_count is None else name_count
+        names = self.names[:name_count]
+        entries = sorted(list(self._postings.items()))
+        grams, lists = [], []
+        for gram, posting in entries:
+            values = np.frombuffer(posting[:], dtype=np.int32)
+            values = values[values < name_count]
+            if len(values):
+                grams.append(gram)
+                lists.append(values)
+        lengths = np.fromiter((len(values) for values in lists), dtype=np.int64, count=len(lists))
+        offsets = np.concatenate(([0], np.cumsum(lengths)))
+        postings = np.concatenate(lists) if lists else np.array([], dtype=np.int32)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            ids=np.frombuffer(self.ids[:size], dtype=np.int32),
+            popularity=np.frombuffer(self.popularity[:size], dtype=np.float32),
+            names=np.array(names, dtype=str),
+            name_rows=np.frombuffer(self.name_rows[:name_count], dtype=np.int32),
+            grams=np.array(grams, dtype=str),
+            offsets=offsets,
+            postings=postings,
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "SearchIndex":
+        index = cls()
+        with np.load(path) as data:
+            index.ids = array("i", data["ids"].tobytes())
+            index.popularity = array("f", data["popularity"].tobytes())
+            index.name_rows = array("i", data["name_rows"].tobytes())
+            index.names = data["names"].tolist()
+            postings, offsets = data["postings"], data["offsets"]
+            for i, gram in enumerate(data["grams"].tolist()):
+                index._postings[gram] = array("i", postings[offsets[i]:offsets[i + 1]].tobytes())
+        index.rows = {movie_id: row for row, movie_id in enumerate(index.ids)}
+        return index
+
+    def stats(self) -> Dict:
+        return {"titles": len(self.ids), "names": len(self.names), "trigrams": len(self._postings)}
+
+
+class SearchService:
+    """Owns the live index: loads it at startup, feeds it new movies and persists it"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.index = SearchIndex()
+        tmdb_service.add_listener(self._observe)
+
+    def _observe(self, movies: List[Dict]):
+        self.index.observe(movies)
+
+    def search(self, query: str, limit: int = 10) -> List[Dict]:
+        """Matching movies, resolved from the catalog in rank order"""
+        movie_ids = self.index.search(query, limit)
+        found = movie_catalog.get_many(movie_ids)
+        return [found[movie_id] for movie_id in movie_ids if movie_id in found]
+
+    def _load_or_build(self) -> Tuple[SearchIndex, str]:
+        if os.path.exists(self.path):
+            return SearchIndex.load(self.path), "loaded"
+        index = SearchIndex()
+        for batch in movie_catalog.iter_movies():
+            index.observe(batch)
+        return index, "built from catalog"
+
+    async def start(self):
+        try:
+            index, source = await asyncio.to_thread(self._load_or_build)
+            # Keep anything the listener indexed while the snapshot was loading
+            index.observe(list(movie_catalog.get_many(list(self.index.ids)).values()))
+            self.index = index
+            print(f"Search index {source}: {len(index)} titles")
+        except Exception as e:
+            print(f"Error loading search index: {e}")
+
+    async def run(self):
+        """Persist the index periodically so restarts load it instead of rebuilding"""
+        saved_size = len(self.index)
+        while True:
+            await asyncio.sleep(settings.SEARCH_INDEX_SAVE_INTERVAL)
+            if len(self.index) != saved_size:
+                await self.save()
+                saved_size = len(self.index)
+
+    async def save(self):
+        index = self.index
+        try:
+            await asyncio.to_thread(index.save, self.path, len(index.ids), len(index.names))
+        except Exception as e:
+            print(f"Error saving search index: {e}")
+
+
+search_service = SearchService(settings.SEARCH_INDEX_PATH)
+
+
+async def suggest(query: str, limit: int = 10) -> List[Dict]:
+    """Local matches first; top up from TMDB search when the index knows too few titles"""
+    movies = search_service.search(query, limit) if settings.SEARCH_MODE == "local" else []
+    if len(movies) >= min(limit, settings.SEARCH_MIN_LOCAL_RESULTS):
+        return movies
+    seen = {movie["id"] for movie in movies}
+    results = (await tmdb_service.search_movies(query)).get("results", [])
+    movies += [movie for movie in results if movie.get("id") not in seen]
+    return movies[:limit]
@@ -0,0 +1,176 @@
+import json
+import time
+import random
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional
+from app.core.config import settings
+from app.core.responses import encode_movies
+from app.services.singleflight import SingleFlight
+from app.services.tmdb_service import tmdb_service
+from app.services.upstream import BACKGROUND, priority
+
+
+class Snapshot:
+    """A prebuilt movie list: raw TMDB results plus the serialized List[Movie] response body"""
+
+    __slots__ = ("name", "data", "body", "fetched_at")
+
+    def __init__(self, name: str, data: List[Dict], body: bytes, fetched_at: float):
+        self.name = name
+        self.data = data
+        self.body = body
+        self.fetched_at = fetched_at
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+
+SNAPSHOT_CHANNEL = "snapshots"
+
+
+class SnapshotService:
+    """Stale-while-revalidate store for the curated list endpoints"""
+
+    def __init__(self, fetchers: Dict[str, Callable[[], Awaitable[List[Dict]]]]):
+        self.fetchers = fetchers
+        self._snapshots: Dict[str, Snapshot] = {}
+        self._refreshes = SingleFlight()
+        self._background: set = set()
+        self.backplane = None
+        self._on_refresh: Optional[Callable[[Dict[str, Snapshot]], Awaitable[None]]] = None
+        # Wall-clock time the next scheduled refresh is due, shared through published snapshots
+        self.next_refresh = 0.0
+
+    async def get(self, name: str) -> Snapshot:
+        snapshot = self._snapshots.get(name)
+        if snapshot is None:
+            # Cold start: the first callers wait for one shared fetch
+            return await self.refresh(name)
+        if snapshot.age > settings.SNAPSHOT_MAX_AGE:
+            self._refresh_in_background(name)
+        return snapshot
+
+    def peek(self, name: str) -> Optional[Snapshot]:
+        return self._snapshots.get(name)
+
+    async def refresh(self, name: str) -> Snapshot:
+        return await self._refreshes.do(name, lambda: self._build(name))
+
+    async def refresh_all(self) -> Dict[str, Snapshot]:
+        names = list(self.fetchers)
+        snapshots = await asyncio.gather(*(self.refresh(name) for name in names))
+        return dict(zip(names, snapshots))
+
+    async def _build(self, name: str) -> Snapshot:
+        data = await self.fetchers[name]()
+        previous = self._snapshots.get(name)
+        if not data and previous is not None:
+            # TMDBService reports upstream failures as empty lists; keep serving the last good copy
+            return previous
+        snapshot = Snapshot(name, data, encode_movies(data), time.time())
+        if data:
+            self._snapshots[name] = snapshot
+        return snapshot
+
+    def install(self, name: str, data: List[Dict], fetched_at: float) -> Snapshot:
+        """Adopt a snapshot fetched by another worker unless ours is at least as fresh"""
+        current = self._snapshots.get(name)
+        if current is not None and current.fetched_at >= fetched_at:
+            return current
+        snapshot = Snapshot(name, data, encode_movies(data), fetched_at)
+        self._snapshots[name] = snapshot
+        return snapshot
+
+    def attach(self, backplane):
+        """Share refreshes through the backplane: the lease holder fetches, every worker installs"""
+        self.backplane = backplane
+        backplane.subscribe(SNAPSHOT_CHANNEL, self._receive)
+
+    async def _publish(self, snapshots: Dict[str, Snapshot]):
+        await self.backplane.publish(SNAPSHOT_CHANNEL, json.dumps({
+            "next_refresh": self.next_refresh,
+            "snapshots": {
+                name: {"data": snapshot.data, "fetched_at": snapshot.fetched_at}
+                for name, snapshot in snapshots.items() if snapshot.data
+            },
+        }))
+
+    async def _receive(self, message: str):
+        payload = json.loads(message)
+        self.next_refresh = max(self.next_refresh, payload["next_refresh"])
+        snapshots = {
+            name: self.install(name, entry["data"], entry["fetched_at"])
+            for name, entry in payload["snapshots"].items()
+        }
+        if self._on_refresh is not None and snapshots:
+            await self._on_refresh(snapshots)
+
+    def _refresh_in_background(self, name: str):
+        if name in self._background:
+            return
+        self._background.add(name)
+        task = asyncio.create_task(self._background_refresh(name))
+        task.add_done_callback(lambda _: self._background.discard(name))
+
+    async def _background_refresh(self, name: str):
+        # Spread revalidation of several stale lists instead of hitting TMDB all at once
+        await asyncio.sleep(random.uniform(0, settings.SNAPSHOT_REFRESH_JITTER / 10))
+        try:
+            with priority(BACKGROUND):
+                await self.refresh(name)
+        except Exception as e:
+            print(f"Error refreshing snapshot {name}: {e}")
+
+    async def run(
+        self,
+        on_refresh: Optional[Callable[[Dict[str, Snapshot]], Awaitable[None]]] = None,
+        lease=None,
+    ):
+        """Background refresher: rebuild every snapshot, then sleep for the interval plus jitter.
+
+        With a lease, only its holder fetches; the others wait, receive the published
+        snapshots and take over the schedule if the holder goes away.
+        """
+        self._on_refresh = on_refresh
+        while True:
+            if lease is not None and not lease.held:
+                await asyncio.sleep(settings.LEASE_RENEW_INTERVAL)
+                continue
+            wait = self.next_refresh - time.time()
+            if wait > 0:
+                # Recheck the lease at least this often while waiting for the next refresh
+                await asyncio.sleep(min(wait, settings.LEASE_RENEW_INTERVAL) if lease is not None else wait)
+                continue
+            try:
+                print("Refreshing movie list snapshots...")
+                with priority(BACKGROUND):
+                    snapshots = await self.refresh_all()
+                delay = settings.SNAPSHOT_REFRESH_INTERVAL
+            except Exception as e:
+                print(f"Error in background update: {e}")
+                snapshots = None
+                delay = settings.SNAPSHOT_RETRY_INTERVAL
+            self.next_refresh = time.time() + delay + random.uniform(0, settings.SNAPSHOT_REFRESH_JITTER)
+            if snapshots is None:
+                continue
+            try:
+                if self.backplane is not None:
+                    await self._publish(snapshots)
+                elif on_refresh is not None:
+                    await on_refresh(snapshots)
+            except Exception as e:
+                print(f"Error publishing snapshots: {e}")
+
+    def stats(self) -> Dict:
+        return {name: round(snapshot.age, 1) for name, snapshot in self._snapshots.items()}
+
+
+snapshot_service = SnapshotService({
+    "trending_day": lambda: tmdb_service.get_trending_movies("day"),
+    "trending_week": lambda: tmdb_service.get_trending_movies("week"),
+    "popular": tmdb_service.get_popular_movies,
+    "upcoming": tmdb_service.get_upcoming_movies,
+    "top_rated": tmdb_service.get_top_rated_movies,
+    "now_playing": tmdb_service.get_now_playing_movies,
+})
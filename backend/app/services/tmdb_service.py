@@ -1,72 +1,250 @@
+import json
+import time
 import httpx
-from typing import List, Dict
+import asyncio
+import importlib.util
+from typing import AsyncIterator, Callable, List, Dict, Optional
+from urllib.parse import urlencode
 from app.core.config import settings
+from app.core.metrics import tmdb_endpoint, tmdb_request_duration, tmdb_requests
+from app.services.cache import response_cache
+from app.services.singleflight import SingleFlight
+from app.services.upstream import UpstreamRateLimited, UpstreamScheduler
+
+# How long (seconds) each kind of TMDB response may be served from cache
+CACHE_TTLS = {
+    "trending": 15 * 60,
+    "lists": 30 * 60,
+    "search": 10 * 60,
+    "discover": 30 * 60,
+    "details": 6 * 3600,
+    "videos": 6 * 3600,
+    "credits": 24 * 3600,
+    "images": 24 * 3600,
+    "reviews": 3600,
+    "similar": 6 * 3600,
+    "recommendations": 6 * 3600,
+    "genres": 7 * 24 * 3600,
+    "person": 24 * 3600,
+    "configuration": 7 * 24 * 3600,
+    "collection": 24 * 3600,
+}
+
+# Movie sub-resources TMDB can return inline with the details via append_to_response
+APPENDABLE_FIELDS = ("credits", "videos", "reviews", "similar", "recommendations")
+BUNDLE_FIELDS = ("details", "images") + APPENDABLE_FIELDS
 
 class TMDBService:
     def __init__(self):
         self.api_key = settings.TMDB_API_KEY
         self.base_url = settings.TMDB_BASE_URL
+        self._client: Optional[httpx.AsyncClient] = None
+        self._in_flight = 0
+        self._peak_in_flight = 0
+        self._requests = 0
+        self.cache = response_cache
+        self.singleflight = SingleFlight()
+        self.scheduler = UpstreamScheduler()
+        self._listeners: List[Callable[[List[Dict]], None]] = []
         print(f"Initializing TMDB Service with API key: {self.api_key[:8]}...")
 
+    async def start(self):
+        """Create the shared upstream client (called from the app lifespan)"""
+        if self._client is not None:
+            return
+        # HTTP/2 needs the optional h2 package; fall back to pooled HTTP/1.1 without it
+        http2 = settings.TMDB_HTTP2 and importlib.util.find_spec("h2") is not None
+        if settings.TMDB_HTTP2 and not http2:
+            print("h2 is not installed, TMDB client falling back to HTTP/1.1")
+        self._client = httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=settings.TMDB_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.TMDB_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.TMDB_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(
+                settings.TMDB_READ_TIMEOUT,
+                connect=settings.TMDB_CONNECT_TIMEOUT,
+                pool=settings.TMDB_POOL_TIMEOUT,
+            ),
+        )
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def cache_key(self, url: str, params: Dict) -> str:
+        path = url[len(self.base_url):] if url.startswith(self.base_url) else url
+        query = urlencode(sorted((k, str(v)) for k, v in params.items() if k != "api_key"))
+        return f"{path}?{query}"
+
+    async def _get(
+        self,
+        url: str,
+        params: Dict,
+        ttl: Optional[float] = None,
+        timeout: Optional[httpx.Timeout] = None,
+    ) -> Dict:
+        key = self.cache_key(url, params)
+        if ttl:
+            cached = await self.cache.get(key)
+            if cached is not None:
+                return json.loads(cached)
+        # Concurrent misses for the same (endpoint, params) share one upstream request;
+        # every caller decodes its own copy so results are never shared mutable objects
+        body = await self.singleflight.do(key, lambda: self._fetch_and_store(key, url, params, ttl, timeout))
+        return json.loads(body)
+
+    async def _fetch_and_store(
+        self,
+        key: str,
+        url: str,
+        params: Dict,
+        ttl: Optional[float],
+        timeout: Optional[httpx.Timeout],
+    ) -> bytes:
+        body = await self._fetch(url, params, timeout)
+        if ttl or self._listeners:
+            data = json.loads(body)  # never cache a body that does not decode
+            if ttl:
+                await self.cache.set(key, body, ttl)
+            self._notify(data)
+        return body
+
+    def add_listener(self, callback: Callable[[List[Dict]], None]):
+        """Register a callback that receives every movie seen in a fresh upstream response"""
+        self._listeners.append(callback)
+
+    def _notify(self, data):
+        if not self._listeners or not isinstance(data, dict):
+            return
+        movies = [movie for movie in data.get("results") or [] if isinstance(movie, dict) and "title" in movie]
+        if "title" in data and "id" in data:
+            movies.append(data)
+        for appended in ("similar", "recommendations"):
+            if isinstance(data.get(appended), dict):
+                movies.extend(data[appended].get("results") or [])
+        if not movies:
+            return
+        for callback in self._listeners:
+            try:
+                callback(movies)
+            except Exception as e:
+                print(f"Error in TMDB listener: {e}")
+
+    async def _fetch(self, url: str, params: Dict, timeout: Optional[httpx.Timeout] = None) -> bytes:
+        if self._client is None:
+            # Scripts and tests may call the service without running the lifespan hook
+            await self.start()
+        self._requests += 1
+        self._in_flight += 1
+        self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+        endpoint = tmdb_endpoint(url[len(self.base_url):] if url.startswith(self.base_url) else url)
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            if timeout is None:
+                resp = await self.scheduler.send(lambda: self._client.get(url, params=params))
+            else:
+                resp = await self.scheduler.send(lambda: self._client.get(url, params=params, timeout=timeout))
+            outcome = str(resp.status_code)
+            resp.raise_for_status()
+            return resp.content
+        except httpx.TimeoutException:
+            outcome = "timeout"
+            raise
+        finally:
+            self._in_flight -= 1
+            tmdb_request_duration.labels(endpoint).observe(time.perf_counter() - started)
+            tmdb_requests.labels(endpoint, outcome).inc()
+
+    async def invalidate_cache(self, path_prefix: str = "") -> int:
+        """Drop cached responses whose TMDB path starts with path_prefix, e.g. "/movie/550" """
+        return await self.cache.invalidate_prefix(path_prefix)
+
+    def pool_stats(self) -> Dict:
+        """Connection pool utilization for the shared upstream client"""
+        stats = {
+            "max_connections": settings.TMDB_MAX_CONNECTIONS,
+            "max_keepalive_connections": settings.TMDB_MAX_KEEPALIVE_CONNECTIONS,
+            "requests": self._requests,
+            "in_flight": self._in_flight,
+            "peak_in_flight": self._peak_in_flight,
+            "connections": 0,
+            "idle_connections": 0,
+            "http2_connections": 0,
+        }
+        # httpx does not expose pool state publicly, read it off the httpcore pool
+        pool = getattr(getattr(self._client, "_transport", None), "_pool", None)
+        for conn in getattr(pool, "connections", []):
+            stats["connections"] += 1
+            if conn.is_idle():
+                stats["idle_connections"] += 1
+            if getattr(conn, "_connection", None).__class__.__name__ == "AsyncHTTP2Connection":
+                stats["http2_connections"] += 1
+        return stats
+
     async def get_trending_movies(self, time_window: str = "day") -> List[Dict]:
         url = f"{self.base_url}/trending/movie/{time_window}"
         params = {"api_key": self.api_key}
-        async with httpx.AsyncClient() as client:
-            try:
-                resp = await client.get(url, params=params)
-                resp.raise_for_status()
-                return resp.json().get("results", [])
-            except Exception as e:
-                print(f"Error in get_trending_movies: {e}")
-                return []
+        try:
+            data = await self._get(url, params, ttl=CACHE_TTLS["trending"])
+            return data.get("results", [])
+        except UpstreamRateLimited:
+            raise
+        except Exception as e:
+            print(f"Error in get_trending_movies: {e}")
+            return []
 
     async def get_popular_movies(self) -> List[Dict]:
         url = f"{self.base_url}/movie/popular"
         params = {"api_key": self.api_key}
-        async with httpx.AsyncClient() as client:
-            try:
-                resp = await client.get(url, params=params)
-                resp.raise_for_status()
-                return resp.json().get("results", [])
-            except Exception as e:
-                print(f"Error in get_popular_movies: {e}")
-                return []
+        try:
+            data = await self._get(url, params, ttl=CACHE_TTLS["lists"])
+            return data.get("results", [])
+        except UpstreamRateLimited:
+            raise
+        except Exception as e:
+            print(f"Error in get_popular_movies: {e}")
+            return []
 
     async def get_upcoming_movies(self) -> List[Dict]:
         url = f"{self.base_url}/movie/upcoming"
         params = {"api_key": self.api_key}
-        async with httpx.AsyncClient() as client:
-            try:
-                resp = await client.get(url, params=params)
-                resp.raise_for_status()
-                return resp.json().get("results", [])
-            except Exception as e:
-                print(f"Error in get_upcoming_movies: {e}")
-                return []
+        try:
+            data = await self._get(url, params, ttl=CACHE_TTLS["lists"])
+            return data.get("results", [])
+        except UpstreamRateLimited:
+            raise
+        except Exception as e:
+            print(f"Error in get_upcoming_movies: {e}")
+            return []
 
     async def get_top_rated_movies(self) -> List[Dict]:
         url = f"{self.base_url}/movie/top_rated"
         params = {"api_key": self.api_key}
-        async with httpx.AsyncClient() as client:
-            try:
-                resp = await client.get(url, params=params)
-                resp.raise_for_status()
-                return resp.json().get("results", [])
-            except Exception as e:
-                print(f"Error in get_top_rated_movies: {e}")
-                return []
+        try:
+            data = await self._get(url, params, ttl=CACHE_TTLS["lists"])
+            return data.get("results", [])
+        except UpstreamRateLimited:
+            raise
+        except Exception as e:
+            print(f"Error in get_top_rated_movies: {e}")
+            return []
 
     async def get_now_playing_movies(self) -> List[Dict]:
         url = f"{self.base_url}/movie/now_playing"
         params = {"api_key": self.api_key}
-        async with httpx.AsyncClient() as client:
-            try:
-                resp = await client.get(url, params=params)
-                resp.raise_for_status()
-                return resp.json().get("results", [])
-            except Exception as e:
-                print(f"Error in get_now_playing_movies: {e}")
-                return []
+        try:
+            data = await self._get(url, params, ttl=CACHE_TTLS["lists"])
+            return data.get("results", [])
+        except UpstreamRateLimited:
+            raise
+        except Exception as e:
+            print(f"Error in get_now_playing_movies: {e}")
+            return []
 
     async def search_movies(self, query: str, page: int = 1, include_adult: bool = False) -> Dict:
         url = f"{self.base_url}/search/movie"
@@ -76,14 +254,13 @@ class TMDBService:
             "page": page,
             "include_adult": include_adult
         }
-        async with httpx.AsyncClient() as client:
-            try:
-                resp = await client.get(url, params=params)
-                resp.raise_for_status()
-                return resp.json()
-            except Exception as e:
-                print(f"Error in search_movies: {e}")
-                return {"results": [], "page": page, "total_pages": 0, "total_results": 0}
+        try:
+            return await self._get(url, params, ttl=CACHE_TTLS["search"])
+        except UpstreamRateLimited:
+            raise
+        except Exception as e:
+            print(f"Error in search_movies: {e}")
+            return {"results": [], "page": page, "total_pages": 0, "total_results": 0}
 
     async def discover_movies(self, **filters) -> Dict:
         url = f"{self.base_url}/discover/movie"
@@ -97,171 +274,236 @@ class TMDBService:
             params["year"] = filters["year"]
         if filters.get("vote_average_gte"):
             params["vote_average.gte"] = filters["vote_average_gte"]
+        if filters.get("vote_average_lte"):
+            params["vote_average.lte"] = filters["vote_average_lte"]
+        if filters.get("vote_count_gte"):
+            params["vote_count.gte"] = filters["vote_count_gte"]
+        if filters.get("year_gte"):
+            params["primary_release_date.gte"] = f"{filters['year_gte']}-01-01"
+        if filters.get("year_lte"):
+            params["primary_release_date.lte"] = f"{filters['year_lte']}-12-31"
         if filters.get("page"):
             params["page"] = filters["page"]
-        async with httpx.AsyncClient() as client:
-            try:
-                resp = await client.get(url, params=params)
-                resp.raise_for_status()
-                return resp.json()
-            except Exception as e:
-                print(f"Error in discover_movies: {e}")
-                return {"results": [], "page": 1, "total_pages": 0, "total_results": 0}
+        try:
+            return await self._get(url, params, ttl=CACHE_TTLS["discover"])
+        except UpstreamRateLimited:
+            raise
+        except Exception as e:
+            print(f"Error in discover_movies: {e}")
+            return {"results": [], "page": 1, "total_pages": 0, "total_results": 0}
+
+    async def get_movie_details(self, movie_id: int, append_to_response: Optional[List[str]] = None) -> Dict:
+        try:
+            return await self._movie_details(movie_id, append_to_response)
+        except UpstreamRateLimited:
+            raise
+        except Exception as e:
+            print(f"Error in get_movie_details: {e}")
+            return {}
 
-    async def get_movie_details(self, movie_id: int) -> Dict:
+    async def _movie_details(self, movie_id: int, append_to_response: Optional[List[str]] = None) -> Dict:
         url = f"{self.base_url}/movie/{movie_id}"
         params = {"api_key": self.api_key}
-        async with httpx.AsyncClient() as client:
-            try:
-                resp = await client.get(url, params=params)
-                resp.raise_for_status()
-                return resp.json()
-            except Exception as e:
-                print(f"Error in get_movie_details: {e}")
-                return {}
+        if append_to_response:
+            params["append_to_response"] = ",".join(append_to_response)
+        return await self._get(url, params, ttl=CACHE_TTLS["details"])
+
+    async def iter_movie_batch(self, movie_ids: List[int], fields: Optional[List[str]] = None) -> AsyncIterator[Dict]:
+        """Resolve many movies with bounded concurrency, yielding each item as soon as it is ready.
+
+        Items are {"id", "data"} or {"id", "error": {"code", "message"}}; duplicate ids are
+        fetched once, and one failure never fails the rest of the batch.
+        """
+        appended = [field for field in fields or [] if field in APPENDABLE_FIELDS]
+        semaphore = asyncio.Semaphore(settings.BATCH_CONCURRENCY)
+
+        async def resolve(movie_id: int) -> Dict:
+            async with semaphore:
+                try:
+                    details = await self._movie_details(movie_id, appended)
+                except UpstreamRateLimited:
+                    return {"id": movie_id, "error": {"code": "rate_limited", "message": "TMDB rate limit exceeded"}}
+                except httpx.HTTPStatusError as e:
+                    if e.response.status_code == 404:
+                        return {"id": movie_id, "error": {"code": "not_found", "message": "Movie not found"}}
+                    return {"id": movie_id, "error": {"code": "upstream_error", "message": f"TMDB returned {e.response.status_code}"}}
+                except Exception as e:
+                    print(f"Error in iter_movie_batch for {movie_id}: {e}")
+                    return {"id": movie_id, "error": {"code": "upstream_error", "message": "TMDB request failed"}}
+            if fields is not None:
+                details = {key: details[key] for key in ["id", *fields] if key in details}
+            return {"id": movie_id, "data": details}
+
+        tasks = [asyncio.create_task(resolve(movie_id)) for movie_id in dict.fromkeys(movie_ids)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # The consumer went away (e.g. a streaming client disconnected): stop the rest
+            for task in tasks:
+                task.cancel()
+
+    async def get_movie_bundle(self, movie_id: int, fields: List[str]) -> Dict:
+        """Fetch several parts of one movie in as few upstream requests as possible"""
+        appended = [field for field in fields if field in APPENDABLE_FIELDS]
+        requests = {}
+        if "details" in fields or appended:
+            requests["details"] = self.get_movie_details(movie_id, appended)
+        if "images" in fields:
+            # Appended images are filtered by language, so fetch them on their own to match /images
+            requests["images"] = self.get_movie_images(movie_id)
+        results = dict(zip(requests, await asyncio.gather(*requests.values())))
+
+        details = results.get("details", {})
+        if "details" in results and not details:
+            return {}
+        bundle = {"id": movie_id}
+        for field in appended:
+            part = details.pop(field, None) or {}
+            if field in ("videos", "recommendations"):
+                bundle[field] = part.get("results", [])
+            else:
+                bundle[field] = part
+        if "details" in fields:
+            bundle["details"] = details
+        if "images" in results:
+            bundle["images"] = results["images"]
+        return bundle
 
     async def get_movie_videos(self, movie_id: int) -> List[Dict]:
         url = f"{self.base_url}/movie/{movie_id}/videos"
         params = {"api_key": self.api_key}
-        async with httpx.AsyncClient() as client:
-            try:
-                resp = await client.get(url, params=params)
-                resp.raise_for_status()
-                return resp.json().get("results", [])
-            except Exception as e:
-                print(f"Error in get_movie_videos: {e}")
-                return []
+        try:
+            data = await self._get(url, params, ttl=CACHE_TTLS["videos"])
+            return data.get("results", [])
+        except UpstreamRateLimited:
+            raise
+        except Exception as e:
+            print(f"Error in get_movie_videos: {e}")
+            return []
 
     async def get_movie_credits(self, movie_id: int) -> Dict:
         url = f"{self.base_url}/movie/{movie_id}/credits"
         params = {"api_key": self.api_key}
-        async with httpx.AsyncClient() as client:
-            try:
-                resp = await client.get(url, params=params)
-                resp.raise_for_status()
-                return resp.json()
-            except Exception as e:
-                print(f"Error in get_movie_credits: {e}")
-                return {"cast": [], "crew": []}
+        try:
+            return await self._get(url, params, ttl=CACHE_TTLS["credits"])
+        except UpstreamRateLimited:
+            raise
+        except Exception as e:
+            print(f"Error in get_movie_credits: {e}")
+            return {"cast": [], "crew": []}
 
     async def get_movie_images(self, movie_id: int) -> Dict:
         url = f"{self.base_url}/movie/{movie_id}/images"
         params = {"api_key": self.api_key}
-        async with httpx.AsyncClient() as client:
-            try:
-                resp = await client.get(url, params=params)
-                resp.raise_for_status()
-                return resp.json()
-            except Exception as e:
-                print(f"Error in get_movie_images: {e}")
-                return {"backdrops": [], "posters": [], "logos": []}
+        try:
+            return await self._get(url, params, ttl=CACHE_TTLS["images"])
+        except UpstreamRateLimited:
+            raise
+        except Exception as e:
+            print(f"Error in get_movie_images: {e}")
+            return {"backdrops": [], "posters": [], "logos": []}
 
     async def get_movie_reviews(self, movie_id: int, page: int = 1) -> Dict:
         url = f"{self.base_url}/movie/{movie_id}/reviews"
         params = {"api_key": self.api_key, "page": page}
-        async with httpx.AsyncClient() as client:
-            try:
-                resp = await client.get(url, params=params)
-                resp.raise_for_status()
-                return resp.json()
-            except Exception as e:
-                print(f"Error in get_movie_reviews: {e}")
-                return {"results": [], "page": page, "total_pages": 0, "total_results": 0}
+        try:
+            return await self._get(url, params, ttl=CACHE_TTLS["reviews"])
+        except UpstreamRateLimited:
+            raise
+        except Exception as e:
+            print(f"Error in get_movie_reviews: {e}")
+            return {"results": [], "page": page, "total_pages": 0, "total_results": 0}
 
     async def get_similar_movies(self, movie_id: int, page: int = 1) -> Dict:
         url = f"{self.base_url}/movie/{movie_id}/similar"
         params = {"api_key": self.api_key, "page": page}
-        async with httpx.AsyncClient() as client:
-            try:
-                resp = await client.get(url, params=params)
-                resp.raise_for_status()
-                return resp.json()
-            except Exception as e:
-                print(f"Error in get_similar_movies: {e}")
-                return {"results": [], "page": page, "total_pages": 0, "total_results": 0}
+        try:
+            return await self._get(url, params, ttl=CACHE_TTLS["similar"])
+        except UpstreamRateLimited:
+            raise
+        except Exception as e:
+            print(f"Error in get_similar_movies: {e}")
+            return {"results": [], "page": page, "total_pages": 0, "total_results": 0}
 
     async def get_movie_recommendations(self, movie_id: int) -> List[Dict]:
         url = f"{self.base_url}/movie/{movie_id}/recommendations"
         params = {"api_key": self.api_key}
-        async with httpx.AsyncClient() as client:
-            try:
-                resp = await client.get(url, params=params)
-                resp.raise_for_status()
-                return resp.json().get("results", [])
-            except Exception as e:
-                print(f"Error in get_movie_recommendations: {e}")
-                return []
+        try:
+            data = await self._get(url, params, ttl=CACHE_TTLS["recommendations"])
+            return data.get("results", [])
+        except UpstreamRateLimited:
+            raise
+        except Exception as e:
+            print(f"Error in get_movie_recommendations: {e}")
+            return []
 
     async def get_movie_genres(self) -> List[Dict]:
         url = f"{self.base_url}/genre/movie/list"
         params = {"api_key": self.api_key}
-        async with httpx.AsyncClient() as client:
-            try:
-                resp = await client.get(url, params=params)
-                resp.raise_for_status()
-                return resp.json().get("genres", [])
-            except Exception as e:
-                print(f"Error in get_movie_genres: {e}")
-                return []
+        try:
+            data = await self._get(url, params, ttl=CACHE_TTLS["genres"])
+            return data.get("genres", [])
+        except UpstreamRateLimited:
+            raise
+        except Exception as e:
+            print(f"Error in get_movie_genres: {e}")
+            return []
 
     async def get_person_details(self, person_id: int) -> Dict:
         url = f"{self.base_url}/person/{person_id}"
         params = {"api_key": self.api_key}
-        async with httpx.AsyncClient() as client:
-            try:
-                resp = await client.get(url, params=params)
-                resp.raise_for_status()
-                return resp.json()
-            except Exception as e:
-                print(f"Error in get_person_details: {e}")
-                return {}
+        try:
+            return await self._get(url, params, ttl=CACHE_TTLS["person"])
+        except UpstreamRateLimited:
+            raise
+        except Exception as e:
+            print(f"Error in get_person_details: {e}")
+            return {}
 
     async def get_person_movie_credits(self, person_id: int) -> Dict:
         url = f"{self.base_url}/person/{person_id}/movie_credits"
         params = {"api_key": self.api_key}
-        async with httpx.AsyncClient() as client:
-            try:
-                resp = await client.get(url, params=params)
-                resp.raise_for_status()
-                return resp.json()
-            except Exception as e:
-                print(f"Error in get_person_movie_credits: {e}")
-                return {}
+        try:
+            return await self._get(url, params, ttl=CACHE_TTLS["person"])
+        except UpstreamRateLimited:
+            raise
+        except Exception as e:
+            print(f"Error in get_person_movie_credits: {e}")
+            return {}
 
     async def get_configuration(self) -> Dict:
         url = f"{self.base_url}/configuration"
         params = {"api_key": self.api_key}
-        async with httpx.AsyncClient() as client:
-            try:
-                resp = await client.get(url, params=params)
-                resp.raise_for_status()
-                return resp.json()
-            except Exception as e:
-                print(f"Error in get_configuration: {e}")
-                return {}
+        try:
+            return await self._get(url, params, ttl=CACHE_TTLS["configuration"])
+        except UpstreamRateLimited:
+            raise
+        except Exception as e:
+            print(f"Error in get_configuration: {e}")
+            return {}
 
     async def get_trending_people(self, time_window: str = "day") -> List[Dict]:
         url = f"{self.base_url}/trending/person/{time_window}"
         params = {"api_key": self.api_key}
-        async with httpx.AsyncClient() as client:
-            try:
-                resp = await client.get(url, params=params)
-                resp.raise_for_status()
-                return resp.json().get("results", [])
-            except Exception as e:
-                print(f"Error in get_trending_people: {e}")
-                return []
+        try:
+            data = await self._get(url, params, ttl=CACHE_TTLS["trending"])
+            return data.get("results", [])
+        except UpstreamRateLimited:
+            raise
+        except Exception as e:
+            print(f"Error in get_trending_people: {e}")
+            return []
 
     async def get_movie_collection(self, collection_id: int) -> Dict:
         url = f"{self.base_url}/collection/{collection_id}"
         params = {"api_key": self.api_key}
-        async with httpx.AsyncClient() as client:
-            try:
-                resp = await client.get(url, params=params)
-                resp.raise_for_status()
-                return resp.json()
-            except Exception as e:
-                print(f"Error in get_movie_collection: {e}")
-                return {}
+        try:
+            return await self._get(url, params, ttl=CACHE_TTLS["collection"])
+        except UpstreamRateLimited:
+            raise
+        except Exception as e:
+            print(f"Error in get_movie_collection: {e}")
+            return {}
 
 tmdb_service = TMDBService()
\ No newline at end of file
@@ -0,0 +1,228 @@
+import time
+import heapq
+import random
+import asyncio
+import itertools
+from contextlib import contextmanager
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+import httpx
+from app.core.config import settings
+
+# Priority classes, lowest value dispatched first
+INTERACTIVE = 0
+BACKGROUND = 1
+PREFETCH = 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background", PREFETCH: "prefetch"}
+
+# Inherited by tasks created inside a priority() block (gather, singleflight, create_task)
+upstream_priority: ContextVar[int] = ContextVar("upstream_priority", default=INTERACTIVE)
+
+RETRYABLE_STATUS = {429, 502, 503, 504}
+
+
+class UpstreamRateLimited(Exception):
+    """TMDB still answered 429 after every retry; retry_after is its last Retry-After, if any"""
+
+    def __init__(self, retry_after: Optional[float] = None):
+        super().__init__("TMDB rate limit exceeded")
+        self.retry_after = retry_after
+
+
+@contextmanager
+def priority(level: int):
+    """Run upstream calls made in this block (and tasks it spawns) at the given priority"""
+    token = upstream_priority.set(level)
+    try:
+        yield
+    finally:
+        upstream_priority.reset(token)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self) -> float:
+        """Seconds until a token is available (0 when one is available now)"""
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def consume(self):
+        self.tokens -= 1
+
+
+class UpstreamScheduler:
+    """Single gate in front of every TMDB request.
+
+    Requests wait in a priority queue and are dispatched only when both a concurrency
+    slot and a rate-limit token are free. The concurrency limit adapts (AIMD): it grows
+    while responses are fast and healthy, halves on 429 and shrinks on latency spikes.
+    Throttled and failed requests are retried with jittered backoff, honouring Retry-After.
+    """
+
+    def __init__(self):
+        self.bucket = TokenBucket(settings.UPSTREAM_RATE_LIMIT, settings.UPSTREAM_BURST)
+        self.limit = float(settings.UPSTREAM_INITIAL_CONCURRENCY)
+        self.active = 0
+        self._waiters: List[tuple] = []
+        self._sequence = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # Set from Retry-After: nothing is dispatched before this monotonic time
+        self._paused_until = 0.0
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+        self.failures = 0
+        self.latency_spikes = 0
+        self.max_queue_depth = 0
+        self._waited: Dict[int, List[float]] = {level: [0, 0.0, 0.0] for level in PRIORITY_NAMES}
+
+    async def send(self, request: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+        """Run request() under the scheduler, retrying throttled and transient failures"""
+        level = upstream_priority.get()
+        attempt = 0
+        while True:
+            await self._acquire(level)
+            started = time.monotonic()
+            try:
+                response = await request()
+            except (httpx.TimeoutException, httpx.NetworkError):
+                self.failures += 1
+                self._decrease(0.5)
+                if attempt >= settings.UPSTREAM_MAX_RETRIES:
+                    raise
+                delay = self._backoff(attempt)
+            else:
+                latency = time.monotonic() - started
+                if response.status_code not in RETRYABLE_STATUS:
+                    self._on_response(latency)
+                    return response
+                if response.status_code == 429:
+                    self.throttled += 1
+                    self._decrease(0.5)
+                else:
+                    self.failures += 1
+                retry_after = self._retry_after(response)
+                if retry_after is not None:
+                    pause = min(retry_after, settings.UPSTREAM_MAX_RETRY_AFTER)
+                    self._paused_until = max(self._paused_until, time.monotonic() + pause)
+                if attempt >= settings.UPSTREAM_MAX_RETRIES or (retry_after or 0) > settings.UPSTREAM_MAX_RETRY_AFTER:
+                    if response.status_code == 429:
+                        # Distinct from an empty result, so callers can tell the two apart
+                        raise UpstreamRateLimited(retry_after)
+                    return response
+                delay = retry_after if retry_after is not None else self._backoff(attempt)
+            finally:
+                self._release()
+            attempt += 1
+            self.retries += 1
+            await asyncio.sleep(delay + random.uniform(0, settings.UPSTREAM_BACKOFF_BASE))
+
+    async def _acquire(self, level: int):
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (level, next(self._sequence), future, time.monotonic()))
+        self.max_queue_depth = max(self.max_queue_depth, len(self._waiters))
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted a slot just as we were cancelled; hand it back
+                self._release()
+            raise
+        self.requests += 1
+
+    def _release(self):
+        self.active -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        while self._waiters and self.active < int(self.limit):
+            delay = max(self._paused_until - time.monotonic(), self.bucket.delay())
+            if delay > 0:
+                if self._timer is None:
+                    self._timer = asyncio.get_running_loop().call_later(delay, self._on_timer)
+                return
+            level, _, future, queued_at = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self.bucket.consume()
+            self.active += 1
+            stats = self._waited[level]
+            waited = time.monotonic() - queued_at
+            stats[0] += 1
+            stats[1] += waited
+            stats[2] = max(stats[2], waited)
+            future.set_result(None)
+
+    def _on_timer(self):
+        self._timer = None
+        self._dispatch()
+
+    def _on_response(self, latency: float):
+        if latency > settings.UPSTREAM_LATENCY_TARGET:
+            self.latency_spikes += 1
+            self._decrease(0.9)
+        else:
+            # Additive increase: roughly +1 slot per limit's worth of healthy responses
+            self.limit = min(settings.UPSTREAM_MAX_CONCURRENCY, self.limit + 1 / self.limit)
+            self._dispatch()
+
+    def _decrease(self, factor: float):
+        self.limit = max(settings.UPSTREAM_MIN_CONCURRENCY, self.limit * factor)
+
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        # Full jitter exponential backoff
+        return random.uniform(0, min(settings.UPSTREAM_BACKOFF_MAX, settings.UPSTREAM_BACKOFF_BASE * 2 ** attempt))
+
+    @staticmethod
+    def _retry_after(response: httpx.Response) -> Optional[float]:
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    def stats(self) -> Dict:
+        queued = {name: 0 for name in PRIORITY_NAMES.values()}
+        for level, _, future, _ in self._waiters:
+            if not future.done():
+                queued[PRIORITY_NAMES[level]] += 1
+        return {
+            "concurrency_limit": round(self.limit, 2),
+            "active": self.active,
+            "tokens": round(self.bucket.tokens, 2),
+            "paused_seconds": round(max(0.0, self._paused_until - time.monotonic()), 2),
+            "queued": queued,
+            "max_queue_depth": self.max_queue_depth,
+            "wait_seconds": {
+                PRIORITY_NAMES[level]: {
+                    "count": count,
+                    "avg": round(total / count, 4) if count else 0.0,
+                    "max": round(longest, 4),
+                }
+                for level, (count, total, longest) in self._waited.items()
+            },
+            "requests": self.requests,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "failures": self.failures,
+            "latency_spikes": self.latency_spikes,
+        }
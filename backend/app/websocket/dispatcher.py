@@ -0,0 +1,208 @@
+import json
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional
+from fastapi import WebSocket
+from pydantic import ValidationError
+from app.core.config import settings
+from app.core.metrics import ws_messages_in
+from app.services.tmdb_service import tmdb_service
+from app.schemas.movie import MultiSeedRequest
+from app.services.recommender import get_recommendations, get_multi_seed_recommendations
+from app.services.collaborative import collaborative_recommender
+from app.services.search_index import search_service
+from app.services.upstream import UpstreamRateLimited
+from app.websocket.manager import manager
+
+# message type -> coroutine(session, message) returning the reply payload, or None for no reply
+handlers: Dict[str, Callable[["ClientSession", Dict], Awaitable[Optional[Dict]]]] = {}
+
+# Message types where a newer request from the same client makes the older one stale
+SUPERSEDING_TYPES = {"search"}
+
+
+class MessageError(Exception):
+    def __init__(self, code: str, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def handler(message_type: str):
+    def register(fn: Callable[["ClientSession", Dict], Awaitable[Optional[Dict]]]):
+        handlers[message_type] = fn
+        return fn
+    return register
+
+
+def require(message: Dict, field: str, kind: type) -> Any:
+    value = message.get(field)
+    if isinstance(value, bool) or not isinstance(value, kind):
+        raise MessageError("invalid_message", f"'{field}' must be {kind.__name__}")
+    return value
+
+
+@handler("get_recommendations")
+async def handle_recommendations(session: "ClientSession", message: Dict) -> Dict:
+    movie_id = require(message, "movie_id", int)
+    # The movie this client opened is its implicit feedback for collaborative filtering
+    collaborative_recommender.record(session.client_id, movie_id)
+    recommendations = await get_recommendations(movie_id)
+    return {
+        "type": "recommendations",
+        "movie_id": movie_id,
+        "data": recommendations
+    }
+
+
+@handler("get_multi_recommendations")
+async def handle_multi_recommendations(session: "ClientSession", message: Dict) -> Dict:
+    try:
+        request = MultiSeedRequest.model_validate(message)
+    except ValidationError as e:
+        error = e.errors()[0]
+        raise MessageError("invalid_message", f"'{'.'.join(map(str, error['loc']))}': {error['msg']}")
+    if len(request.seeds) > settings.MULTI_SEED_MAX_SEEDS:
+        raise MessageError("invalid_message", f"at most {settings.MULTI_SEED_MAX_SEEDS} seeds per request")
+    fused = await get_multi_seed_recommendations(
+        [(seed.movie_id, seed.weight) for seed in request.seeds], request.limit, request.fusion
+    )
+    return {
+        "type": "multi_recommendations",
+        "seeds": [seed.movie_id for seed in request.seeds],
+        "data": fused["results"],
+        "failed_seeds": fused["failed_seeds"]
+    }
+
+
+@handler("get_personal_recommendations")
+async def handle_personal_recommendations(session: "ClientSession", message: Dict) -> Dict:
+    limit = message.get("limit", 20)
+    if isinstance(limit, bool) or not isinstance(limit, int) or not 1 <= limit <= 100:
+        raise MessageError("invalid_message", "'limit' must be an int between 1 and 100")
+    movies, personalized = await collaborative_recommender.recommend(session.client_id, limit)
+    return {
+        "type": "personal_recommendations",
+        "personalized": personalized,
+        "data": movies
+    }
+
+
+@handler("search")
+async def handle_search(session: "ClientSession", message: Dict) -> Dict:
+    query = require(message, "query", str).strip()
+    if not query:
+        raise MessageError("invalid_message", "'query' must not be empty")
+    return {
+        "type": "search_results",
+        "query": query,
+        "data": await search_titles(query)
+    }
+
+
+@handler("get_trending")
+async def handle_get_trending(session: "ClientSession", message: Dict) -> None:
+    # Resync after a trending_delta whose base_version the client does not hold
+    manager.resync_trending(session.websocket)
+
+
+async def search_titles(query: str) -> Dict:
+    """Local index when it has enough hits, TMDB otherwise"""
+    if settings.SEARCH_MODE == "local":
+        local = search_service.search(query, 20)
+        if len(local) >= settings.SEARCH_MIN_LOCAL_RESULTS:
+            return {"results": local, "page": 1, "total_pages": 1, "total_results": len(local)}
+    return await tmdb_service.search_movies(query)
+
+
+class ClientSession:
+    """Runs each inbound message of one connection as its own task.
+
+    At most WS_MAX_CONCURRENT_REQUESTS handlers run at once per client, a newer message
+    of a superseding type cancels the older in-flight one, and every reply echoes the
+    client's request_id so out-of-order replies can be matched.
+    """
+
+    def __init__(self, websocket: WebSocket, client_id: str):
+        self.websocket = websocket
+        self.client_id = client_id
+        self.semaphore = asyncio.Semaphore(settings.WS_MAX_CONCURRENT_REQUESTS)
+        self.tasks: set = set()
+        self.latest: Dict[str, asyncio.Task] = {}
+
+    def dispatch(self, raw: str):
+        request_id = None
+        try:
+            message = json.loads(raw)
+            if not isinstance(message, dict):
+                ws_messages_in.labels("invalid").inc()
+                raise MessageError("invalid_message", "message must be a JSON object")
+            request_id = message.get("request_id")
+            message_type = message.get("type")
+            if not isinstance(message_type, str):
+                ws_messages_in.labels("invalid").inc()
+                raise MessageError("invalid_message", "'type' must be str")
+            fn = handlers.get(message_type)
+            ws_messages_in.labels(message_type if fn is not None else "invalid").inc()
+            if fn is None:
+                raise MessageError("unknown_type", f"unknown message type: {message_type!r}")
+            if len(self.tasks) >= settings.WS_MAX_PENDING_REQUESTS:
+                raise MessageError("too_many_requests", "too many requests in flight")
+        except json.JSONDecodeError:
+            ws_messages_in.labels("invalid").inc()
+            self._send_error(None, "invalid_json", "message is not valid JSON")
+            return
+        except MessageError as e:
+            self._send_error(request_id, e.code, e.message)
+            return
+        except Exception as e:
+            # A malformed message gets an error reply; it never takes the connection down
+            print(f"Error dispatching message for client {self.client_id}: {e}")
+            self._send_error(request_id, "internal_error", "request failed")
+            return
+
+        if message_type in SUPERSEDING_TYPES:
+            previous = self.latest.get(message_type)
+            if previous is not None and not previous.done():
+                previous.cancel()
+        task = asyncio.create_task(self._run(fn, message, request_id))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        if message_type in SUPERSEDING_TYPES:
+            self.latest[message_type] = task
+
+    async def _run(self, fn: Callable[["ClientSession", Dict], Awaitable[Optional[Dict]]], message: Dict, request_id: Optional[Any]):
+        try:
+            async with self.semaphore:
+                reply = await fn(self, message)
+        except asyncio.CancelledError:
+            return
+        except MessageError as e:
+            self._send_error(request_id, e.code, e.message)
+            return
+        except UpstreamRateLimited:
+            self._send_error(request_id, "rate_limited", "TMDB rate limit exceeded, retry later")
+            return
+        except Exception as e:
+            print(f"Error handling {message.get('type')} for client {self.client_id}: {e}")
+            self._send_error(request_id, "internal_error", "request failed")
+            return
+        if reply is None:
+            return
+        if request_id is not None:
+            reply["request_id"] = request_id
+        await manager.send_personal_message(json.dumps(reply), self.websocket)
+
+    def _send_error(self, request_id: Optional[Any], code: str, message: str):
+        reply = {"type": "error", "error": {"code": code, "message": message}}
+        if request_id is not None:
+            reply["request_id"] = request_id
+        task = asyncio.create_task(manager.send_personal_message(json.dumps(reply), self.websocket))
+        # The loop only holds a weak reference to tasks
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def close(self):
+        tasks = list(self.tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
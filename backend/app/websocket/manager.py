@@ -1,50 +1,326 @@
 import json
+import time
 import asyncio
-from typing import List
+import hashlib
+from collections import OrderedDict, deque
+from typing import Callable, Dict, List, Optional, Set
 from fastapi import WebSocket, WebSocketDisconnect
-from app.services.tmdb_service import tmdb_service
+from app.core.config import settings
+from app.core.metrics import ws_broadcast_duration, ws_messages_out
+from app.services.snapshots import snapshot_service
+
+
+def trending_delta(base: List[Dict], current: List[Dict]) -> Dict:
+    """Changes that turn one trending list into the next: new order, added movies, removed ids, changed fields"""
+    before = {movie["id"]: movie for movie in base}
+    order = [movie["id"] for movie in current]
+    kept = set(order)
+    changed = {}
+    for movie in current:
+        old = before.get(movie["id"])
+        if old is not None:
+            fields = {key: value for key, value in movie.items() if old.get(key) != value}
+            if fields:
+                changed[str(movie["id"])] = fields
+    return {
+        "order": order,
+        "added": [movie for movie in current if movie["id"] not in before],
+        "removed": [movie_id for movie_id in before if movie_id not in kept],
+        "changed": changed,
+    }
+
+
+class BroadcastTracker:
+    """Counts outstanding deliveries of one broadcast so fan-out latency can be measured"""
+
+    __slots__ = ("started", "pending", "finished", "_done")
+
+    def __init__(self, pending: int):
+        self.started = time.perf_counter()
+        self.pending = pending
+        self.finished: Optional[float] = None
+        self._done = asyncio.Event()
+        if pending == 0:
+            self._finish()
+
+    def delivered(self, manager: "ConnectionManager"):
+        self.pending -= 1
+        if self.pending == 0:
+            self._finish()
+            manager._record_broadcast(self.finished)
+
+    def _finish(self):
+        self.finished = time.perf_counter() - self.started
+        self._done.set()
+
+    async def wait(self) -> float:
+        await self._done.wait()
+        return self.finished
+
+
+class Client:
+    """One socket with its own bounded outbound queue drained by a dedicated writer task"""
+
+    __slots__ = ("websocket", "client_id", "queue", "ready", "writer", "delta", "trending_version")
+
+    def __init__(self, websocket: WebSocket, client_id: Optional[str], delta: bool = False):
+        self.websocket = websocket
+        self.client_id = client_id
+        # Opted in to trending_delta frames; trending_version is what it holds once its queue drains
+        self.delta = delta
+        self.trending_version: Optional[str] = None
+        # Entries are [payload, coalesce_key, tracker]
+        self.queue: deque = deque()
+        self.ready = asyncio.Event()
+        self.writer: Optional[asyncio.Task] = None
+
 
 class ConnectionManager:
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
-        
-    async def connect(self, websocket: WebSocket):
+        # Keyed by socket: O(1) register and unregister at any connection count
+        self.active_connections: Dict[WebSocket, Client] = {}
+        self.broadcasts = 0
+        self.last_broadcast_seconds = 0.0
+        self.max_broadcast_seconds = 0.0
+        self.coalesced_frames = 0
+        self.dropped_clients = 0
+        # Pre-encoded "current trending" frames, rebuilt only when the list changes
+        self.trending_version: Optional[str] = None
+        self.trending_frame: Optional[str] = None
+        self.trending_update_frame: Optional[str] = None
+        self.trending_not_modified_frame: Optional[str] = None
+        self.trending_full_sends = 0
+        self.trending_not_modified_sends = 0
+        self.trending_delta_sends = 0
+        # Recent trending lists by version, oldest first, and delta frames from them to the current one
+        self._trending_history: "OrderedDict[str, List[Dict]]" = OrderedDict()
+        self._delta_frames: Dict[str, str] = {}
+        # Held so closes of dropped clients are not garbage collected mid-close
+        self._closing: Set[asyncio.Task] = set()
+
+    def set_trending(self, movies: List[Dict]) -> bool:
+        """Install a new trending list; returns False when it is identical to the current one"""
+        encoded = json.dumps(movies)
+        version = hashlib.sha1(encoded.encode()).hexdigest()[:16]
+        if version == self.trending_version:
+            return False
+        self.trending_version = version
+        self._trending_history.pop(version, None)
+        self._trending_history[version] = movies
+        while len(self._trending_history) > settings.WS_TRENDING_HISTORY:
+            self._trending_history.popitem(last=False)
+        self._delta_frames = {}
+        # Splice the already-encoded list into each envelope instead of encoding it again
+        self.trending_frame = f'{{"type": "trending_movies", "version": "{version}", "data": {encoded}}}'
+        self.trending_update_frame = f'{{"type": "trending_update", "version": "{version}", "data": {encoded}}}'
+        self.trending_not_modified_frame = json.dumps({"type": "trending_not_modified", "version": version})
+        return True
+
+    def delta_frame(self, base_version: Optional[str]) -> Optional[str]:
+        """trending_delta frame from base_version to the current list; None when the base is unknown (a gap)"""
+        if base_version == self.trending_version:
+            return None
+        frame = self._delta_frames.get(base_version)
+        if frame is None:
+            base = self._trending_history.get(base_version)
+            if base is None:
+                return None
+            delta = trending_delta(base, self._trending_history[self.trending_version])
+            frame = json.dumps({"type": "trending_delta", "base_version": base_version, "version": self.trending_version, **delta})
+            # Deltas are only worth it while they are smaller than the full list
+            if len(frame) >= len(self.trending_update_frame):
+                frame = self.trending_update_frame
+            self._delta_frames[base_version] = frame
+        return None if frame is self.trending_update_frame else frame
+
+    def _trending_frame_for(self, client: Client) -> str:
+        frame = None
+        # A trending frame still queued would be coalesced away, so the client's base is unknown
+        if client.delta and not any(entry[1] == "trending" for entry in client.queue):
+            frame = self.delta_frame(client.trending_version)
+        if frame is None:
+            self.trending_full_sends += 1
+            frame = self.trending_update_frame
+        else:
+            self.trending_delta_sends += 1
+        client.trending_version = self.trending_version
+        return frame
+
+    async def broadcast_trending(self) -> BroadcastTracker:
+        """Push the current trending list: a delta for clients that can apply one, the full list otherwise"""
+        return await self.broadcast(self.trending_update_frame, coalesce_key="trending", render=self._trending_frame_for)
+
+    def resync_trending(self, websocket: WebSocket) -> bool:
+        """Send the full current list to a client that found a gap in its delta chain"""
+        client = self.active_connections.get(websocket)
+        if client is None or self.trending_frame is None:
+            return False
+        self.trending_full_sends += 1
+        client.trending_version = self.trending_version
+        return self._enqueue(client, self.trending_frame, "trending")
+
+    async def connect(
+        self,
+        websocket: WebSocket,
+        client_id: Optional[str] = None,
+        trending_version: Optional[str] = None,
+        delta: bool = False,
+    ) -> Client:
         await websocket.accept()
-        self.active_connections.append(websocket)
+        client = Client(websocket, client_id, delta)
+        client.writer = asyncio.create_task(self._writer(client))
+        self.active_connections[websocket] = client
         print(f"Client connected. Total connections: {len(self.active_connections)}")
-        
-        # Send initial trending movies when client connects
+
+        # Send initial trending movies when client connects: a shared frame, never a TMDB call per socket
         try:
-            trending_movies = await tmdb_service.get_trending_movies()
-            await websocket.send_text(json.dumps({
-                "type": "trending_movies",
-                "data": trending_movies
-            }))
+            if self.trending_frame is None:
+                snapshot = await snapshot_service.get("trending_day")
+                if not snapshot.data:
+                    # Nothing to share yet (TMDB unavailable); don't pin an empty frame
+                    self._enqueue(client, json.dumps({"type": "trending_movies", "data": []}))
+                    return client
+                self.set_trending(snapshot.data)
+            delta_frame = self.delta_frame(trending_version) if delta else None
+            if trending_version is not None and trending_version == self.trending_version:
+                self.trending_not_modified_sends += 1
+                self._enqueue(client, self.trending_not_modified_frame, "trending")
+            elif delta_frame is not None:
+                self.trending_delta_sends += 1
+                self._enqueue(client, delta_frame, "trending")
+            else:
+                self.trending_full_sends += 1
+                self._enqueue(client, self.trending_frame, "trending")
+            client.trending_version = self.trending_version
         except Exception as e:
             print(f"Error sending initial data: {e}")
-    
+        return client
+
     def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
-            print(f"Client disconnected. Total connections: {len(self.active_connections)}")
-    
-    async def send_personal_message(self, message: str, websocket: WebSocket):
+        client = self.active_connections.pop(websocket, None)
+        if client is None:
+            return
+        if client.writer is not None and client.writer is not asyncio.current_task():
+            client.writer.cancel()
+        # Anything still queued will never be delivered; settle its trackers
+        for _, _, tracker in client.queue:
+            if tracker is not None:
+                tracker.delivered(self)
+        client.queue.clear()
+        print(f"Client disconnected. Total connections: {len(self.active_connections)}")
+
+    async def remove(self, websocket: WebSocket):
+        """Disconnect and wait for the client's writer task to wind down"""
+        client = self.active_connections.get(websocket)
+        self.disconnect(websocket)
+        if client is not None and client.writer is not None:
+            await asyncio.gather(client.writer, return_exceptions=True)
+
+    async def send_personal_message(self, message: str, websocket: WebSocket) -> bool:
+        client = self.active_connections.get(websocket)
+        if client is None:
+            return False
+        return self._enqueue(client, message)
+
+    async def broadcast(
+        self,
+        message: str,
+        coalesce_key: Optional[str] = None,
+        render: Optional[Callable[[Client], str]] = None,
+    ) -> BroadcastTracker:
+        """Queue one pre-serialized frame for every client without waiting on any socket.
+
+        With a coalesce_key, a frame of the same kind still waiting in a client's queue is
+        replaced rather than followed, so slow clients only ever get the newest state.
+        render, when given, picks a per-client frame (usually one of a few shared ones).
+        """
+        clients = list(self.active_connections.values())
+        tracker = BroadcastTracker(len(clients))
+        self.broadcasts += 1
+        for client in clients:
+            frame = message if render is None else render(client)
+            if not self._enqueue(client, frame, coalesce_key, tracker):
+                tracker.delivered(self)
+        if not clients:
+            self._record_broadcast(tracker.finished)
+        return tracker
+
+    def _enqueue(
+        self,
+        client: Client,
+        message: str,
+        coalesce_key: Optional[str] = None,
+        tracker: Optional[BroadcastTracker] = None,
+    ) -> bool:
+        if coalesce_key is not None:
+            for entry in client.queue:
+                if entry[1] == coalesce_key:
+                    if entry[2] is not None:
+                        entry[2].delivered(self)
+                    entry[0], entry[2] = message, tracker
+                    self.coalesced_frames += 1
+                    return True
+        if len(client.queue) >= settings.WS_SEND_QUEUE_SIZE:
+            # Slow consumer: it cannot keep up, so drop it instead of buffering without bound
+            self.dropped_clients += 1
+            print(f"Dropping slow WebSocket client {client.client_id}")
+            self.disconnect(client.websocket)
+            task = asyncio.create_task(self._close(client.websocket))
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+            return False
+        client.queue.append([message, coalesce_key, tracker])
+        client.ready.set()
+        return True
+
+    async def _writer(self, client: Client):
+        websocket = client.websocket
         try:
-            await websocket.send_text(message)
-        except Exception as e:
-            print(f"Error sending personal message: {e}")
-    
-    async def broadcast(self, message: str):
-        disconnected_clients = []
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message)
-            except:
-                disconnected_clients.append(connection)
-        
-        # Remove disconnected clients
-        for client in disconnected_clients:
-            self.disconnect(client)
+            while True:
+                if not client.queue:
+                    client.ready.clear()
+                    await client.ready.wait()
+                    continue
+                message, _, tracker = client.queue.popleft()
+                try:
+                    await asyncio.wait_for(websocket.send_text(message), settings.WS_SEND_TIMEOUT)
+                    ws_messages_out.inc()
+                finally:
+                    if tracker is not None:
+                        tracker.delivered(self)
+        except asyncio.CancelledError:
+            raise
+        except (WebSocketDisconnect, Exception) as e:
+            if websocket in self.active_connections:
+                print(f"Error sending to WebSocket client {client.client_id}: {e}")
+                self.disconnect(websocket)
+
+    async def _close(self, websocket: WebSocket):
+        try:
+            await websocket.close(code=1013)
+        except Exception:
+            pass
+
+    def _record_broadcast(self, seconds: float):
+        ws_broadcast_duration.observe(seconds)
+        self.last_broadcast_seconds = seconds
+        self.max_broadcast_seconds = max(self.max_broadcast_seconds, seconds)
+
+    def stats(self) -> Dict:
+        return {
+            "connections": len(self.active_connections),
+            "queued_frames": sum(len(client.queue) for client in self.active_connections.values()),
+            "broadcasts": self.broadcasts,
+            "last_broadcast_seconds": round(self.last_broadcast_seconds, 6),
+            "max_broadcast_seconds": round(self.max_broadcast_seconds, 6),
+            "coalesced_frames": self.coalesced_frames,
+            "dropped_clients": self.dropped_clients,
+            "trending_version": self.trending_version,
+            "trending_full_sends": self.trending_full_sends,
+            "trending_not_modified_sends": self.trending_not_modified_sends,
+            "trending_delta_sends": self.trending_delta_sends,
+            "trending_history": len(self._trending_history),
+        }
 
 # Create global manager instance
 manager = ConnectionManager()
@@ -0,0 +1,212 @@
+"""Local stand-in for the TMDB v3 API used by the load tests.
+
+    python -m benchmarks.fake_tmdb --port 8765 --latency-ms 40 --error-rate 0.01
+
+Responses are deterministic for a given path and query, so runs are comparable.
+Latency, error rate, 429 rate and payload size are configurable; trending can rotate
+every few seconds so the app has something new to broadcast. Tests can queue exact
+responses in `script` and have every request logged in `log`. /t/p/<size>/<file> stands
+in for the image CDN (point IMAGE_BASE_URL at http://host:port/t/p).
+"""
+import time
+import random
+import asyncio
+import argparse
+from collections import deque
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+GENRES = [28, 12, 16, 35, 80, 99, 18, 10751, 14, 36, 27, 10402, 9648, 10749, 878, 10770, 53, 10752, 37]
+WORDS = [
+    "star", "night", "dark", "love", "war", "city", "king", "ghost", "robot", "hero",
+    "moon", "river", "blood", "queen", "last", "first", "lost", "secret", "house", "summer",
+]
+CATALOG_SIZE = 20000
+
+
+class FakeTMDB:
+    def __init__(
+        self,
+        latency_ms: float = 20.0,
+        jitter_ms: float = 10.0,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        results_per_page: int = 20,
+        overview_words: int = 40,
+        trending_rotate_seconds: float = 0.0,
+        record: bool = False,
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.results_per_page = results_per_page
+        self.overview_words = overview_words
+        self.trending_rotate_seconds = trending_rotate_seconds
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+        self.images = 0
+        self._random = random.Random(0)
+        # (status, headers) answered, in order, before any normal response
+        self.script = deque()
+        # (monotonic time, path) of every API request, when record is set
+        self.record = record
+        self.log = []
+
+    def movie(self, movie_id: int) -> dict:
+        rng = random.Random(movie_id)
+        title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 3))).title()
+        return {
+            "adult": False,
+            "backdrop_path": f"/b{movie_id}.jpg",
+            "genre_ids": rng.sample(GENRES, 2),
+            "id": movie_id,
+            "original_language": "en",
+            "original_title": title,
+            "overview": " ".join(rng.choice(WORDS) for _ in range(self.overview_words)),
+            "popularity": round(rng.uniform(1, 500), 3),
+            "poster_path": f"/p{movie_id}.jpg",
+            "release_date": f"{rng.randint(1970, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "title": title,
+            "video": False,
+            "vote_average": round(rng.uniform(1, 9), 1),
+            "vote_count": rng.randint(0, 20000),
+        }
+
+    def page(self, seed: int, page: int = 1) -> dict:
+        rng = random.Random(seed * 1000 + page)
+        ids = [rng.randint(1, CATALOG_SIZE) for _ in range(self.results_per_page)]
+        return {
+            "page": page,
+            "results": [self.movie(movie_id) for movie_id in ids],
+            "total_pages": 500,
+            "total_results": 500 * self.results_per_page,
+        }
+
+    def details(self, movie_id: int, append: str) -> dict:
+        movie = self.movie(movie_id)
+        movie["genres"] = [{"id": genre_id, "name": str(genre_id)} for genre_id in movie.pop("genre_ids")]
+        movie["runtime"] = 90 + movie_id % 60
+        for part in filter(None, append.split(",")):
+            movie[part] = self.sub_resource(movie_id, part)
+        return movie
+
+    def sub_resource(self, movie_id: int, part: str) -> dict:
+        if part == "credits":
+            return {"id": movie_id, "cast": [{"id": i, "name": f"Actor {i}"} for i in range(10)], "crew": []}
+        if part == "videos":
+            return {"id": movie_id, "results": [{"key": f"v{movie_id}", "site": "YouTube", "type": "Trailer"}]}
+        if part == "images":
+            return {"id": movie_id, "backdrops": [], "posters": [{"file_path": f"/p{movie_id}.jpg"}], "logos": []}
+        if part in ("similar", "recommendations"):
+            return self.page(movie_id)
+        return {"id": movie_id, "page": 1, "results": [], "total_pages": 0, "total_results": 0}
+
+    async def handle(self, request):
+        self.requests += 1
+        if self.record:
+            self.log.append((time.monotonic(), request.url.path))
+        delay = self.latency_ms + self._random.uniform(0, self.jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        if self.script:
+            status, headers = self.script.popleft()
+            if status == 429:
+                self.throttled += 1
+            return JSONResponse({"status_code": status, "status_message": "Scripted"}, status, headers)
+        roll = self._random.random()
+        if roll < self.throttle_rate:
+            self.throttled += 1
+            return JSONResponse({"status_code": 25, "status_message": "Rate limit exceeded"}, 429, {"Retry-After": "1"})
+        if roll < self.throttle_rate + self.error_rate:
+            self.errors += 1
+            return JSONResponse({"status_code": 11, "status_message": "Internal error"}, 500)
+        return JSONResponse(self.route(request.path_params["path"], request.query_params))
+
+    def route(self, path: str, query) -> dict:
+        parts = path.strip("/").split("/")
+        page = int(query.get("page", 1))
+        if parts[0] == "trending":
+            seed = 1
+            if self.trending_rotate_seconds:
+                seed += int(time.time() / self.trending_rotate_seconds)
+            return self.page(seed, page)
+        if parts[0] == "movie" and parts[1].isdigit():
+            movie_id = int(parts[1])
+            if len(parts) == 2:
+                return self.details(movie_id, query.get("append_to_response", ""))
+            if parts[2] in ("similar", "recommendations"):
+                return self.page(movie_id * 7 + len(parts[2]), page)
+            return self.sub_resource(movie_id, parts[2])
+        if parts[0] == "movie":
+            return self.page(sum(map(ord, parts[1])), page)
+        if parts[0] == "search":
+            return self.page(sum(map(ord, query.get("query", ""))), page)
+        if parts[0] == "discover":
+            return self.page(sum(map(ord, query.get("with_genres") or "")) + 7 * len(query.get("sort_by", "")), page)
+        if parts[0] == "genre":
+            return {"genres": [{"id": genre_id, "name": str(genre_id)} for genre_id in GENRES]}
+        if parts[0] == "configuration":
+            return {"images": {
+                "secure_base_url": "https://image.tmdb.org/t/p/",
+                "backdrop_sizes": ["w300", "w780", "w1280", "original"],
+                "logo_sizes": ["w45", "w92", "w154", "w185", "w300", "w500", "original"],
+                "poster_sizes": ["w92", "w154", "w185", "w342", "w500", "w780", "original"],
+                "profile_sizes": ["w45", "w185", "h632", "original"],
+            }}
+        if parts[0] == "person":
+            return {"id": int(parts[1]), "name": f"Person {parts[1]}", "cast": [], "crew": []}
+        return {"page": 1, "results": [], "total_pages": 0, "total_results": 0}
+
+    async def image(self, request):
+        """Deterministic bytes standing in for a JPEG; roughly 80 bytes per pixel of width"""
+        self.images += 1
+        await asyncio.sleep((self.latency_ms + self._random.uniform(0, self.jitter_ms)) / 1000)
+        size, name = request.path_params["size"], request.path_params["name"]
+        if not name.endswith(".jpg"):
+            return Response(status_code=404)
+        width = int(size[1:]) if size[1:].isdigit() else 2000
+        seed = sum(map(ord, name)).to_bytes(4, "big")
+        return Response(b"\xff\xd8\xff\xe0" + seed * (width * 20), media_type="image/jpeg")
+
+    async def stats(self, request):
+        return JSONResponse({"requests": self.requests, "errors": self.errors, "throttled": self.throttled, "images": self.images})
+
+    def app(self) -> Starlette:
+        return Starlette(routes=[
+            Route("/stats", self.stats),
+            Route("/3/{path:path}", self.handle),
+            Route("/t/p/{size}/{name}", self.image),
+        ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake TMDB API for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--results-per-page", type=int, default=20)
+    parser.add_argument("--overview-words", type=int, default=40)
+    parser.add_argument("--trending-rotate-seconds", type=float, default=0.0)
+    args = parser.parse_args()
+
+    import uvicorn
+    fake = FakeTMDB(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        results_per_page=args.results_per_page,
+        overview_words=args.overview_words,
+        trending_rotate_seconds=args.trending_rotate_seconds,
+    )
+    uvicorn.run(fake.app(), host=args.host, port=args.port, log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,409 @@
+"""End-to-end load test: fake TMDB + the real app under uvicorn, driven over HTTP and WebSockets.
+
+    cd backend
+    python -m benchmarks.load                                  # every scenario, default load
+    python -m benchmarks.load --scenarios list,details --duration 20 --concurrency 64
+    python -m benchmarks.load --scenarios ws --ws-clients 5000 --latency-ms 80
+    python -m benchmarks.load --compare results/a.json results/b.json
+
+Each scenario reports p50/p95/p99 latency, requests/sec, and the app process's CPU
+(cores used) and memory (RSS, peak RSS). Results are written as JSON under
+benchmarks/results/ tagged with the git commit, so two runs can be compared.
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+from collections import Counter, defaultdict
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, List, Optional
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BACKEND_DIR, "benchmarks", "results")
+SCENARIOS = ("list", "search", "details", "discover", "images", "ws")
+
+LIST_PATHS = ["/api/movies/popular", "/api/movies/trending", "/api/movies/top-rated", "/api/movies/upcoming", "/api/movies/now-playing"]
+QUERIES = [f"{a} {b}" for a in ("star", "night", "dark", "love", "war", "city", "ghost") for b in ("king", "hero", "moon", "river", "queen", "house", "")]
+GENRE_FILTERS = ["28", "12", "35", "18", "27", "878", "28,12", "35|18", "10749", "53"]
+SORTS = ["popularity.desc", "vote_average.desc", "release_date.desc", "vote_count.desc"]
+VERSION = re.compile(r'"type": "trending_(?:update|delta)".*?"version": "([0-9a-f]+)"')
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "max_ms": None}
+    ordered = sorted(samples)
+
+    def at(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 3)
+
+    return {"p50_ms": at(0.50), "p95_ms": at(0.95), "p99_ms": at(0.99), "max_ms": round(ordered[-1] * 1000, 3)}
+
+
+def cpu_seconds(pid: int) -> Optional[float]:
+    """utime + stime of a process, from /proc (Linux only)"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def memory_mb(pid: int) -> Dict[str, Optional[float]]:
+    usage = {"rss_mb": None, "peak_rss_mb": None}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    usage["rss_mb"] = round(int(line.split()[1]) / 1024, 1)
+                elif line.startswith("VmHWM:"):
+                    usage["peak_rss_mb"] = round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return usage
+
+
+class ProcessMeter:
+    """CPU cores used and memory of the app process over one scenario"""
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.cpu = cpu_seconds(pid)
+        self.started = time.perf_counter()
+
+    def report(self) -> Dict:
+        elapsed = time.perf_counter() - self.started
+        cpu = cpu_seconds(self.pid)
+        used = None if cpu is None or self.cpu is None else round((cpu - self.cpu) / elapsed, 3)
+        return {"cpu_cores": used, **memory_mb(self.pid)}
+
+
+async def wait_until(check: Callable, timeout: float, what: str):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if await check():
+                return
+        except (httpx.HTTPError, OSError):
+            pass
+        await asyncio.sleep(0.25)
+    raise RuntimeError(f"Timed out waiting for {what}")
+
+
+@asynccontextmanager
+async def stack(args, app_env: Optional[Dict[str, str]] = None, fake_args: Optional[List[str]] = None):
+    """Start fake TMDB and the app on free ports with an isolated catalog; yields (base_url, app pid)"""
+    fake_port, app_port = free_port(), free_port()
+    workdir = tempfile.mkdtemp(prefix="movie-bench-")
+    fake_cmd = [
+        sys.executable, "-m", "benchmarks.fake_tmdb", "--port", str(fake_port),
+        "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+        "--error-rate", str(args.error_rate), "--throttle-rate", str(args.throttle_rate),
+        "--results-per-page", str(args.results_per_page), "--overview-words", str(args.overview_words),
+    ] + (fake_args or [])
+    env = {
+        **os.environ,
+        "TMDB_API_KEY": "benchmark",
+        "TMDB_BASE_URL": f"http://127.0.0.1:{fake_port}/3",
+        "TMDB_HTTP2": "False",
+        "REDIS_URL": "",
+        "BACKPLANE_URL": "",
+        "CATALOG_PATH": os.path.join(workdir, "catalog.db"),
+        "SEARCH_INDEX_PATH": os.path.join(workdir, "search_index.npz"),
+        "GRAPH_PATH": os.path.join(workdir, "graph"),
+        "GRAPH_CRAWL_INTERVAL": "0",
+        "IMAGE_CACHE_DIR": os.path.join(workdir, "images"),
+        "IMAGE_BASE_URL": f"http://127.0.0.1:{fake_port}/t/p",
+        "CATALOG_MIN_TITLES": str(args.min_titles),
+        "CATALOG_FLUSH_INTERVAL": "0.5",
+        "DISCOVER_REBUILD_INTERVAL": "1",
+        "UPSTREAM_RATE_LIMIT": str(args.upstream_rate),
+        "UPSTREAM_BURST": str(args.upstream_rate),
+        **(app_env or {}),
+    }
+    app_cmd = [
+        sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(app_port),
+        "--log-level", "warning", "--no-access-log",
+    ]
+    output = None if args.verbose else subprocess.DEVNULL
+    fake = subprocess.Popen(fake_cmd, cwd=BACKEND_DIR, stdout=output, stderr=output)
+    app = subprocess.Popen(app_cmd, cwd=BACKEND_DIR, env=env, stdout=output, stderr=output)
+    base = f"http://127.0.0.1:{app_port}"
+    try:
+        async with httpx.AsyncClient(base_url=base, timeout=5) as client:
+            async def ready():
+                health = (await client.get("/health")).json()
+                return health["discover"]["titles"] >= args.min_titles
+
+            # The app crawls fake TMDB into its catalog on first start; discover needs it
+            await wait_until(ready, 120, "the app to start and fill its catalog")
+        yield base, app.pid
+    finally:
+        for process in (app, fake):
+            process.terminate()
+        for process in (app, fake):
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+async def rest_scenario(base: str, pid: int, make_path: Callable[[random.Random], str], args) -> Dict:
+    rng = random.Random(args.seed)
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=30) as client:
+        # Warm caches and connections so the measured window is steady state
+        warm_until = time.perf_counter() + args.warmup
+        while time.perf_counter() < warm_until:
+            await asyncio.gather(*(client.get(make_path(rng)) for _ in range(args.concurrency)), return_exceptions=True)
+
+        meter = ProcessMeter(pid)
+        deadline = time.perf_counter() + args.duration
+
+        async def worker():
+            while time.perf_counter() < deadline:
+                path = make_path(rng)
+                started = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                    statuses[str(response.status_code)] += 1
+                except httpx.HTTPError:
+                    statuses["error"] += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 1),
+        "concurrency": args.concurrency,
+        "statuses": dict(statuses),
+        **percentiles(latencies),
+        **meter.report(),
+    }
+
+
+async def broadcast_seconds(client: httpx.AsyncClient) -> Dict[str, float]:
+    text = (await client.get("/metrics")).text
+    values = {}
+    for line in text.splitlines():
+        if line.startswith("websocket_broadcast_duration_seconds_sum") or line.startswith("websocket_broadcast_duration_seconds_count"):
+            name, value = line.rsplit(" ", 1)
+            values[name.rsplit("_", 1)[1]] = float(value)
+    return values
+
+
+async def ws_scenario(base: str, pid: int, args) -> Dict:
+    from websockets.asyncio.client import connect
+
+    ws_base = base.replace("http://", "ws://")
+    received: Dict[str, List[float]] = defaultdict(list)
+    connect_latencies: List[float] = []
+    failures = Counter()
+    connected = asyncio.Event()
+    stop = asyncio.Event()
+    opened = [0]
+    semaphore = asyncio.Semaphore(args.ws_connect_concurrency)
+
+    async def client(index: int):
+        try:
+            async with semaphore:
+                started = time.perf_counter()
+                ws = await connect(f"{ws_base}/ws/bench-{index}", max_size=None, open_timeout=60, compression=None)
+                await ws.recv()  # initial trending frame
+                connect_latencies.append(time.perf_counter() - started)
+        except Exception as e:
+            failures[type(e).__name__] += 1
+            return
+        opened[0] += 1
+        if opened[0] + sum(failures.values()) == args.ws_clients:
+            connected.set()
+        try:
+            async with ws:
+                while not stop.is_set():
+                    frame = await ws.recv()
+                    at = time.perf_counter()
+                    # Only the envelope matters; never parse the movie list on the driver
+                    match = VERSION.search(frame[:200])
+                    if match:
+                        received[match.group(1)].append(at)
+        except Exception:
+            pass
+
+    meter = ProcessMeter(pid)
+    tasks = [asyncio.create_task(client(index)) for index in range(args.ws_clients)]
+    await asyncio.wait_for(connected.wait(), timeout=max(60, args.ws_clients / 50))
+    ramp_done = time.perf_counter()
+    ramp_seconds = ramp_done - meter.started
+
+    async with httpx.AsyncClient(base_url=base, timeout=10) as http:
+        before = await broadcast_seconds(http)
+        # Trending rotates on fake TMDB; the app refreshes and broadcasts every second
+        deadline = time.monotonic() + args.ws_broadcasts * 5 + 10
+
+        def complete():
+            return [v for v, times in received.items() if min(times) > ramp_done and len(times) >= opened[0]]
+
+        while len(complete()) < args.ws_broadcasts and time.monotonic() < deadline:
+            await asyncio.sleep(0.2)
+        await asyncio.sleep(1)
+        after = await broadcast_seconds(http)
+    report = meter.report()
+    stop.set()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    versions = [v for v, times in received.items() if min(times) > ramp_done]
+    spreads = [max(received[v]) - min(received[v]) for v in versions]
+    delivered = [len(received[v]) / max(opened[0], 1) for v in versions]
+    broadcasts = after.get("count", 0) - before.get("count", 0)
+    return {
+        "clients": args.ws_clients,
+        "connected": opened[0],
+        "connect_failures": dict(failures),
+        "ramp_seconds": round(ramp_seconds, 2),
+        "connect": percentiles(connect_latencies),
+        "broadcasts_observed": len(versions),
+        "delivery_ratio_min": round(min(delivered), 4) if delivered else None,
+        "fanout_spread": percentiles(spreads),
+        "server_broadcast_avg_ms": round((after["sum"] - before["sum"]) / broadcasts * 1000, 3) if broadcasts else None,
+        **report,
+    }
+
+
+def rest_paths() -> Dict[str, Callable[[random.Random], str]]:
+    return {
+        "list": lambda rng: rng.choice(LIST_PATHS),
+        "search": lambda rng: f"/api/movies/search?q={rng.choice(QUERIES).strip()}&page={rng.randint(1, 3)}",
+        # Skewed ids: a hot set that caches well plus a long tail that misses
+        "details": lambda rng: f"/api/movies/{int(rng.paretovariate(1.2)) % 20000 + 1}",
+        "discover": lambda rng: (
+            f"/api/movies/discover?with_genres={rng.choice(GENRE_FILTERS)}"
+            f"&sort_by={rng.choice(SORTS)}&page={rng.randint(1, 5)}"
+        ),
+        # Same skew as details: a hot set served from the disk cache, a tail fetched from origin
+        "images": lambda rng: f"/api/images/{rng.choice(('w92', 'w342', 'w500'))}/p{int(rng.paretovariate(1.2)) % 20000 + 1}.jpg",
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args) -> Dict:
+    selected = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(selected) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+    results = {}
+    rest = [name for name in selected if name != "ws"]
+    if rest:
+        async with stack(args) as (base, pid):
+            paths = rest_paths()
+            for name in rest:
+                print(f"Running {name} for {args.duration}s at concurrency {args.concurrency}...")
+                results[name] = await rest_scenario(base, pid, paths[name], args)
+                print(f"  {json.dumps(results[name])}")
+    if "ws" in selected:
+        # Separate app instance: uncached trending refreshed every second, so each refresh broadcasts
+        app_env = {"CACHE_MAX_ENTRIES": "0", "SNAPSHOT_REFRESH_INTERVAL": "1", "SNAPSHOT_REFRESH_JITTER": "0"}
+        async with stack(args, app_env, ["--trending-rotate-seconds", "1"]) as (base, pid):
+            print(f"Running ws with {args.ws_clients} clients...")
+            results["ws"] = await ws_scenario(base, pid, args)
+            print(f"  {json.dumps(results['ws'])}")
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": {key: value for key, value in vars(args).items() if key not in ("compare", "output", "verbose")},
+        },
+        "scenarios": results,
+    }
+
+
+def compare(old_path: str, new_path: str):
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"{old['meta']['commit']} -> {new['meta']['commit']}")
+    keys = ("rps", "p50_ms", "p95_ms", "p99_ms", "cpu_cores", "peak_rss_mb")
+    for name in new["scenarios"]:
+        before, after = old["scenarios"].get(name), new["scenarios"][name]
+        if before is None:
+            continue
+        if name == "ws":
+            before, after = {**before, **before["fanout_spread"]}, {**after, **after["fanout_spread"]}
+        print(name)
+        for key in keys:
+            a, b = before.get(key), after.get(key)
+            if a is None or b is None:
+                continue
+            change = f"{(b - a) / a * 100:+.1f}%" if a else "n/a"
+            print(f"  {key:12} {a:>10} -> {b:<10} {change}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the API against a local fake TMDB")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"comma-separated: {', '.join(SCENARIOS)}")
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds per REST scenario")
+    parser.add_argument("--warmup", type=float, default=2.0, help="unmeasured seconds before each REST scenario")
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent REST requests")
+    parser.add_argument("--ws-clients", type=int, default=2000)
+    parser.add_argument("--ws-broadcasts", type=int, default=5, help="broadcasts to observe after all clients connect")
+    parser.add_argument("--ws-connect-concurrency", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="fake TMDB base latency")
+    parser.add_argument("--jitter-ms", type=float, default=10.0, help="fake TMDB added random latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of fake TMDB 500s")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of fake TMDB 429s")
+    parser.add_argument("--results-per-page", type=int, default=20)
+    parser.add_argument("--overview-words", type=int, default=40, help="payload size knob")
+    parser.add_argument("--upstream-rate", type=float, default=1000.0, help="app's UPSTREAM_RATE_LIMIT")
+    parser.add_argument("--min-titles", type=int, default=500, help="catalog size to wait for before measuring")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<time>-<commit>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two results files and exit")
+    parser.add_argument("--verbose", action="store_true", help="show app and fake TMDB output")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    results = asyncio.run(run(args))
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{results['meta']['commit'] or 'unknown'}.json"
+    )
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
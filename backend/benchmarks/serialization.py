@@ -0,0 +1,123 @@
+"""Requests/sec on one core for a 20-movie list response: per-item Movie(**m) + response_model
+versus the bulk TypeAdapter path with pre-encoded and cached bodies.
+
+    cd backend && python -m benchmarks.serialization [--requests 5000]
+
+Requests go through the ASGI app in-process (no sockets), so the numbers isolate
+validation and serialization cost rather than network or upstream latency.
+"""
+import time
+import random
+import asyncio
+import argparse
+from typing import List
+import httpx
+from fastapi import FastAPI
+from app.core.responses import PreEncodedJSONResponse, encode_movies, encode_movie_page
+from app.schemas.movie import Movie, MovieSearchResponse
+from app.services.cache import LRUCache
+
+
+def tmdb_movies(count: int = 20) -> List[dict]:
+    """TMDB-shaped list items, including the fields Movie does not declare"""
+    rng = random.Random(0)
+    return [
+        {
+            "adult": False,
+            "backdrop_path": f"/b{i}.jpg",
+            "genre_ids": rng.sample([12, 14, 16, 18, 28, 35, 53, 80, 878, 10749], 3),
+            "id": 1000 + i,
+            "original_language": "en",
+            "original_title": f"Movie {i}",
+            "overview": " ".join(rng.choice(["hero", "night", "city", "love", "war"]) for _ in range(40)),
+            "popularity": rng.random() * 500,
+            "poster_path": f"/p{i}.jpg",
+            "release_date": f"20{i % 25:02d}-0{1 + i % 9}-1{i % 10}",
+            "title": f"Movie {i}",
+            "video": False,
+            "vote_average": round(rng.random() * 10, 1),
+            "vote_count": rng.randint(0, 20000),
+        }
+        for i in range(count)
+    ]
+
+
+def build_app(movies: List[dict]) -> FastAPI:
+    page = {"results": movies, "page": 1, "total_pages": 1, "total_results": len(movies)}
+    rendered = LRUCache(16, 1024 * 1024)
+    app = FastAPI()
+
+    @app.get("/before/list", response_model=List[Movie])
+    async def before_list():
+        return [Movie(**movie) for movie in movies]
+
+    @app.get("/before/page")
+    async def before_page():
+        return {
+            "results": [Movie(**movie) for movie in page.get('results', [])],
+            "page": page.get('page', 1),
+            "total_pages": page.get('total_pages', 1),
+            "total_results": page.get('total_results', 0)
+        }
+
+    @app.get("/after/list", response_model=List[Movie])
+    async def after_list():
+        return PreEncodedJSONResponse(encode_movies(movies))
+
+    @app.get("/after/page", response_model=MovieSearchResponse)
+    async def after_page():
+        return PreEncodedJSONResponse(encode_movie_page(page))
+
+    @app.get("/after/cached", response_model=MovieSearchResponse)
+    async def after_cached():
+        body = rendered.get("page")
+        if body is None:
+            body = encode_movie_page(page)
+            rendered.set("page", body, 3600)
+        return PreEncodedJSONResponse(body)
+
+    return app
+
+
+async def measure(client: httpx.AsyncClient, path: str, requests: int) -> float:
+    for _ in range(min(200, requests)):
+        (await client.get(path)).raise_for_status()
+    started = time.perf_counter()
+    for _ in range(requests):
+        await client.get(path)
+    return requests / (time.perf_counter() - started)
+
+
+async def main(requests: int):
+    app = build_app(tmdb_movies())
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        before = (await client.get("/before/page")).json()
+        after = (await client.get("/after/page")).json()
+        assert before == after, "fast path must produce the same document"
+
+        results = {}
+        for path in ["/before/list", "/after/list", "/before/page", "/after/page", "/after/cached"]:
+            results[path] = await measure(client, path, requests)
+            print(f"{path:14} {results[path]:9.0f} req/s")
+
+    print(f"list speedup:   {results['/after/list'] / results['/before/list']:.2f}x")
+    print(f"page speedup:   {results['/after/page'] / results['/before/page']:.2f}x")
+    print(f"cached speedup: {results['/after/cached'] / results['/before/page']:.2f}x")
+
+    # Serialization alone, without the ASGI stack
+    movies = tmdb_movies()
+    for label, fn in [
+        ("Movie(**m) + model_dump", lambda: [Movie(**movie).model_dump() for movie in movies]),
+        ("TypeAdapter dump_json", lambda: encode_movies(movies)),
+    ]:
+        started = time.perf_counter()
+        for _ in range(requests):
+            fn()
+        print(f"{label:24} {(time.perf_counter() - started) / requests * 1e6:7.1f} us/list")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    asyncio.run(main(parser.parse_args().requests))
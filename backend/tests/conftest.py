@@ -0,0 +1,52 @@
+import os
+import pytest
+
+# Settings read TMDB_API_KEY at import; tests never reach the real API
+os.environ.setdefault("TMDB_API_KEY", "test-key")
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+class FakeClock:
+    """Stand-in for a module's `time` import; advance() moves monotonic time forward"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def time(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def tune(monkeypatch):
+    """Override settings for one test: tune(UPSTREAM_MAX_RETRIES=0, ...)"""
+    from app.core.config import settings
+
+    def apply(**values):
+        for name, value in values.items():
+            monkeypatch.setattr(settings, name, value)
+    return apply
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    """An empty, open MovieCatalog in a temporary directory"""
+    from app.services.catalog import MovieCatalog
+    movie_catalog = MovieCatalog(str(tmp_path / "catalog.db"))
+    movie_catalog.open()
+    yield movie_catalog
+    movie_catalog.close()
@@ -0,0 +1,28 @@
+import httpx
+import pytest
+from app.core.config import settings
+from app.main import app
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def client():
+    # No lifespan: validation fails before anything reaches TMDB
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://api.test") as client:
+        yield client
+
+
+@pytest.mark.parametrize("path", ["/api/movies/batch", "/api/movies/batch/stream"])
+async def test_batch_size_is_validated_by_the_schema(client, path):
+    too_many = list(range(settings.BATCH_MAX_IDS + 1))
+    response = await client.post(path, json={"ids": too_many})
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["type"] == "too_long"
+    assert (await client.post(path, json={"ids": []})).status_code == 422
+
+
+def test_batch_bound_is_in_the_openapi_schema():
+    schema = app.openapi()["components"]["schemas"]["BatchRequest"]
+    assert schema["properties"]["ids"]["maxItems"] == settings.BATCH_MAX_IDS
+    assert schema["properties"]["ids"]["minItems"] == 1
@@ -0,0 +1,143 @@
+import pytest
+from app.services import cache
+from app.services.cache import InMemoryRedis, LRUCache, ResponseCache
+
+
+@pytest.fixture
+def frozen(monkeypatch, clock):
+    monkeypatch.setattr(cache, "time", clock)
+    return clock
+
+
+def test_lru_evicts_least_recently_used_by_count():
+    lru = LRUCache(max_entries=2, max_bytes=1000)
+    lru.set("a", b"1", 60)
+    lru.set("b", b"2", 60)
+    assert lru.get("a") == b"1"
+    lru.set("c", b"3", 60)
+    assert lru.get("b") is None
+    assert lru.get("a") == b"1"
+    assert lru.get("c") == b"3"
+    assert lru.stats()["evictions"] == 1
+
+
+def test_lru_evicts_by_bytes_and_skips_oversized_values():
+    lru = LRUCache(max_entries=10, max_bytes=10)
+    lru.set("a", b"xxxx", 60)
+    lru.set("b", b"yyyy", 60)
+    lru.set("c", b"zzzz", 60)
+    assert lru.get("a") is None
+    assert lru.stats()["bytes"] == 8
+    lru.set("big", b"x" * 11, 60)
+    assert lru.get("big") is None
+    assert lru.get("b") == b"yyyy"
+
+
+def test_lru_expires_entries_after_ttl(frozen):
+    lru = LRUCache(max_entries=10, max_bytes=1000)
+    lru.set("a", b"1", 5)
+    frozen.advance(4.9)
+    assert lru.get("a") == b"1"
+    frozen.advance(0.2)
+    assert lru.get("a") is None
+    stats = lru.stats()
+    assert stats["expirations"] == 1
+    assert stats["entries"] == 0
+    assert stats["bytes"] == 0
+
+
+def test_lru_overwrite_keeps_byte_count():
+    lru = LRUCache(max_entries=10, max_bytes=1000)
+    lru.set("a", b"12345", 60)
+    lru.set("a", b"12", 60)
+    assert lru.stats()["bytes"] == 2
+
+
+def make_cache() -> ResponseCache:
+    response_cache = ResponseCache(LRUCache(100, 100_000), prefix="tmdb:")
+    response_cache.redis = InMemoryRedis()
+    return response_cache
+
+
+@pytest.mark.anyio
+async def test_set_writes_through_to_redis():
+    response_cache = make_cache()
+    await response_cache.set("/movie/550?", b"body", 60)
+    assert response_cache.local.get("/movie/550?") == b"body"
+    assert await response_cache.redis.get("tmdb:/movie/550?") == b"body"
+
+
+@pytest.mark.anyio
+async def test_get_reads_through_redis_and_promotes_locally():
+    response_cache = make_cache()
+    await response_cache.redis.set("tmdb:/movie/550?", b"shared", ex=60)
+    assert await response_cache.get("/movie/550?") == b"shared"
+    assert response_cache.redis_hits == 1
+    # Promoted: served from the local tier even once Redis has lost it
+    await response_cache.redis.delete("tmdb:/movie/550?")
+    assert await response_cache.get("/movie/550?") == b"shared"
+    assert response_cache.redis_hits == 1
+
+
+@pytest.mark.anyio
+async def test_get_miss_in_both_tiers():
+    response_cache = make_cache()
+    assert await response_cache.get("/movie/550?") is None
+    assert response_cache.redis_misses == 1
+
+
+@pytest.mark.anyio
+async def test_redis_errors_degrade_to_misses():
+    class BrokenRedis(InMemoryRedis):
+        async def get(self, name):
+            raise ConnectionError("down")
+
+        async def set(self, name, value, ex=None, nx=False, px=None):
+            raise ConnectionError("down")
+
+    response_cache = ResponseCache(LRUCache(100, 100_000))
+    response_cache.redis = BrokenRedis()
+    await response_cache.set("/movie/550?", b"body", 60)
+    assert await response_cache.get("/movie/550?") == b"body"
+    assert await response_cache.get("/movie/551?") is None
+    assert response_cache.redis_errors == 2
+
+
+@pytest.mark.anyio
+async def test_invalidate_prefix_matches_whole_path_segments():
+    response_cache = make_cache()
+    keys = ["/movie/550?language=en", "/movie/550/credits?", "/movie/5501?", "/movie/55?", "/search/movie?query=550"]
+    for key in keys:
+        await response_cache.set(key, b"x", 60)
+    # One local and one Redis copy of each of the two /movie/550 keys
+    assert await response_cache.invalidate_prefix("/movie/550") == 4
+    for key in keys[:2]:
+        assert response_cache.local.get(key) is None
+        assert await response_cache.redis.get("tmdb:" + key) is None
+    for key in keys[2:]:
+        assert response_cache.local.get(key) == b"x"
+        assert await response_cache.redis.get("tmdb:" + key) == b"x"
+
+
+@pytest.mark.anyio
+async def test_invalidate_prefix_escapes_glob_characters():
+    response_cache = make_cache()
+    await response_cache.set("/search/movie?query=a", b"x", 60)
+    await response_cache.set("/search/movieXquery=a", b"x", 60)
+    await response_cache.set("/search/movie?query=[a]*", b"x", 60)
+    assert await response_cache.invalidate_prefix("/search/movie?query=[a]*") == 2
+    assert await response_cache.redis.get("tmdb:/search/movie?query=a") == b"x"
+    assert await response_cache.redis.get("tmdb:/search/movieXquery=a") == b"x"
+    # "?" ends the path, so everything for the endpoint goes
+    await response_cache.invalidate_prefix("/search/movie?")
+    assert await response_cache.redis.get("tmdb:/search/movie?query=a") is None
+    assert await response_cache.redis.get("tmdb:/search/movieXquery=a") == b"x"
+
+
+@pytest.mark.anyio
+async def test_invalidate_everything():
+    response_cache = make_cache()
+    await response_cache.set("/movie/1?", b"x", 60)
+    await response_cache.set("/genre/movie/list?", b"x", 60)
+    assert await response_cache.invalidate_prefix("") == 4
+    assert response_cache.local.stats()["entries"] == 0
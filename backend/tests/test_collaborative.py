@@ -0,0 +1,75 @@
+import pytest
+from app.services import catalog as catalog_module
+from app.services import collaborative
+from app.services.collaborative import CollaborativeRecommender, interaction_matrix
+
+
+@pytest.fixture
+def recommender(tune):
+    tune(COLLAB_MAX_CLIENTS=2, COLLAB_MAX_EVENTS_PER_CLIENT=3)
+    return CollaborativeRecommender()
+
+
+def test_least_recently_active_client_is_forgotten(recommender):
+    recommender.record("a", 1)
+    recommender.record("b", 1)
+    recommender.record("a", 2)
+    recommender.record("c", 1)
+    assert list(recommender.history) == ["a", "c"]
+    stats = recommender.stats()
+    assert (stats["clients"], stats["interactions"], stats["forgotten"]) == (2, 3, 1)
+
+
+def test_each_client_keeps_its_most_recent_movies(recommender):
+    for movie_id in (1, 2, 3):
+        recommender.record("a", movie_id)
+    recommender.record("a", 1)
+    recommender.record("a", 4)
+    assert recommender.history["a"] == {3: 1.0, 1: 2.0, 4: 1.0}
+    assert recommender.interactions == 3
+    # Forgotten in memory only; every event is still queued for the catalog
+    assert len(recommender._pending) == 4
+
+
+def test_interaction_matrix():
+    item_ids, matrix = interaction_matrix([{10: 1.0, 20: 2.0}, {20: 1.0}])
+    assert item_ids.tolist() == [10, 20]
+    assert matrix.toarray().tolist() == [[1.0, 2.0], [0.0, 1.0]]
+
+
+@pytest.fixture
+def stored(recommender, catalog, monkeypatch):
+    monkeypatch.setattr(collaborative, "movie_catalog", catalog)
+    rows = [("old", 1, 1.0), ("a", 1, 1.0), ("a", 2, 1.0), ("a", 3, 1.0), ("a", 4, 1.0), ("b", 5, 2.0)]
+    for at, row in enumerate(rows):
+        # One flush per row, so every row has its own updated_at
+        monkeypatch.setattr(catalog_module.time, "time", lambda at=at: 1000.0 + at)
+        catalog.add_interactions([row])
+    return catalog
+
+
+def test_load_reads_only_what_memory_keeps(recommender, stored):
+    recommender.load()
+    assert {client: dict(seen) for client, seen in recommender.history.items()} == {"a": {2: 1.0, 3: 1.0, 4: 1.0}, "b": {5: 2.0}}
+    assert recommender.interactions == 4
+
+
+@pytest.mark.anyio
+async def test_prune_deletes_forgotten_clients_and_events(recommender, stored):
+    assert await recommender.prune() == 2
+    assert sorted(stored.interactions(10, 10)) == [("a", 2, 1.0), ("a", 3, 1.0), ("a", 4, 1.0), ("b", 5, 2.0)]
+
+
+@pytest.mark.anyio
+async def test_failed_training_waits_a_full_interval(recommender, tune, monkeypatch):
+    tune(COLLAB_MIN_INTERACTIONS=1, COLLAB_TRAIN_INTERVAL=300.0)
+
+    def broken(*args):
+        raise RuntimeError("worker died")
+
+    monkeypatch.setattr(collaborative, "interaction_matrix", broken)
+    recommender.record("a", 1)
+    assert recommender._should_train()
+    with pytest.raises(RuntimeError):
+        await recommender.train()
+    assert not recommender._should_train()
@@ -0,0 +1,139 @@
+import gzip
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
+from app.core import http_cache
+from app.core.http_cache import HTTPCacheMiddleware, negotiate_encoding
+from app.services.cache import LRUCache
+
+pytestmark = pytest.mark.anyio
+
+POLICY = "public, max-age=60"
+BIG = {"results": [{"id": n, "title": f"Movie {n}"} for n in range(200)]}
+
+
+@pytest.fixture
+def fresh(monkeypatch):
+    monkeypatch.setattr(http_cache, "compressed_bodies", LRUCache(100, 1_000_000))
+    monkeypatch.setattr(http_cache, "counters", {"not_modified": 0, "compressions": 0})
+
+
+@pytest.fixture
+async def client(fresh):
+    app = FastAPI()
+
+    @app.get("/big")
+    async def big():
+        return BIG
+
+    @app.get("/small")
+    async def small():
+        return {"id": 1}
+
+    @app.get("/missing")
+    async def missing():
+        return JSONResponse(BIG, status_code=404)
+
+    @app.get("/stream")
+    async def stream():
+        return StreamingResponse(iter([b"{}\n"] * 500), media_type="application/x-ndjson")
+
+    @app.get("/uncached")
+    async def uncached():
+        return BIG
+
+    policies = {path: POLICY for path in ("/big", "/small", "/missing", "/stream")}
+    app.add_middleware(HTTPCacheMiddleware, policies=policies)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://api.test") as client:
+        yield client
+
+
+def identity():
+    return {"Accept-Encoding": "identity"}
+
+
+async def test_etag_and_304(client):
+    response = await client.get("/small", headers=identity())
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert response.headers["cache-control"] == POLICY
+    assert response.headers["vary"] == "Accept-Encoding"
+
+    cached = await client.get("/small", headers={**identity(), "If-None-Match": f"W/{etag}"})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["etag"] == etag
+    assert "content-length" not in cached.headers and "content-type" not in cached.headers
+    assert http_cache.counters["not_modified"] == 1
+    assert (await client.get("/small", headers={**identity(), "If-None-Match": '"other"'})).status_code == 200
+
+
+async def test_gzip_is_negotiated_and_compressed_once(client):
+    plain = await client.get("/big", headers=identity())
+    assert "content-encoding" not in plain.headers
+
+    first = await client.get("/big", headers={"Accept-Encoding": "gzip, deflate"})
+    assert first.headers["content-encoding"] == "gzip"
+    assert first.headers["vary"] == "Accept-Encoding"
+    assert int(first.headers["content-length"]) < len(plain.content)
+    assert first.json() == BIG
+    # Each coding is its own representation with its own ETag
+    assert first.headers["etag"] == plain.headers["etag"][:-1] + '-gzip"'
+
+    second = await client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert second.headers["etag"] == first.headers["etag"]
+    assert http_cache.counters["compressions"] == 1
+    # The gzip ETag only matches the gzip representation
+    assert (await client.get("/big", headers={"Accept-Encoding": "gzip", "If-None-Match": first.headers["etag"]})).status_code == 304
+    assert (await client.get("/big", headers={**identity(), "If-None-Match": first.headers["etag"]})).status_code == 200
+
+
+async def test_small_bodies_are_not_compressed(client):
+    response = await client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+
+
+async def test_non_200_streaming_and_uncached_routes_pass_through(client):
+    missing = await client.get("/missing", headers={"Accept-Encoding": "gzip"})
+    assert missing.status_code == 404
+    assert "etag" not in missing.headers and "content-encoding" not in missing.headers
+
+    stream = await client.get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert stream.status_code == 200
+    assert stream.content == b"{}\n" * 500
+    assert "etag" not in stream.headers and "content-encoding" not in stream.headers
+
+    uncached = await client.get("/uncached", headers={"Accept-Encoding": "gzip"})
+    assert "etag" not in uncached.headers and "cache-control" not in uncached.headers
+    assert http_cache.counters == {"not_modified": 0, "compressions": 0}
+
+
+async def test_brotli_is_preferred_when_installed(client):
+    pytest.importorskip("brotli")
+    response = await client.get("/big", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["content-encoding"] == "br"
+    assert response.headers["etag"].endswith('-br"')
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("identity", None),
+    ("gzip", "gzip"),
+    ("gzip, br", "br"),
+    ("br;q=0.5, gzip", "gzip"),
+    ("br;q=0, gzip;q=0", None),
+    ("*", "br"),
+    ("*;q=0.1, br;q=0", "gzip"),
+    ("gzip;q=bogus, br", "br"),
+])
+def test_negotiate_encoding(monkeypatch, header, expected):
+    monkeypatch.setattr(http_cache, "ENCODINGS", ("br", "gzip"))
+    assert negotiate_encoding(header) == expected
+
+
+def test_gzip_output_is_deterministic():
+    body = b"x" * 5000
+    assert http_cache.compress(body, "gzip") == http_cache.compress(body, "gzip")
+    assert gzip.decompress(http_cache.compress(body, "gzip")) == body
@@ -0,0 +1,182 @@
+import os
+import asyncio
+import hashlib
+import httpx
+import pytest
+from fastapi import FastAPI
+from benchmarks.fake_tmdb import FakeTMDB
+from app.routers import images as images_router
+from app.services import images as images_module
+from app.services.images import ImageCache
+
+pytestmark = pytest.mark.anyio
+
+# FakeTMDB images are 4 + 80 * width bytes
+W92_BYTES = 4 + 80 * 92
+
+
+@pytest.fixture
+def origin():
+    return FakeTMDB(latency_ms=20, jitter_ms=0)
+
+
+@pytest.fixture
+async def make_cache(tmp_path, origin, tune):
+    tune(IMAGE_BASE_URL="http://cdn.test/t/p")
+    caches = []
+
+    async def make(max_bytes: int = 10_000_000) -> ImageCache:
+        cache = ImageCache(str(tmp_path / "images"), max_bytes)
+        cache._client = httpx.AsyncClient(transport=httpx.ASGITransport(app=origin.app()))
+        await asyncio.to_thread(cache._scan)
+        caches.append(cache)
+        return cache
+
+    yield make
+    for cache in caches:
+        await cache.close()
+
+
+async def test_miss_fetches_then_hits(make_cache, origin):
+    cache = await make_cache()
+    entry = await cache.get("w92", "p1.jpg")
+    with open(entry.path, "rb") as f:
+        body = f.read()
+    assert len(body) == W92_BYTES == entry.size
+    assert entry.etag == f'"{hashlib.sha1(body).hexdigest()}"'
+    again = await cache.get("w92", "p1.jpg")
+    assert again is entry
+    assert origin.images == 1
+    assert (cache.misses, cache.hits) == (1, 1)
+    # No temp files left behind
+    assert os.listdir(os.path.dirname(entry.path)) == ["p1.jpg"]
+
+
+async def test_concurrent_misses_share_one_download(make_cache, origin):
+    cache = await make_cache()
+    entries = await asyncio.gather(*(cache.get("w92", "p2.jpg") for _ in range(10)))
+    assert origin.images == 1
+    assert len({entry.path for entry in entries}) == 1
+    assert cache.stats()["coalescing"]["coalesced"] == 9
+
+
+async def test_least_recently_used_files_are_evicted(make_cache):
+    cache = await make_cache(max_bytes=W92_BYTES * 2)
+    first = await cache.get("w92", "a.jpg")
+    second = await cache.get("w92", "b.jpg")
+    await cache.get("w92", "a.jpg")
+    await cache.get("w92", "c.jpg")
+    assert cache.evictions == 1
+    assert not os.path.exists(second.path)
+    assert os.path.exists(first.path)
+    assert cache.stats()["bytes"] == W92_BYTES * 2
+
+
+async def test_files_being_served_are_unlinked_after_release(make_cache):
+    cache = await make_cache(max_bytes=W92_BYTES)
+    entry, stat = await cache.acquire("w92", "a.jpg")
+    assert stat.st_size == W92_BYTES
+    await cache.get("w92", "b.jpg")
+    assert entry.evicted
+    assert os.path.exists(entry.path)
+    cache.release(entry)
+    assert not os.path.exists(entry.path)
+
+
+async def test_file_missing_from_disk_is_a_miss(make_cache, origin):
+    cache = await make_cache()
+    entry = await cache.get("w92", "a.jpg")
+    # Evicted by another worker sharing the directory
+    os.remove(entry.path)
+    refetched, stat = await cache.acquire("w92", "a.jpg")
+    assert stat.st_size == W92_BYTES
+    assert origin.images == 2
+    cache.release(refetched)
+
+
+async def test_rescan_adopts_files_with_the_same_etag(make_cache, origin):
+    cache = await make_cache()
+    etag = (await cache.get("w92", "a.jpg")).etag
+    restarted = await make_cache()
+    assert restarted.stats()["files"] == 1
+    assert (await restarted.get("w92", "a.jpg")).etag == etag
+    assert origin.images == 1
+
+
+async def test_oversized_images_are_rejected(make_cache, tune):
+    tune(IMAGE_MAX_FILE_BYTES=1000)
+    cache = await make_cache()
+    with pytest.raises(ValueError):
+        await cache.get("w92", "a.jpg")
+    assert cache.errors == 1
+    assert cache.stats()["files"] == 0
+
+
+async def test_sizes_load_in_the_background(make_cache, tune, monkeypatch):
+    tune(SNAPSHOT_RETRY_INTERVAL=0.01)
+    answers = [RuntimeError("TMDB down"), {"images": {"poster_sizes": ["w45", "original"]}}]
+    released = asyncio.Event()
+
+    async def get_configuration():
+        await released.wait()
+        answer = answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    monkeypatch.setattr(images_module.tmdb_service, "get_configuration", get_configuration)
+    cache = await make_cache()
+    task = asyncio.create_task(cache.run())
+    # TMDB has not answered yet: the defaults serve
+    await asyncio.sleep(0.01)
+    assert cache.valid("w92", "a.jpg") and not cache.sizes_loaded
+    released.set()
+    while not cache.sizes_loaded:
+        await asyncio.sleep(0.005)
+    task.cancel()
+    assert cache.valid("w45", "a.jpg")
+    assert not cache.valid("w92", "a.jpg")
+    assert answers == []
+
+
+@pytest.fixture
+async def api(make_cache, monkeypatch):
+    cache = await make_cache()
+    monkeypatch.setattr(images_router, "image_cache", cache)
+    app = FastAPI()
+    app.include_router(images_router.router)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://api.test") as client:
+        yield client, cache
+
+
+async def test_route_serves_with_etag_and_answers_304(api):
+    client, cache = api
+    response = await client.get("/api/images/w92/p1.jpg")
+    assert response.status_code == 200
+    assert response.content[:4] == b"\xff\xd8\xff\xe0"
+    etag = response.headers["etag"]
+    assert etag == f'"{hashlib.sha1(response.content).hexdigest()}"'
+    assert response.headers["cache-control"] == images_router.IMMUTABLE
+    assert response.headers["x-content-type-options"] == "nosniff"
+    assert response.headers["content-security-policy"] == "sandbox"
+
+    cached = await client.get("/api/images/w92/p1.jpg", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["etag"] == etag
+    assert (await client.get("/api/images/w92/p1.jpg", headers={"If-None-Match": '"other"'})).status_code == 200
+    # Every response released its pin
+    assert (await cache.get("w92", "p1.jpg")).readers == 0
+
+
+async def test_route_rejects_unknown_sizes_and_names(api):
+    client, _ = api
+    assert (await client.get("/api/images/w9999/p1.jpg")).status_code == 404
+    assert (await client.get("/api/images/w92/..%2Fsecret.jpg")).status_code == 404
+    assert (await client.get("/api/images/w92/p1.exe")).status_code == 404
+
+
+async def test_route_maps_origin_404(api):
+    client, _ = api
+    # FakeTMDB only has .jpg images
+    assert (await client.get("/api/images/w92/p1.png")).status_code == 404
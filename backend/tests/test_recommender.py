@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+from app.services import recommender as recommender_module
+from app.services.recommender import ContentRecommender
+from app.services.tmdb_service import tmdb_service
+
+pytestmark = pytest.mark.anyio
+
+MOVIES = [
+    {"id": 1, "title": "Heist", "overview": "A crew of thieves plans a bank heist in the city", "genre_ids": [80, 53]},
+    {"id": 2, "title": "Vault", "overview": "Thieves break into a bank vault during a storm", "genre_ids": [80]},
+    {"id": 3, "title": "Stars", "overview": "Astronauts travel to a distant planet", "genre_ids": [878]},
+    {"id": 4, "title": "Orbit", "overview": "A space station crew drifts toward a planet", "genre_ids": [878, 12]},
+    {"id": 5, "title": "Bakery", "overview": "Two rivals open bakeries on the same street", "genre_ids": [35]},
+]
+
+
+@pytest.fixture
+async def recommender():
+    engine = ContentRecommender(n_features=2 ** 12)
+    engine.observe(MOVIES)
+    await engine.refresh()
+    return engine
+
+
+def ids(movies):
+    return [movie["id"] for movie in movies]
+
+
+async def test_nothing_is_served_before_the_first_build():
+    engine = ContentRecommender(n_features=2 ** 12)
+    engine.observe(MOVIES)
+    assert engine.recommend(1) == []
+    await engine.refresh()
+    assert ids(engine.recommend(1, 1)) == [2]
+    assert not engine.stats()["dirty"]
+
+
+async def test_new_movies_are_vectorized_against_the_built_matrix(recommender):
+    recommender.add({"id": 6, "title": "Robbery", "overview": "Thieves rob a bank in the city", "genre_ids": [80, 99]})
+    incremental = recommender.recommend(6, 3)
+    assert recommender.stats()["builds"] == 1
+    assert recommender.stats()["incremental"] == 1
+    assert ids(incremental)[:2] == [1, 2]
+    assert 6 not in ids(incremental)
+
+    await recommender.refresh()
+    assert recommender.stats()["builds"] == 2
+    assert ids(recommender.recommend(6, 2)) == ids(incremental)[:2]
+    assert 6 in ids(recommender.recommend(1, 5))
+
+
+async def test_incremental_vector_has_the_columns_of_a_full_build(recommender):
+    recommender.add({"id": 6, "title": "Robbery", "overview": "Thieves rob a bank in the city", "genre_ids": [80]})
+    columns, weights = recommender._vector(5)
+    incremental = dict(zip(columns.tolist(), weights.tolist()))
+    # Only the IDF weights differ from a full build over the new rows
+    built = recommender._build(*recommender._snapshot())
+    start, end = built["matrix"].indptr[5], built["matrix"].indptr[6]
+    full = dict(zip(built["matrix"].indices[start:end].tolist(), built["matrix"].data[start:end].tolist()))
+    assert incremental.keys() == full.keys()
+    assert np.linalg.norm(weights) == pytest.approx(1, abs=1e-5)
+
+
+async def test_adds_during_a_build_keep_the_matrix_dirty(recommender, monkeypatch):
+    build = recommender._build
+
+    def slow_build(*args):
+        # Arrives while the worker thread is building
+        recommender.add({"id": 7, "title": "Late", "overview": "A late arrival", "genre_ids": [18]})
+        return build(*args)
+
+    monkeypatch.setattr(recommender, "_build", slow_build)
+    await recommender.refresh()
+    stats = recommender.stats()
+    assert stats["dirty"]
+    assert stats["matrix_rows"] == 5
+
+
+async def test_seeds_from_the_catalog_without_replacing_fresher_movies(catalog, monkeypatch):
+    monkeypatch.setattr(recommender_module, "movie_catalog", catalog)
+    catalog.upsert_many(MOVIES)
+    engine = ContentRecommender(n_features=2 ** 12)
+    engine.add({**MOVIES[0], "overview": "Seen since the catalog copy was written"})
+    await engine.seed()
+    assert len(engine) == len(MOVIES)
+    assert engine.stats()["seeded"] == len(MOVIES)
+    assert engine.movies[engine.rows[1]]["overview"] == "Seen since the catalog copy was written"
+    await engine.refresh()
+    assert ids(engine.recommend(3, 1)) == [4]
+
+
+def test_unstarted_engine_allocates_nothing_and_listens_to_nothing():
+    engine = ContentRecommender()
+    assert engine.vectorizer is None and engine._df is None
+    # Importing the module no longer registers the shared engine
+    assert recommender_module.content_recommender.observe not in tmdb_service._listeners
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+from app.services import search_index
+from app.services.search_index import SearchIndex, SearchService
+
+MOVIES = [
+    {"id": 1, "title": "Spider-Man", "overview": "Bitten", "popularity": 50.0, "genre_ids": [28]},
+    {"id": 2, "title": "Amélie", "original_title": "Le Fabuleux Destin d'Amélie Poulain", "popularity": 20.0},
+    {"id": 3, "title": "Spirited Away", "popularity": 80.0, "genre_ids": [16]},
+]
+
+
+@pytest.fixture
+def index():
+    index = SearchIndex()
+    index.observe(MOVIES)
+    return index
+
+
+def test_search_returns_ids_best_first(index):
+    assert index.search("spiderman") == [1]
+    assert index.search("amelie") == [2]
+    assert index.search("fabuleux destin") == [2]
+    # Typo in the last, still incomplete word
+    assert index.search("spirted aw") == [3]
+
+
+def test_snapshot_holds_only_ids_names_and_the_prior(index, tmp_path):
+    path = str(tmp_path / "index.npz")
+    index.save(path)
+    with np.load(path) as data:
+        assert set(data.files) == {"ids", "popularity", "names", "name_rows", "grams", "offsets", "postings"}
+    loaded = SearchIndex.load(path)
+    assert len(loaded) == 3
+    assert loaded.search("spiderman") == [1]
+    assert loaded.search("spi") == index.search("spi")
+
+
+def test_service_resolves_results_from_the_catalog(catalog, monkeypatch):
+    monkeypatch.setattr(search_index, "movie_catalog", catalog)
+    catalog.upsert_many(MOVIES[:2])
+    # Queued for the next flush, not yet written
+    catalog.observe(MOVIES[2:])
+    service = SearchService(str(catalog.path) + ".npz")
+    service.index.observe(MOVIES)
+    movies = service.search("spi")
+    assert [movie["id"] for movie in movies] == [3, 1]
+    assert movies[1]["overview"] == "Bitten"
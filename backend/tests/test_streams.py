@@ -0,0 +1,36 @@
+import json
+import pytest
+from app.routers.movies import iter_result_pages
+from app.services.upstream import UpstreamRateLimited
+
+pytestmark = pytest.mark.anyio
+
+
+def page_fetcher(fail_on: int, error: Exception):
+    async def fetch(page: int):
+        if page == fail_on:
+            raise error
+        return {"results": [{"id": page * 10 + n, "title": f"Movie {page}.{n}"} for n in range(2)], "total_pages": 5}
+    return fetch
+
+
+async def collect(fetch, pages: int = 5):
+    body = b"".join([chunk async for chunk in iter_result_pages(fetch, 1, pages, None)])
+    return [json.loads(line) for line in body.splitlines()]
+
+
+async def test_stream_pages_in_order():
+    lines = await collect(page_fetcher(0, None))
+    assert [line["id"] for line in lines] == [10, 11, 20, 21, 30, 31, 40, 41, 50, 51]
+
+
+async def test_failure_mid_stream_ends_with_an_error_line():
+    lines = await collect(page_fetcher(3, RuntimeError("boom")))
+    assert [line.get("id") for line in lines[:-1]] == [10, 11, 20, 21]
+    assert lines[-1] == {"error": {"code": "upstream_error", "message": "Fetching results failed"}}
+
+
+async def test_rate_limit_mid_stream_is_reported():
+    lines = await collect(page_fetcher(2, UpstreamRateLimited(1.0)))
+    assert len(lines) == 3
+    assert lines[-1]["error"]["code"] == "rate_limited"
@@ -0,0 +1,154 @@
+import json
+import asyncio
+import pytest
+from app.websocket.manager import ConnectionManager, trending_delta
+
+pytestmark = pytest.mark.anyio
+
+
+def apply_delta(movies, delta):
+    """Python twin of applyTrendingDelta in frontend/src/hooks/useWebSocket.js"""
+    by_id = {movie["id"]: movie for movie in movies}
+    for movie_id in delta["removed"]:
+        by_id.pop(movie_id, None)
+    for movie_id, fields in delta["changed"].items():
+        by_id[int(movie_id)] = {**by_id[int(movie_id)], **fields}
+    for movie in delta["added"]:
+        by_id[movie["id"]] = movie
+    return [by_id[movie_id] for movie_id in delta["order"]]
+
+
+def movie(movie_id, **fields):
+    return {"id": movie_id, "title": f"Movie {movie_id}", "vote_average": 7.0, **fields}
+
+
+OLD = [movie(1), movie(2), movie(3), movie(4)]
+
+
+@pytest.mark.parametrize("new", [
+    [movie(3), movie(1), movie(4), movie(2)],
+    [movie(1), movie(5), movie(2), movie(3), movie(4)],
+    [movie(1), movie(3)],
+    [movie(4, vote_average=8.5), movie(6), movie(1, title="Renamed")],
+    [],
+], ids=["reorder", "insert", "removal", "mixed", "emptied"])
+def test_delta_round_trips(new):
+    delta = json.loads(json.dumps(trending_delta(OLD, new)))
+    assert apply_delta(OLD, delta) == new
+
+
+def test_delta_carries_only_what_changed():
+    delta = trending_delta(OLD, [movie(2), movie(1, vote_average=9.0), movie(3), movie(4)])
+    assert delta["added"] == [] and delta["removed"] == []
+    assert delta["changed"] == {"1": {"vote_average": 9.0}}
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        self.sent.append(json.loads(text))
+
+    async def close(self, code=1000):
+        pass
+
+
+async def frames(manager, websocket):
+    # Let the client's writer drain its queue
+    while manager.active_connections[websocket].queue:
+        await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    sent, websocket.sent = websocket.sent, []
+    return sent
+
+
+@pytest.fixture
+async def manager():
+    manager = ConnectionManager()
+    yield manager
+    for websocket in list(manager.active_connections):
+        await manager.remove(websocket)
+
+
+async def test_clients_follow_the_delta_chain(manager):
+    manager.set_trending(OLD)
+    base = manager.trending_version
+    websocket = FakeWebSocket()
+    await manager.connect(websocket, "a", base, delta=True)
+    assert [frame["type"] for frame in await frames(manager, websocket)] == ["trending_not_modified"]
+
+    new = [movie(2), movie(5), movie(1)]
+    manager.set_trending(new)
+    await manager.broadcast_trending()
+    (frame,) = await frames(manager, websocket)
+    assert frame["type"] == "trending_delta"
+    assert frame["base_version"] == base and frame["version"] == manager.trending_version
+    assert apply_delta(OLD, frame) == new
+
+
+async def test_unknown_base_version_gets_the_full_list(manager):
+    manager.set_trending(OLD)
+    websocket = FakeWebSocket()
+    # A version that fell out of WS_TRENDING_HISTORY (or never existed)
+    await manager.connect(websocket, "a", "gone", delta=True)
+    (frame,) = await frames(manager, websocket)
+    assert frame["type"] == "trending_movies"
+    assert frame["data"] == OLD
+    assert manager.delta_frame("gone") is None
+
+
+async def test_resync_after_a_gap_sends_the_full_list(manager):
+    manager.set_trending(OLD)
+    websocket = FakeWebSocket()
+    await manager.connect(websocket, "a", manager.trending_version, delta=True)
+    await frames(manager, websocket)
+    new = [movie(1), movie(6)]
+    manager.set_trending(new)
+    # The client missed the delta frame and asks for the whole list (get_trending)
+    assert manager.resync_trending(websocket)
+    (frame,) = await frames(manager, websocket)
+    assert frame["type"] == "trending_movies"
+    assert frame["version"] == manager.trending_version
+    assert frame["data"] == new
+
+
+async def test_history_bound_turns_old_bases_into_gaps(manager, tune):
+    tune(WS_TRENDING_HISTORY=2)
+    manager.set_trending(OLD)
+    first = manager.trending_version
+    # Small changes, so the delta beats the full list
+    manager.set_trending(OLD[:3])
+    assert manager.delta_frame(first) is not None
+    manager.set_trending(OLD[1:])
+    assert first not in manager._trending_history
+    assert manager.delta_frame(first) is None
+
+
+async def test_slow_clients_are_dropped_and_closed(manager, tune):
+    tune(WS_SEND_QUEUE_SIZE=2)
+    closed = asyncio.Event()
+
+    class StuckWebSocket(FakeWebSocket):
+        async def send_text(self, text):
+            await asyncio.Event().wait()
+
+        async def close(self, code=1000):
+            self.code = code
+            closed.set()
+
+    manager.set_trending(OLD)
+    websocket = StuckWebSocket()
+    await manager.connect(websocket, "slow")
+    for n in range(4):
+        await manager.send_personal_message(json.dumps({"n": n}), websocket)
+    assert websocket not in manager.active_connections
+    assert manager.dropped_clients == 1
+    assert len(manager._closing) == 1
+    await asyncio.wait_for(closed.wait(), 1)
+    await asyncio.sleep(0)
+    assert websocket.code == 1013
+    assert not manager._closing
@@ -0,0 +1,192 @@
+import time
+import asyncio
+import httpx
+import pytest
+from benchmarks.fake_tmdb import FakeTMDB
+from app.services.cache import LRUCache, ResponseCache
+from app.services.tmdb_service import TMDBService
+from app.services.upstream import (
+    BACKGROUND, INTERACTIVE, PREFETCH, UpstreamRateLimited, UpstreamScheduler, priority
+)
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def fake():
+    return FakeTMDB(latency_ms=0, jitter_ms=0, record=True)
+
+
+@pytest.fixture
+async def client(fake):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=fake.app()), base_url="http://tmdb.test") as client:
+        yield client
+
+
+@pytest.fixture
+def fast(tune):
+    """Generous limits and near-zero jitter, so tests only see what they configure"""
+    tune(
+        UPSTREAM_RATE_LIMIT=1000.0,
+        UPSTREAM_BURST=100.0,
+        UPSTREAM_INITIAL_CONCURRENCY=8,
+        UPSTREAM_MIN_CONCURRENCY=2,
+        UPSTREAM_MAX_CONCURRENCY=32,
+        UPSTREAM_LATENCY_TARGET=1.0,
+        UPSTREAM_MAX_RETRIES=2,
+        UPSTREAM_BACKOFF_BASE=0.001,
+        UPSTREAM_MAX_RETRY_AFTER=5.0,
+    )
+    return tune
+
+
+def get(client: httpx.AsyncClient, path: str):
+    return lambda: client.get(f"/3{path}")
+
+
+async def test_retry_after_pauses_dispatch_then_retries(fast, fake, client):
+    fake.script.append((429, {"Retry-After": "0.3"}))
+    scheduler = UpstreamScheduler()
+    started = time.monotonic()
+    response = await scheduler.send(get(client, "/movie/popular"))
+    assert response.status_code == 200
+    assert time.monotonic() - started >= 0.3
+    assert scheduler.throttled == 1
+    assert scheduler.retries == 1
+    (first, _), (second, _) = fake.log
+    assert second - first >= 0.3
+
+
+async def test_retry_after_pause_holds_other_requests(fast, fake, client):
+    fake.script.append((429, {"Retry-After": "0.3"}))
+    scheduler = UpstreamScheduler()
+    throttled = asyncio.create_task(scheduler.send(get(client, "/movie/popular")))
+    while not fake.log:
+        await asyncio.sleep(0.001)
+    await asyncio.sleep(0.05)
+    # Queued after the 429: waits out the pause although a slot is free
+    await scheduler.send(get(client, "/movie/top_rated"))
+    await throttled
+    (throttled_at, _), (next_at, path) = fake.log[:2]
+    assert path == "/3/movie/top_rated"
+    assert next_at - throttled_at >= 0.3
+
+
+async def test_exhausted_retries_raise_rate_limited(fast, fake, client):
+    fake.script.extend([(429, {"Retry-After": "0.05"})] * 3)
+    scheduler = UpstreamScheduler()
+    with pytest.raises(UpstreamRateLimited) as raised:
+        await scheduler.send(get(client, "/movie/popular"))
+    assert raised.value.retry_after == pytest.approx(0.05)
+    assert fake.requests == 3
+    assert scheduler.active == 0
+
+
+async def test_retry_after_beyond_the_cap_is_not_waited_for(fast, fake, client):
+    fast(UPSTREAM_MAX_RETRY_AFTER=1.0)
+    fake.script.append((429, {"Retry-After": "120"}))
+    scheduler = UpstreamScheduler()
+    started = time.monotonic()
+    with pytest.raises(UpstreamRateLimited):
+        await scheduler.send(get(client, "/movie/popular"))
+    assert time.monotonic() - started < 0.5
+    assert fake.requests == 1
+
+
+async def test_server_errors_are_retried_then_returned(fast, fake, client):
+    fake.script.extend([(503, {})] * 3)
+    scheduler = UpstreamScheduler()
+    response = await scheduler.send(get(client, "/movie/popular"))
+    assert response.status_code == 503
+    assert scheduler.failures == 3
+
+
+async def test_token_bucket_paces_requests(fast, fake, client):
+    fast(UPSTREAM_RATE_LIMIT=20.0, UPSTREAM_BURST=2.0)
+    scheduler = UpstreamScheduler()
+    await asyncio.gather(*(scheduler.send(get(client, f"/movie/{n}")) for n in range(8)))
+    times = sorted(at for at, _ in fake.log)
+    # The burst goes at once; the other six wait for tokens at 20/s
+    assert times[1] - times[0] < 0.05
+    assert times[-1] - times[0] >= 6 / 20 - 0.02
+
+
+async def test_higher_priority_requests_are_dispatched_first(fast, fake, client):
+    fast(UPSTREAM_INITIAL_CONCURRENCY=1, UPSTREAM_MIN_CONCURRENCY=1, UPSTREAM_MAX_CONCURRENCY=1)
+    scheduler = UpstreamScheduler()
+    release = asyncio.Event()
+
+    async def blocker():
+        await release.wait()
+        return httpx.Response(200)
+
+    holding = asyncio.create_task(scheduler.send(blocker))
+    await asyncio.sleep(0.01)
+    queued = []
+    for level, path in ((PREFETCH, "/movie/prefetch"), (BACKGROUND, "/movie/background"), (INTERACTIVE, "/movie/interactive")):
+        with priority(level):
+            queued.append(asyncio.create_task(scheduler.send(get(client, path))))
+        await asyncio.sleep(0.01)
+    assert scheduler.stats()["queued"] == {"interactive": 1, "background": 1, "prefetch": 1}
+    release.set()
+    await asyncio.gather(holding, *queued)
+    assert [path for _, path in fake.log] == ["/3/movie/interactive", "/3/movie/background", "/3/movie/prefetch"]
+
+
+async def test_concurrency_limit_halves_on_429_and_recovers(fast, fake, client):
+    scheduler = UpstreamScheduler()
+    fake.script.append((429, {"Retry-After": "0"}))
+    await scheduler.send(get(client, "/movie/popular"))
+    # 8 halved by the 429, then +1/limit for the successful retry
+    assert scheduler.limit == pytest.approx(4 + 1 / 4)
+    for n in range(40):
+        await scheduler.send(get(client, f"/movie/{n}"))
+    assert scheduler.limit > 8
+
+
+async def test_concurrency_limit_is_bounded(fast, fake, client):
+    fast(UPSTREAM_MAX_CONCURRENCY=9, UPSTREAM_MIN_CONCURRENCY=3)
+    scheduler = UpstreamScheduler()
+    for n in range(60):
+        await scheduler.send(get(client, f"/movie/{n}"))
+    assert scheduler.limit == 9
+    fake.script.extend([(429, {"Retry-After": "0"})] * 3)
+    with pytest.raises(UpstreamRateLimited):
+        await scheduler.send(get(client, "/movie/popular"))
+    assert scheduler.limit == 3
+
+
+async def test_latency_spike_shrinks_the_limit(fast, fake, client):
+    fast(UPSTREAM_LATENCY_TARGET=0.02)
+    fake.latency_ms = 50
+    scheduler = UpstreamScheduler()
+    await scheduler.send(get(client, "/movie/popular"))
+    assert scheduler.latency_spikes == 1
+    assert scheduler.limit == pytest.approx(8 * 0.9)
+
+
+@pytest.fixture
+async def service(fast, fake, client):
+    tmdb = TMDBService()
+    tmdb.base_url = "http://tmdb.test/3"
+    tmdb._client = client
+    tmdb.cache = ResponseCache(LRUCache(100, 1_000_000))
+    return tmdb
+
+
+async def test_service_raises_when_rate_limited(service, fake):
+    fake.script.extend([(429, {"Retry-After": "0"})] * 3)
+    with pytest.raises(UpstreamRateLimited):
+        await service.get_popular_movies()
+
+
+async def test_service_still_returns_empty_on_other_errors(service, fake):
+    fake.script.extend([(404, {})])
+    assert await service.get_similar_movies(550) == {"results": [], "page": 1, "total_pages": 0, "total_results": 0}
+    assert len(await service.get_popular_movies()) == 20
+
+
+async def test_batch_reports_rate_limited_items(service, fake):
+    fake.script.extend([(429, {"Retry-After": "0"})] * 3)
+    items = [item async for item in service.iter_movie_batch([550])]
+    assert items == [{"id": 550, "error": {"code": "rate_limited", "message": "TMDB rate limit exceeded"}}]
@@ -28,6 +28,18 @@ import MovieDetailsModal from './components/MovieDetailsModal';
 import TrailerModal from './components/TrailerModal';
 import axios from 'axios';
 
+// Stable per-browser id: the backend keys personalized recommendations on it
+const getClientId = () => {
+  let clientId = localStorage.getItem('clientId');
+  if (!clientId) {
+    clientId = Math.random().toString(36).substring(2, 12);
+    localStorage.setItem('clientId', clientId);
+  }
+  return clientId;
+};
+
+const CLIENT_ID = getClientId();
+
 function App() {
   const [selectedMovie, setSelectedMovie] = useState(null);
   const [recommendations, setRecommendations] = useState([]);
@@ -62,7 +74,7 @@ function App() {
   // WebSocket connection for real-time updates
   const { lastMessage, connectionStatus, sendMessage } = useWebSocket(
     import.meta.env.VITE_WS_URL,
-    Math.random().toString(36).substring(7)
+    CLIENT_ID
   );
 
   const bgGradient = useColorModeValue(
@@ -25,7 +25,7 @@ const EnhancedMovieCard = ({ movie, onMovieClick, onTrailerClick }) => {
 
   const getPosterUrl = (posterPath) => {
     if (!posterPath) return 'https://via.placeholder.com/300x450/2D3748/E2E8F0?text=No+Image';
-    return `https://image.tmdb.org/t/p/w500${posterPath}`;
+    return `${import.meta.env.VITE_API_URL}/api/images/w500${posterPath}`;
   };
 
   const getRatingColor = (rating) => {
@@ -48,8 +48,8 @@ const EnhancedSearch = ({ onMovieSelect, isOpen, onClose }) => {
         setIsSearching(true);
         try {
           const response = await axios.get(
-            `${import.meta.env.VITE_API_URL}/api/movies/search`,
-            { params: { q: query } }
+            `${import.meta.env.VITE_API_URL}/api/movies/search/suggest`,
+            { params: { q: query, limit: 10 } }
           );
           setSearchResults(response.data.slice(0, 10));
         } catch (error) {
@@ -180,7 +180,7 @@ const EnhancedSearch = ({ onMovieSelect, isOpen, onClose }) => {
                   <Image
                     src={
                       movie.poster_path
-                        ? `https://image.tmdb.org/t/p/w92${movie.poster_path}`
+                        ? `${import.meta.env.VITE_API_URL}/api/images/w92${movie.poster_path}`
                         : 'https://via.placeholder.com/92x138/2D3748/E2E8F0?text=No+Image'
                     }
                     alt={movie.title}
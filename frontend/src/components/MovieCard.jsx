@@ -10,7 +10,7 @@ import {
 const MovieCard = ({ movie, onMovieClick }) => {
   const getPosterUrl = (posterPath) => {
     if (!posterPath) return 'https://via.placeholder.com/300x450?text=No+Image';
-    return `https://image.tmdb.org/t/p/w300${posterPath}`;
+    return `${import.meta.env.VITE_API_URL}/api/images/w300${posterPath}`;
   };
 
   const getRatingColor = (rating) => {
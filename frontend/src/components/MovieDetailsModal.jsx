@@ -126,7 +126,7 @@ const MovieDetailsModal = ({ isOpen, onClose, movie, onTrailerClick }) => {
           <Box position="relative" h="300px" overflow="hidden">
             {details?.backdrop_path && (
               <Image
-                src={`https://image.tmdb.org/t/p/w1280${details.backdrop_path}`}
+                src={`${import.meta.env.VITE_API_URL}/api/images/w1280${details.backdrop_path}`}
                 alt={details?.title || 'Backdrop'}
                 w="100%"
                 h="100%"
@@ -147,7 +147,7 @@ const MovieDetailsModal = ({ isOpen, onClose, movie, onTrailerClick }) => {
               <HStack align="end" spacing={6}>
                 {details?.poster_path && (
                   <Image
-                    src={`https://image.tmdb.org/t/p/w342${details.poster_path}`}
+                    src={`${import.meta.env.VITE_API_URL}/api/images/w342${details.poster_path}`}
                     alt={details?.title || 'Poster'}
                     w="120px"
                     h="180px"
@@ -252,7 +252,7 @@ const MovieDetailsModal = ({ isOpen, onClose, movie, onTrailerClick }) => {
                             <Avatar
                               src={
                                 actor?.profile_path
-                                  ? `https://image.tmdb.org/t/p/w185${actor.profile_path}`
+                                  ? `${import.meta.env.VITE_API_URL}/api/images/w185${actor.profile_path}`
                                   : undefined
                               }
                               name={actor?.name}
@@ -369,7 +369,7 @@ const MovieDetailsModal = ({ isOpen, onClose, movie, onTrailerClick }) => {
                           <HStack key={company.id} spacing={3}>
                             {company?.logo_path && (
                               <Image
-                                src={`https://image.tmdb.org/t/p/w92${company.logo_path}`}
+                                src={`${import.meta.env.VITE_API_URL}/api/images/w92${company.logo_path}`}
                                 alt={company?.name}
                                 h="30px"
                                 objectFit="contain"
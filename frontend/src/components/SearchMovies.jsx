@@ -22,9 +22,9 @@ const SearchMovies = ({ onMovieSelect }) => {
         setIsSearching(true);
         try {
           const response = await axios.get(
-            `${import.meta.env.VITE_API_URL}/api/movies/search`,
+            `${import.meta.env.VITE_API_URL}/api/movies/search/suggest`,
             {
-              params: { q: query }
+              params: { q: query, limit: 10 }
             }
           );
           setSearchResults(response.data.slice(0, 10)); // Limit to 10 results
@@ -101,7 +101,7 @@ const SearchMovies = ({ onMovieSelect }) => {
                   borderRadius="sm"
                   backgroundImage={
                     movie.poster_path 
-                      ? `url(https://image.tmdb.org/t/p/w92${movie.poster_path})`
+                      ? `url(${import.meta.env.VITE_API_URL}/api/images/w92${movie.poster_path})`
                       : 'none'
                   }
                   backgroundSize="cover"
@@ -1,13 +1,37 @@
 import { useEffect, useRef, useState } from 'react';
 
+// Rebuild the full trending list from the one we hold and a trending_delta frame
+const applyTrendingDelta = (movies, delta) => {
+  const byId = new Map(movies.map((movie) => [movie.id, movie]));
+  delta.removed.forEach((id) => byId.delete(id));
+  Object.entries(delta.changed).forEach(([id, fields]) => {
+    byId.set(Number(id), { ...byId.get(Number(id)), ...fields });
+  });
+  delta.added.forEach((movie) => byId.set(movie.id, movie));
+  return delta.order.map((id) => byId.get(id));
+};
+
+const loadTrending = () => {
+  try {
+    return JSON.parse(sessionStorage.getItem('trendingMovies'));
+  } catch {
+    return null;
+  }
+};
+
 export const useWebSocket = (url, clientId) => {
   const [socket, setSocket] = useState(null);
   const [lastMessage, setLastMessage] = useState(null);
   const [connectionStatus, setConnectionStatus] = useState('Connecting');
 
   useEffect(() => {
-    console.log('Connecting to WebSocket...', `${url}/${clientId}`);
-    const ws = new WebSocket(`${url}/${clientId}`);
+    // Send the last trending version we saw so the server can skip resending an unchanged list,
+    // and ask for deltas against it when we still hold that list
+    const trendingVersion = sessionStorage.getItem('trendingVersion');
+    const delta = loadTrending() ? '&delta=true' : '';
+    const query = trendingVersion ? `?trending_version=${encodeURIComponent(trendingVersion)}${delta}` : '';
+    console.log('Connecting to WebSocket...', `${url}/${clientId}${query}`);
+    const ws = new WebSocket(`${url}/${clientId}${query}`);
     
     ws.onopen = () => {
       console.log('WebSocket connected');
@@ -17,7 +41,20 @@ export const useWebSocket = (url, clientId) => {
     
     ws.onmessage = (event) => {
       console.log('WebSocket message received:', event.data);
-      const message = JSON.parse(event.data);
+      let message = JSON.parse(event.data);
+      if (message.type === 'trending_delta') {
+        const movies = loadTrending();
+        if (!movies || message.base_version !== sessionStorage.getItem('trendingVersion')) {
+          // Gap in the version chain: ask for the full list
+          ws.send(JSON.stringify({ type: 'get_trending' }));
+          return;
+        }
+        message = { type: 'trending_update', version: message.version, data: applyTrendingDelta(movies, message) };
+      }
+      if (message.version && (message.type === 'trending_movies' || message.type === 'trending_update')) {
+        sessionStorage.setItem('trendingVersion', message.version);
+        sessionStorage.setItem('trendingMovies', JSON.stringify(message.data));
+      }
       setLastMessage(message);
     };
     